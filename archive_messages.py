@@ -0,0 +1,47 @@
+"""
+Move old chat messages from `messages` into the compressed, month-partitioned
+message archive, then merge the chunks earlier runs left behind.
+Same code path as POST /api/admin/messages/archive; meant to run from cron.
+
+Run from the repo root:
+    python archive_messages.py
+    python archive_messages.py --older-than-days 30 --keep-recent 100
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app.database import SessionLocal, engine, Base
+from app.migrations import run_migrations
+from app import models  # noqa: F401
+from app.services.message_archive import run_archival, ARCHIVE_AFTER_DAYS, ARCHIVE_KEEP_RECENT, ARCHIVE_BATCH_SIZE
+from app.logging_config import setup_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--older-than-days", type=float, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--keep-recent", type=int, default=ARCHIVE_KEEP_RECENT, help="messages per conversation that stay hot")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="messages per commit")
+    parser.add_argument("--no-compact", action="store_true", help="skip merging archive chunks")
+    args = parser.parse_args()
+    setup_logging(fmt="text", stream=sys.stderr)  # app log lines; stdout is the report
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        report = run_archival(
+            db, compact=not args.no_compact, older_than_days=args.older_than_days,
+            keep_recent=args.keep_recent, batch_size=args.batch_size,
+        )
+    finally:
+        db.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,12 +8,17 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.user import User
 
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 # Secret key for signing JWTs (should be in env variables for production)
 SECRET_KEY = os.getenv("SECRET_KEY", "soulsync_super_secret_key_2026")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 300
+# Comma-separated emails allowed to use operator features (profiling, debug endpoints)
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
@@ -39,28 +44,50 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def token_subject(token: str) -> Optional[str]:
+    """Email in a valid token, without touching the database (for middleware). None if invalid."""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    return None
+
+def is_admin(email: Optional[str]) -> bool:
+    return bool(email) and email.lower() in ADMIN_EMAILS
+
+def user_from_token(token: str, db: Session) -> User:
+    """Validate a JWT and load its user. Raises 401 if either step fails."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        print(f"DEBUG AUTH: Decoding token... (SECRET_KEY start: {SECRET_KEY[:4]}...)")
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
-            print("DEBUG AUTH: Token payload missing 'sub' (email)")
+            logger.info("Token payload missing 'sub' (email)")
             raise credentials_exception
-        print(f"DEBUG AUTH: Token decoded successfully for {email}")
     except JWTError as e:
-        print(f"DEBUG AUTH: JWT Decoding Error: {str(e)}")
+        logger.info("JWT Decoding Error: %s", e)
         raise credentials_exception
     
     user = db.query(User).filter(User.email == email).first()
     if user is None:
-        print(f"DEBUG AUTH: User {email} not found in database")
+        logger.info("User %s not found in database", email)
         raise credentials_exception
     
-    print(f"DEBUG AUTH: User {email} authenticated successfully")
+    logger.debug("User %s authenticated successfully", email)
     return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return user_from_token(token, db)
+
+async def get_admin_user(current_user: User = Depends(get_current_user)):
+    if not is_admin(current_user.email):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    return current_user
@@ -1,28 +1,120 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./soulsync.db")
+# Optional streaming replica. Routes marked with use_replica read from it,
+# unless the same user wrote within the last DATABASE_REPLICA_STICKY_SECONDS
+# (so nobody sees their own write disappear while the replica catches up).
+# Those writes are remembered per worker process (RecentWrites), so the guarantee
+# only holds when a user's requests reach the same worker: run a single worker,
+# or route by user at the load balancer (sticky sessions). With several workers
+# and no such routing, a read right after a write may land on a worker that
+# never saw it and come back stale from the replica.
+REPLICA_DATABASE_URL = os.getenv("DATABASE_REPLICA_URL")
+REPLICA_STICKY_SECONDS = float(os.getenv("DATABASE_REPLICA_STICKY_SECONDS", "5"))
 
-# Fix for Render/Heroku Postgres URL if needed
-if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
-    SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("postgres://", "postgresql://", 1)
+def _normalize_url(url):
+    # Fix for Render/Heroku Postgres URL if needed
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
 
-connect_args = {}
-if "sqlite" in SQLALCHEMY_DATABASE_URL:
-    connect_args = {"check_same_thread": False}
+def _make_engine(url):
+    connect_args = {}
+    if "sqlite" in url:
+        connect_args = {"check_same_thread": False}
+    return create_engine(url, connect_args=connect_args)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args=connect_args
-)
+SQLALCHEMY_DATABASE_URL = _normalize_url(SQLALCHEMY_DATABASE_URL)
+engine = _make_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+replica_engine = _make_engine(_normalize_url(REPLICA_DATABASE_URL)) if REPLICA_DATABASE_URL else None
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) if replica_engine else None
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class RecentWrites:
+    """
+    When each user last wrote to the primary. Per process, so other workers don't see
+    these writes (see the replica note at the top); a missing entry is an old write.
+    """
+
+    def __init__(self, window=REPLICA_STICKY_SECONDS, max_keys=100_000):
+        self.window = window
+        self.max_keys = max_keys
+        self._writes = {}  # key -> monotonic time of the last write
+        self._lock = threading.Lock()
+
+    def note(self, key):
+        if not key:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._writes[key] = now
+            if len(self._writes) > self.max_keys:
+                self._writes = {k: t for k, t in self._writes.items() if now - t < self.window}
+
+    def recent(self, key) -> bool:
+        if not key:
+            return False
+        with self._lock:
+            written = self._writes.get(key)
+        return written is not None and time.monotonic() - written < self.window
+
+
+recent_writes = RecentWrites()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _note_commit(session):
+    # Also catches writes from GET handlers (e.g. insights updating the profile)
+    recent_writes.note(session.info.get("writer"))
+
+
+def _writer_key(request: Request):
+    # auth_utils imports this module
+    from app.auth_utils import bearer_token, token_subject
+    token = bearer_token(request.headers.get("authorization"))
+    return token_subject(token) if token else None
+
+
+def use_replica(request: Request):
+    """Route dependency: this endpoint only reads, so get_db may hand out a replica session."""
+    request.state.use_replica = True
+
+
+def get_db(request: Request):
+    if ReplicaSessionLocal is None:
+        db = SessionLocal()
+    else:
+        writer = _writer_key(request)
+        if getattr(request.state, "use_replica", False) and not recent_writes.recent(writer):
+            db = ReplicaSessionLocal()
+        else:
+            db = SessionLocal()
+            db.info["writer"] = writer
+            if request.method not in SAFE_METHODS:
+                recent_writes.note(writer)
     try:
         yield db
     finally:
         db.close()
+
+
+def query_plan(db, query) -> list:
+    """
+    The planner's plan for an ORM query, one line per step:
+    EXPLAIN QUERY PLAN on SQLite ("SEARCH users USING INDEX ..."), EXPLAIN on Postgres ("Index Scan ...").
+    """
+    sql = str(query.statement.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}))
+    explain = "EXPLAIN QUERY PLAN " if db.bind.dialect.name == "sqlite" else "EXPLAIN "
+    return [row[-1] for row in db.execute(text(explain + sql))]
@@ -1,12 +1,39 @@
+import os
+from app.logging_config import setup_logging, stop_logging
+
+# Before the app modules below, some of which log while they import
+setup_logging()
+# Starts tracemalloc when MEMORY_TRACE=1, so imports show up in /api/admin/debug/memory
+from app.services import memory  # noqa: F401
+
 from fastapi import FastAPI
+from fastapi.datastructures import Default
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import predict, chat, auth, discovery
+from fastapi.middleware.gzip import GZipMiddleware
+from app.routes import predict, chat, auth, discovery, realtime, metrics, admin
 from app.database import engine, Base
+from app.migrations import run_migrations
+from app import models  # noqa: F401 - registers every table before create_all
+from app.services.message_buffer import message_buffer
+from app.services.jobs import job_queue
+from app.services.bulk_import import shutdown_pool
+from app.services.rate_limit import RateLimitMiddleware
+from app.services.profiler import ProfilingMiddleware, PROFILE_DIR
+from app.utils.http_cache import FastJSONResponse
 
-# Create tables
+# Create tables, then bring existing ones up to date (app/migrations.py)
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
-app = FastAPI(title="SoulSync API", version="1.0")
+# orjson for plain dict responses. Wrapped in Default() so routes with a response_model
+# keep FastAPI's direct Pydantic-to-bytes serialization.
+app = FastAPI(title="SoulSync API", version="1.0", default_response_class=Default(FastJSONResponse))
+
+# Added before CORS so CORS wraps it and 429 responses still carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+# Only installed when profiling is configured, so it costs nothing otherwise
+if PROFILE_DIR:
+    app.add_middleware(ProfilingMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,11 +42,24 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Long chat histories compress well; small responses aren't worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MIN_SIZE", "1024")))
 
 app.include_router(auth.router, prefix="/api/auth", tags=["Auth"])
 app.include_router(predict.router, prefix="/api", tags=["Predict"])
 app.include_router(chat.router, prefix="/api", tags=["Chat"])
 app.include_router(discovery.router, prefix="/api/discovery", tags=["Discovery"])
+app.include_router(realtime.router, tags=["Realtime"])
+app.include_router(metrics.router, tags=["Metrics"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
+
+@app.on_event("shutdown")
+def drain_background_work():
+    # Let in-flight jobs finish (they may write messages), then write out queued messages
+    job_queue.stop()
+    message_buffer.stop()
+    shutdown_pool()
+    stop_logging()
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,119 @@
+import logging
+from datetime import datetime
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, text
+from app.models.message import Message
+from app.models.user import User
+from app.utils.geo import city_coordinates, grid_cell
+
+logger = logging.getLogger(__name__)
+
+# Lightweight schema migrations (SQLite and Postgres).
+# create_all() only creates missing tables, so a database created before a
+# column or index was added never gets it. Each such change is a numbered step
+# below. Steps check the live schema before changing it, run in order at startup
+# (after create_all) and are recorded in schema_migrations, so each runs once per
+# database. On a fresh database create_all already built everything and the
+# steps only get recorded. New steps go at the end; never renumber old ones.
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("name", String, primary_key=True),
+    Column("applied_at", DateTime),
+)
+
+# Serializes startup migrations across workers on Postgres (pg_advisory_xact_lock key)
+MIGRATION_LOCK_KEY = 0x50554C5345  # arbitrary, app-wide
+
+MIGRATIONS = []
+
+
+def migration(name: str):
+    """Register a migration step: fn(connection), run inside the migration transaction."""
+    def register(fn):
+        MIGRATIONS.append((name, fn))
+        return fn
+    return register
+
+
+def add_column(conn, column):
+    """ALTER TABLE ... ADD COLUMN for a model column, unless the table already has it."""
+    existing = {c["name"] for c in inspect(conn).get_columns(column.table.name)}
+    if column.name not in existing:
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {column.table.name} ADD COLUMN {column.name} {column_type}"))
+
+
+def create_index(conn, table, name):
+    """Create one of the model's indexes, unless the table already has it."""
+    index = next(i for i in table.indexes if i.name == name)
+    index.create(conn, checkfirst=True)
+
+
+def drop_index(conn, name):
+    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+@migration("0001_users_geo_columns")
+def _user_geo_columns(conn):
+    users = User.__table__
+    for name in ("latitude", "longitude", "geo_cell"):
+        add_column(conn, users.c[name])
+    # Coordinates for existing rows (later writes get them from the before_update hook), one UPDATE per city
+    locations = conn.execute(text("SELECT DISTINCT location FROM users WHERE latitude IS NULL AND location IS NOT NULL"))
+    for (location,) in locations.all():
+        coords = city_coordinates(location)
+        if coords is not None:
+            conn.execute(
+                text("UPDATE users SET latitude = :lat, longitude = :lon, geo_cell = :cell WHERE location = :location AND latitude IS NULL"),
+                {"lat": coords[0], "lon": coords[1], "cell": grid_cell(*coords), "location": location},
+            )
+
+
+@migration("0002_messages_conversation_index")
+def _message_index(conn):
+    create_index(conn, Message.__table__, "ix_messages_user_match_ts")
+
+
+@migration("0003_users_bio_sentiment")
+def _user_bio_sentiment(conn):
+    # Left NULL: readers fall back to analyze_bio() and the bio_sentiment job fills it on the next profile save
+    add_column(conn, User.__table__.c.bio_sentiment)
+
+
+@migration("0004_users_updated_at")
+def _user_updated_at(conn):
+    # NULL means "unknown": /me then answers without a Last-Modified header (the ETag still works)
+    add_column(conn, User.__table__.c.updated_at)
+
+
+@migration("0005_users_candidate_search_indexes")
+def _candidate_indexes(conn):
+    users = User.__table__
+    create_index(conn, users, "ix_users_geo_cell_age")
+    create_index(conn, users, "ix_users_age")
+    drop_index(conn, "ix_users_geo_cell")  # prefix of ix_users_geo_cell_age
+    # Fresh statistics, so the planner knows how selective the new indexes are
+    conn.execute(text("ANALYZE users"))
+
+
+def run_migrations(engine) -> list:
+    """Apply the pending migrations in order, in one transaction. Returns the names applied."""
+    applied = []
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Every worker runs this at startup; the others wait, then find nothing to do
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        schema_migrations.create(conn, checkfirst=True)
+        done = {name for (name,) in conn.execute(schema_migrations.select().with_only_columns(schema_migrations.c.name))}
+        for name, step in MIGRATIONS:
+            if name in done:
+                continue
+            step(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (name, applied_at) VALUES (:name, :at) ON CONFLICT (name) DO NOTHING"),
+                {"name": name, "at": datetime.utcnow()},
+            )
+            applied.append(name)
+            logger.info("🛠️ Applied migration %s", name)
+    return applied
@@ -1,11 +1,21 @@
+import logging
 import pickle
 import os
-import joblib
+import time
+from app.services.metrics import metrics
+from app.services.profiler import startup_profile
+from app.services.memory import release_memory
+
+logger = logging.getLogger(__name__)
 
 class ModelLoader:
+    """
+    Only the CatBoost model is loaded: scaler.pkl is never used at inference
+    (features are scaled from feature_stats instead), so it isn't kept in memory.
+    """
     _instance = None
     _model = None
-    _scaler = None
+    model_path = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -15,47 +25,35 @@ class ModelLoader:
     def _load_models(self):
         if self._model is not None:
             return
+        with startup_profile("model_load"):
+            self._load_model_files()
 
-        print("🚀 Starting lazy load of ML models...")
+    def _load_model_files(self):
+        logger.info("🚀 Starting lazy load of ML models...")
+        started = time.perf_counter()
         # Use absolute path from /app
         model_path = "/app/models/soul_sync_model.pkl"
-        scaler_path = "/app/models/scaler.pkl"
 
         # Fallback for local dev if /app doesn't exist
         if not os.path.exists(model_path):
             base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             model_path = os.path.join(base_dir, "models", "soul_sync_model.pkl")
-            scaler_path = os.path.join(base_dir, "models", "scaler.pkl")
 
         # Load CatBoost Model
         if os.path.exists(model_path):
             try:
                 with open(model_path, "rb") as f:
                     self._model = pickle.load(f)
-                print(f"✅ Model loaded successfully from {model_path}.")
+                self.model_path = model_path
+                logger.info("✅ Model loaded successfully from %s.", model_path)
             except Exception as e:
-                print(f"❌ Error loading model: {e}")
-        else:
-            print(f"❌ Model not found at {model_path}")
-            
-        # Load Scaler
-        if os.path.exists(scaler_path):
-            try:
-                # Try pickle first
-                with open(scaler_path, "rb") as f:
-                    self._scaler = pickle.load(f)
-                print("✅ Scaler loaded successfully.")
-            except:
-                try:
-                    self._scaler = joblib.load(scaler_path)
-                    print("✅ Scaler loaded with joblib.")
-                except Exception as e:
-                    print(f"❌ Error loading scaler: {e}")
+                logger.exception("❌ Error loading model: %s", e)
         else:
-            print(f"❌ Scaler not found at {scaler_path}")
+            logger.error("❌ Model not found at %s", model_path)
 
-        import gc
-        gc.collect()
+        # Unpickling leaves a lot of freed heap behind; give it back to the OS
+        release_memory()
+        metrics.set_gauge("soulsync_model_load_seconds", time.perf_counter() - started, "Time spent loading the model.")
 
     @property
     def model(self):
@@ -63,11 +61,11 @@ class ModelLoader:
             self._load_models()
         return self._model
 
-    @property
-    def scaler(self):
-        if self._scaler is None:
-            self._load_models()
-        return self._scaler
+    def artifact_sizes(self) -> dict:
+        """On-disk size of the loaded model (CatBoost keeps it in memory at about that size)."""
+        if self._model is None:
+            return {"model": None}
+        return {"model": {"path": self.model_path, "file_bytes": os.path.getsize(self.model_path)}}
 
 # Global instance
 loader = ModelLoader()
@@ -1,2 +1,5 @@
 from .user import User
 from .message import Message
+from .compatibility_score import CompatibilityScore
+from .conversation_summary import ConversationSummary
+from .archived_conversation import ArchivedConversation
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from app.database import Base
+from datetime import datetime
+
+class ArchivedConversation(Base):
+    """What part of a conversation lives in the compressed message archive (one row per conversation)."""
+    __tablename__ = "archived_conversations"
+    __table_args__ = (UniqueConstraint("user_id", "match_id", name="uq_archived_user_match"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    match_id = Column(String)
+    message_count = Column(Integer, default=0)
+    toxic_count = Column(Integer, default=0)
+    archived_through_id = Column(Integer)  # highest archived message id (ids don't follow time with write-behind; pages use timestamps)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, UniqueConstraint
+from app.database import Base
+from datetime import datetime
+
+class CompatibilityScore(Base):
+    """Precomputed pair scores written by the offline `score_pairs.py` job."""
+    __tablename__ = "compatibility_scores"
+    __table_args__ = (UniqueConstraint("user_id", "candidate_id", name="uq_compat_user_candidate"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    candidate_id = Column(Integer, ForeignKey("users.id"))
+    score = Column(Float)  # 0-100, same scale as PredictionResponse.compatibility_score
+    ghosting_probability = Column(Float)
+    computed_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from app.database import Base
+from datetime import datetime
+
+class ConversationSummary(Base):
+    """Rolling summary of the turns that no longer fit in a coach bot's prompt."""
+    __tablename__ = "conversation_summaries"
+    __table_args__ = (UniqueConstraint("user_id", "match_id", name="uq_summary_user_match"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    match_id = Column(String)
+    summary = Column(String, default="")
+    summarized_through = Column(DateTime, nullable=True)  # timestamp of the newest folded-in message
+    token_estimate = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
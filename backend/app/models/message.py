@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Serves history reads and the per-conversation aggregate behind GET /api/chats
+        Index("ix_messages_user_match_ts", "user_id", "match_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
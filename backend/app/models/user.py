@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, Index, event
 from sqlalchemy.orm import relationship
 from app.database import Base
+from app.utils.geo import apply_location
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Candidate search (services/candidates.py): grid cells IN (...) plus the age-preference range
+        Index("ix_users_geo_cell_age", "geo_cell", "age"),
+        # Same age range for users whose city has no coordinates
+        Index("ix_users_age", "age"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
@@ -15,6 +23,11 @@ class User(Base):
     gender = Column(String)
     location = Column(String, default="Unknown")
     
+    # Derived from `location` via the offline city table (app/utils/geo.py)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geo_cell = Column(Integer, nullable=True)
+    
     # Personality Traits (Big 5)
     openness = Column(Float, default=5.0)
     extroversion = Column(Float, default=5.0)
@@ -47,6 +60,7 @@ class User(Base):
     fav_music_genre = Column(String, default="Pop")
     
     bio_text = Column(String, default="")
+    bio_sentiment = Column(Float, nullable=True)  # TextBlob polarity of bio_text, filled by a background job
     
     # Settings Preferences
     notifications_enabled = Column(Boolean, default=True)
@@ -57,7 +71,15 @@ class User(Base):
     
     # Prediction Results (Stored for caching)
     last_login = Column(String, nullable=True)
+    # Last-Modified for GET /api/auth/me
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
 
     # Relationships
     messages = relationship("Message", back_populates="user")
 
+
+# Keep coordinates in sync with the free-text city on every insert/update
+@event.listens_for(User, "before_insert")
+@event.listens_for(User, "before_update")
+def _sync_location(mapper, connection, target):
+    apply_location(target)
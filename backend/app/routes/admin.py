@@ -0,0 +1,96 @@
+import codecs
+import logging
+import os
+import sys
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.auth_utils import get_admin_user
+from app.database import get_db
+from app.models.user import User
+from app.services.bulk_import import BulkImporter, IMPORT_BATCH_SIZE
+from app.services.jobs import job_queue
+from app.services import memory
+from app.model_loader import loader
+from app.utils.feature_stats import feature_stats
+from app.utils.mappings import mappings
+import app.services.tasks  # registers the archive_messages job
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+async def _body_lines(request: Request, group_size: int):
+    """Decoded body lines (newline kept) in groups of `group_size`, as the upload streams in."""
+    # Incremental, so a multi-byte character split across chunks decodes correctly
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    remainder, group = "", []
+    async for chunk in request.stream():
+        remainder += decoder.decode(chunk)
+        *lines, remainder = remainder.split("\n")
+        group.extend(line + "\n" for line in lines)
+        if len(group) >= group_size:
+            yield group
+            group = []
+    remainder += decoder.decode(b"", final=True)
+    if remainder:
+        group.append(remainder)
+    if group:
+        yield group
+
+
+@router.post("/users/import")
+async def import_users(request: Request, format: str = None, db: Session = Depends(get_db), admin: User = Depends(get_admin_user)):
+    """
+    Bulk-create users from an NDJSON or CSV body (one record per line, UserCreate fields;
+    a `hashed_password` column is kept as-is for migrated accounts).
+    The format comes from ?format= or the Content-Type (text/csv), default NDJSON.
+    """
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    try:
+        importer = BulkImporter(db, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Parsing, hashing and inserts are blocking; run each group off the event loop
+    try:
+        async for lines in _body_lines(request, IMPORT_BATCH_SIZE):
+            await run_in_threadpool(importer.feed_lines, lines)
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Body is not valid UTF-8: {e}")
+    report = await run_in_threadpool(importer.finish)
+    logger.info("📥 Bulk import by %s: %d users at %s rows/s", admin.email, report["imported"], report["rows_per_second"],
+                extra={"report": {k: v for k, v in report.items() if k != "errors"}})
+    return report
+
+
+@router.post("/messages/archive", status_code=202)
+def archive_messages(older_than_days: float = None, keep_recent: int = None, admin: User = Depends(get_admin_user)):
+    """Queue a run of the message archiver (defaults: ARCHIVE_AFTER_DAYS / ARCHIVE_KEEP_RECENT)."""
+    options = {k: v for k, v in {"older_than_days": older_than_days, "keep_recent": keep_recent}.items() if v is not None}
+    job_id = job_queue.enqueue("archive_messages", **options)
+    logger.info("🗄️ Message archival queued by %s (%s)", admin.email, job_id)
+    return {"job_id": job_id}
+
+
+@router.get("/debug/memory")
+def debug_memory(top: int = 20, admin: User = Depends(get_admin_user)):
+    """
+    This worker's memory: RSS, the size of each loaded artifact and, when the worker
+    runs with MEMORY_TRACE=1, the biggest allocation sites.
+    Artifacts that haven't been loaded yet are reported as null (nothing is loaded here).
+    """
+    allocations = memory.top_allocations(max(1, min(top, 200)))
+    return {
+        "pid": os.getpid(),
+        "rss_bytes": memory.rss_bytes(),
+        "peak_rss_bytes": memory.peak_rss_bytes(),
+        "artifacts": {
+            **loader.artifact_sizes(),
+            "feature_stats": {"columns": len(feature_stats.columns), "bytes": feature_stats.nbytes},
+            "mappings": {"columns": len(mappings), "bytes": memory.deep_size(mappings)},
+            "textblob": "textblob" in sys.modules,
+        },
+        "tracing": allocations is not None,
+        "top_allocations": allocations,
+    }
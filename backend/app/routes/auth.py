@@ -1,30 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
-from app.database import get_db
+from app.database import get_db, use_replica
 from app.models.user import User
 from app.schemas import UserCreate, Token, UserResponse, UserProfile
 from app.auth_utils import get_password_hash, verify_password, create_access_token, get_current_user
+from app.services.tasks import profile_changed
+from app.utils.http_cache import conditional_json
 from datetime import timedelta
 
 router = APIRouter()
 
-@router.get("/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(get_current_user)):
-    return current_user
+@router.get("/me", response_model=UserResponse, dependencies=[Depends(use_replica)])
+def read_users_me(request: Request, current_user: User = Depends(get_current_user)):
+    body = UserResponse.model_validate(current_user).model_dump_json().encode("utf-8")
+    return conditional_json(request, body, last_modified=current_user.updated_at)
 
 @router.put("/me", response_model=UserResponse)
 def update_user_me(user_data: UserProfile, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     # Update user attributes
     # Note: UserProfile has fields like 'openness', 'age', etc.
     # We iterate and set them.
-    user_dict = user_data.dict(exclude_unset=True)
-    for key, value in user_dict.items():
-        setattr(current_user, key, value)
+    for key in user_data.model_fields_set:
+        setattr(current_user, key, getattr(user_data, key))
     
     db.add(current_user)
     db.commit()
     db.refresh(current_user)
+    profile_changed(current_user.id)
     return current_user
 
 @router.post("/register", response_model=UserResponse)
@@ -1,13 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from pydantic import BaseModel
 from typing import List, Dict
+import logging
 import random
-from datetime import datetime
+from sqlalchemy import select, func, case
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, use_replica
 from app.models.message import Message as MessageModel
+from app.models.archived_conversation import ArchivedConversation
 from app.models.user import User
 from app.auth_utils import get_current_user
+from app.services.message_archive import history_page, HISTORY_PAGE_MAX
+from app.services.message_buffer import pending_for_user
+from app.services.moderation import TOXIC_WARNING
+from app.services.chat_service import accept_user_message, message_to_dict, request_reply
+from app.utils.http_cache import APP_STARTED, conditional_json, dumps, etag_for
+import app.services.tasks  # registers the background job handlers
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -104,125 +114,124 @@ class MessageResponse(BaseModel):
     warning: str = None
     message: Dict = None
 
+# Static directory: serialize once, revalidate with the ETag
+MATCHES_BODY = dumps({"matches": MOCK_MATCHES})
+MATCHES_ETAG = etag_for(MATCHES_BODY)
+
 @router.get("/matches")
-async def get_matches():
+async def get_matches(request: Request):
     """Get all potential matches"""
-    return {"matches": MOCK_MATCHES}
+    return conditional_json(request, MATCHES_BODY, MATCHES_ETAG, APP_STARTED, cache_control="public, no-cache")
 
-@router.get("/chat/{match_id}")
-async def get_chat_history(match_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Get message history for a specific match from DB"""
-    messages = db.query(MessageModel).filter(
-        MessageModel.user_id == current_user.id,
-        MessageModel.match_id == match_id
-    ).order_by(MessageModel.timestamp).all()
-    
-    # Convert DB objects to dicts
-    msg_list = []
-    for m in messages:
-        msg_list.append({
-            "id": m.id,
-            "text": m.text,
-            "sender": m.sender,
-            "timestamp": m.timestamp.isoformat(),
-            "is_toxic": m.is_toxic
-        })
-        
-    return {"messages": msg_list}
+@router.get("/chats", dependencies=[Depends(use_replica)])
+async def get_conversations(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Every conversation of the current user with its last message, in one query"""
+    # Write-behind messages not flushed yet: taken before the query and kept out of it,
+    # so each is counted once whether or not it lands in the table meanwhile
+    pending = pending_for_user(current_user.id)
+
+    # One pass over the user's messages (ix_messages_user_match_ts):
+    # row_number picks the latest message per match, the window aggregates count them.
+    per_match = dict(partition_by=MessageModel.match_id)
+    own = MessageModel.user_id == current_user.id
+    if pending:
+        own = own & MessageModel.id.notin_([m.id for m in pending])
+    ranked = select(
+        MessageModel.match_id,
+        MessageModel.text,
+        MessageModel.sender,
+        MessageModel.timestamp,
+        MessageModel.is_toxic,
+        func.row_number().over(
+            order_by=(MessageModel.timestamp.desc(), MessageModel.id.desc()), **per_match
+        ).label("rn"),
+        func.count().over(**per_match).label("message_count"),
+        func.sum(case((MessageModel.is_toxic == True, 1), else_=0)).over(**per_match).label("toxic_count"),
+    ).where(own).subquery()
+
+    # Counts include the part of each conversation that was moved to the archive
+    archived = ArchivedConversation
+    rows = db.execute(
+        select(
+            ranked,
+            func.coalesce(archived.message_count, 0).label("archived_count"),
+            func.coalesce(archived.toxic_count, 0).label("archived_toxic"),
+        )
+        .outerjoin(archived, (archived.user_id == current_user.id) & (archived.match_id == ranked.c.match_id))
+        .where(ranked.c.rn == 1).order_by(ranked.c.timestamp.desc())
+    ).all()
+
+    names = {m["id"]: m["name"] for m in MOCK_MATCHES}
+    conversations = {
+        row.match_id: {
+            "match_id": row.match_id,
+            "name": names.get(row.match_id),
+            "last_message": {
+                "text": row.text,
+                "sender": row.sender,
+                "timestamp": row.timestamp.isoformat(),
+                "is_toxic": row.is_toxic
+            },
+            "message_count": row.message_count + row.archived_count,
+            "toxic_count": (row.toxic_count or 0) + row.archived_toxic
+        }
+        for row in rows
+    }
+    if not pending:
+        return {"conversations": list(conversations.values())}
+
+    latest = {row.match_id: row.timestamp for row in rows}
+    new_ids = {m.match_id for m in pending} - conversations.keys()
+    if new_ids:
+        # Nothing in the table yet, but older messages may sit in the archive
+        for conv in db.query(archived).filter(archived.user_id == current_user.id, archived.match_id.in_(new_ids)):
+            conversations[conv.match_id] = {"match_id": conv.match_id, "name": names.get(conv.match_id),
+                                            "message_count": conv.message_count, "toxic_count": conv.toxic_count}
+    for m in pending:
+        conv = conversations.setdefault(m.match_id, {"match_id": m.match_id, "name": names.get(m.match_id),
+                                                     "message_count": 0, "toxic_count": 0})
+        conv["message_count"] += 1
+        conv["toxic_count"] += int(bool(m.is_toxic))
+        if m.match_id not in latest or m.timestamp >= latest[m.match_id]:
+            latest[m.match_id] = m.timestamp
+            conv["last_message"] = {"text": m.text, "sender": m.sender, "timestamp": m.timestamp.isoformat(), "is_toxic": m.is_toxic}
+    return {"conversations": sorted(conversations.values(), key=lambda c: latest[c["match_id"]], reverse=True)}
+
+@router.get("/chat/{match_id}", dependencies=[Depends(use_replica)])
+async def get_chat_history(match_id: str, before: int = None, limit: int = Query(None, ge=1, le=HISTORY_PAGE_MAX),
+                           db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Message history for a specific match, oldest first. Without paging parameters: every
+    hot (not yet archived) message. Page back with ?before=<oldest id>&limit=N while
+    has_more is true; older pages come from the message archive.
+    """
+    messages, has_more = history_page(db, current_user.id, match_id, before, limit)
+    return {"messages": [message_to_dict(m) for m in messages], "has_more": has_more}
 
 @router.post("/chat/send", response_model=MessageResponse)
 async def send_message(message: MessagePayload, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Send a message with toxicity check and persistence"""
     try:
-        from better_profanity import profanity
-        profanity.load_censor_words()  # Initialize the profanity filter
-        
-        # Check for toxicity
-        is_toxic = profanity.contains_profanity(message.text)
-        toxic_keywords = ["hate", "stupid", "idiot", "ugly"]
-        has_toxic_keyword = any(word in message.text.lower() for word in toxic_keywords)
-        final_toxic = is_toxic or has_toxic_keyword
-
-        # Save User Message to DB
-        user_msg = MessageModel(
-            user_id=current_user.id,
-            match_id=message.match_id,
-            text=message.text,
-            sender="user",
-            timestamp=datetime.now(),
-            is_toxic=final_toxic
-        )
-        db.add(user_msg)
-        db.commit()
-        db.refresh(user_msg)
+        # Check for toxicity and save (also pushed to the user's /ws/chat sockets)
+        user_msg = await accept_user_message(db, current_user.id, message.match_id, message.text)
         
         # If toxic, return warning
-        if final_toxic:
+        if user_msg.is_toxic:
             return MessageResponse(
                 success=False,
                 is_toxic=True,
-                warning="This message contains inappropriate content. Please be respectful.",
-                message={
-                    "id": user_msg.id,
-                    "text": user_msg.text,
-                    "sender": "user",
-                    "timestamp": user_msg.timestamp.isoformat(),
-                    "is_toxic": True
-                }
+                warning=TOXIC_WARNING,
+                message=message_to_dict(user_msg)
             )
         
-        # If toxic, return warning
-        if final_toxic:
-            return MessageResponse(
-                success=False,
-                is_toxic=True,
-                warning="This message contains inappropriate content. Please be respectful.",
-                message={
-                    "id": user_msg.id,
-                    "text": user_msg.text,
-                    "sender": "user",
-                    "timestamp": user_msg.timestamp.isoformat(),
-                    "is_toxic": True
-                }
-            )
-        
-        # Generate dynamic bot response using AI Service
-        from app.services.ai_service import get_bot_response
-        
-        # Fetch recent history for context (last 5 messages)
-        history_objs = db.query(MessageModel).filter(
-            MessageModel.user_id == current_user.id,
-            MessageModel.match_id == message.match_id
-        ).order_by(MessageModel.timestamp.desc()).limit(6).all()
-        
-        history = [{"text": m.text, "sender": m.sender} for m in reversed(history_objs)]
-        
-        bot_text = await get_bot_response(message.match_id, message.text, history)
-        
-        bot_msg = MessageModel(
-            user_id=current_user.id,
-            match_id=message.match_id,
-            text=bot_text,
-            sender="match",
-            timestamp=datetime.now(),
-            is_toxic=False
-        )
-        db.add(bot_msg)
-        db.commit()
-        db.refresh(bot_msg)
+        # The reply is generated in the background and pushed over /ws/chat (or picked up by the next history fetch)
+        await request_reply(db, current_user.id, message.match_id, message.text)
         
         return MessageResponse(
             success=True,
             is_toxic=False,
-            message={
-                "id": user_msg.id,
-                "text": user_msg.text,
-                "sender": "user",
-                "timestamp": user_msg.timestamp.isoformat(),
-                "is_toxic": False
-            }
+            message=message_to_dict(user_msg)
         )
     except Exception as e:
-        print(f"Error in send_message: {str(e)}")
+        logger.exception("Error in send_message: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
-
@@ -1,23 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, use_replica
 from app.models.user import User
 from app.auth_utils import get_current_user
 from app.schemas import PredictionResponse, UserProfile
 from app.routes.predict import predict_compatibility
 from app.routes.chat import MOCK_MATCHES
+from app.model_loader import loader
+from app.utils.pairwise import profile_arrays, model_probabilities, pairwise_scores
+from app.services.candidates import nearby_candidates
+from app.services.score_cache import bio_sentiments
+from app.utils.bio_analyzer import analyze_bio
+from app.utils.insight_rules import rules
+from app.utils.http_cache import APP_STARTED, BUILD_ID, conditional_json, dumps, etag_for, not_modified, validator_headers
 
 router = APIRouter()
 
-@router.get("/insights/{match_id}", response_model=PredictionResponse)
-async def get_match_insights(match_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Generate resonance insights for a specific match"""
-    match = next((m for m in MOCK_MATCHES if m["id"] == match_id), None)
-    if not match:
-        raise HTTPException(status_code=404, detail="Match not found")
-
-    # Create a profile object from the match data to run through the prediction engine
-    match_profile = UserProfile(
+def match_to_profile(match: dict) -> UserProfile:
+    """Create a profile object from the match data to run through the prediction engine"""
+    return UserProfile(
         age=match["age"],
         gender="Female" if "Priya" in match["name"] or "Ananya" in match["name"] else "Male",
         location=match["location"],
@@ -47,4 +48,108 @@ async def get_match_insights(match_id: str, db: Session = Depends(get_db), curre
         bio_text=match["bio"]
     )
 
-    return await predict_compatibility(match_profile, db, current_user)
+# Human matches as columnar arrays, built once (MOCK_MATCHES is static)
+_scored_matches = [m for m in MOCK_MATCHES if not m.get("is_bot")]
+_match_arrays = None
+
+_lite_insights = None
+
+@router.get("/insights/lite")
+async def get_lite_insights(request: Request, ids: str = None):
+    """
+    Rule-based insights (flags, icebreakers, timeline, safety score) for many matches at once.
+    No model and no DB, so no ghosting/compatibility numbers: meant for list views.
+    ids: comma-separated match ids (default: every match)
+    """
+    global _lite_insights
+    if _lite_insights is None:
+        profiles = [match_to_profile(m) for m in _scored_matches]
+        results = rules.evaluate(profiles, [analyze_bio(p.bio_text) for p in profiles])
+        _lite_insights = {m["id"]: r for m, r in zip(_scored_matches, results)}
+
+    wanted = [i for i in (ids or "").split(",") if i] or list(_lite_insights)
+    unknown = [i for i in wanted if i not in _lite_insights]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Match not found: {', '.join(unknown)}")
+
+    body = dumps({"insights": [{"match_id": i, **_lite_insights[i]} for i in wanted]})
+    return conditional_json(request, body, etag_for(BUILD_ID, "lite", *wanted), APP_STARTED)
+
+@router.get("/insights/{match_id}", response_model=PredictionResponse)
+async def get_match_insights(match_id: str, request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Generate resonance insights for a specific match"""
+    match = next((m for m in MOCK_MATCHES if m["id"] == match_id), None)
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found")
+
+    # Insights only depend on the (static) match profile and the deployed model,
+    # so a client that already has them gets a 304 without running the model
+    etag = etag_for(BUILD_ID, match_id)
+    if not_modified(request, etag, APP_STARTED):
+        return Response(status_code=304, headers=validator_headers(etag, APP_STARTED))
+
+    match_profile = match_to_profile(match)
+    result = await predict_compatibility(match_profile, db, current_user)
+    return conditional_json(request, dumps(result.model_dump()), etag, APP_STARTED)
+
+@router.get("/scores")
+async def get_match_scores(mode: str = "pairwise", current_user: User = Depends(get_current_user)):
+    """
+    Score the current user against every match in one batch.
+    mode=single uses only the match profile (like /insights), mode=pairwise also uses the user's own traits.
+    """
+    global _match_arrays
+    if mode not in ("single", "pairwise"):
+        raise HTTPException(status_code=400, detail="mode must be 'single' or 'pairwise'")
+    if not loader.model:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    if _match_arrays is None:
+        _match_arrays = profile_arrays([match_to_profile(m) for m in _scored_matches])
+
+    probs = model_probabilities(loader.model, _match_arrays)
+    if mode == "pairwise":
+        probs = pairwise_scores(profile_arrays([current_user], bio_sentiments([current_user])), _match_arrays, probs)[0]
+
+    return {
+        "mode": mode,
+        "scores": [
+            {"match_id": m["id"], "compatibility_score": float(p * 100)}
+            for m, p in zip(_scored_matches, probs)
+        ]
+    }
+
+@router.get("/nearby", dependencies=[Depends(use_replica)])
+async def get_nearby_candidates(limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Candidates within the user's max_distance (grid-index lookup), scored pairwise if the model is loaded"""
+    nearby = nearby_candidates(db, current_user, limit=limit)
+
+    # Stored sentiment (bio_sentiment job) for scores and flags alike; TextBlob only
+    # runs for profiles the job hasn't reached yet
+    candidates = [c for c, _ in nearby]
+    sentiments = bio_sentiments(candidates)
+    scores = [None] * len(nearby)
+    ghosting = None
+    if nearby and loader.model:
+        cand_arrays = profile_arrays(candidates, sentiments)
+        probs = model_probabilities(loader.model, cand_arrays)
+        ghosting = 1.0 - probs
+        user_arrays = profile_arrays([current_user], bio_sentiments([current_user]))
+        scores = [float(p * 100) for p in pairwise_scores(user_arrays, cand_arrays, probs)[0]]
+    insights = rules.evaluate(candidates, sentiments, ghosting)
+
+    return {
+        "max_distance": current_user.max_distance,
+        "candidates": [
+            {
+                "id": cand.id,
+                "full_name": cand.full_name,
+                "age": cand.age,
+                "location": cand.location,
+                "distance_km": round(distance, 1) if distance is not None else None,
+                "compatibility_score": score,
+                "flags": insight["flags"],
+            }
+            for (cand, distance), score, insight in zip(nearby, scores, insights)
+        ]
+    }
@@ -0,0 +1,64 @@
+import ipaddress
+import os
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from app.database import engine
+from app.services.metrics import metrics
+from app.services.completion_cache import completion_cache
+from app.services.ai_service import llm_slots
+from app.services.jobs import job_queue
+
+router = APIRouter()
+
+# Shared secret for the scraper. Unset = only direct loopback requests are served
+# (a scraper on the same host); everything else, proxied traffic included, gets 403.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+def _is_local(request: Request) -> bool:
+    if request.client is None or "x-forwarded-for" in request.headers:
+        return False
+    try:
+        return ipaddress.ip_address(request.client.host).is_loopback
+    except ValueError:
+        return False
+
+
+def _pool_gauges():
+    pool = engine.pool
+    stats = {
+        "size": getattr(pool, "size", None),
+        "checked_out": getattr(pool, "checkedout", None),
+        "checked_in": getattr(pool, "checkedin", None),
+        "overflow": getattr(pool, "overflow", None),
+    }
+    # Not every pool class (e.g. SQLite's) implements all of these
+    return [
+        ("soulsync_db_pool_connections", "Database connection pool state.", fn(), {"state": name})
+        for name, fn in stats.items() if callable(fn)
+    ]
+
+
+def _cache_gauges():
+    stats = completion_cache.stats()
+    return [
+        ("soulsync_bot_cache_hits", "Bot completion cache hits since start.", stats["hits"], {}),
+        ("soulsync_bot_cache_misses", "Bot completion cache misses since start.", stats["misses"], {}),
+        ("soulsync_bot_cache_hit_ratio", "Bot completion cache hit ratio.", stats["hit_rate"], {}),
+        ("soulsync_bot_cache_entries", "Entries in the bot completion cache.", stats["entries"], {}),
+    ]
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def read_metrics(request: Request, authorization: str = Header(None)):
+    if METRICS_TOKEN:
+        if authorization != f"Bearer {METRICS_TOKEN}":
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    elif not _is_local(request):
+        raise HTTPException(status_code=403, detail="Set METRICS_TOKEN to scrape /metrics remotely")
+    extra = _pool_gauges() + _cache_gauges() + [
+        ("soulsync_llm_in_flight", "Upstream LLM calls in flight.", llm_slots.in_flight, {}),
+        ("soulsync_llm_shed", "LLM calls shed at the in-flight cap since start.", llm_slots.shed, {}),
+        ("soulsync_jobs_pending", "Background jobs queued, running or waiting to retry.", job_queue.pending, {}),
+    ]
+    return PlainTextResponse(metrics.render(extra), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,71 @@
+import json
+import math
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from app import database
+from app.database import SessionLocal
+from app.auth_utils import user_from_token
+from app.services.chat_hub import hub
+from app.services.chat_service import accept_user_message, request_reply
+from app.services import rate_limit
+import app.services.tasks  # registers the background job handlers
+
+router = APIRouter()
+
+# Each message costs the same as POST /api/chat/send: it triggers the same LLM reply
+MESSAGE_COST = rate_limit.route_cost("POST", "/api/chat/send")
+
+@router.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket, token: str = ""):
+    """
+    Realtime chat. Connect with /ws/chat?token=<JWT>; the token is checked once per connection.
+    Client sends:  {"match_id": "bot_luna", "text": "hi"}
+    Server pushes: {"type": "message", ...} for the user's message and the reply,
+                   {"type": "moderation", ...} with the toxicity verdict,
+                   {"type": "error", "detail": ...} for bad input or an empty rate-limit bucket.
+    """
+    db = SessionLocal()
+    try:
+        user = user_from_token(token, db)
+        user_id, email, bucket_key = user.id, user.email, rate_limit.user_key(user.email)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    finally:
+        db.close()
+
+    await websocket.accept()
+    hub.connect(user_id, websocket)
+    try:
+        while True:
+            try:
+                data = json.loads(await websocket.receive_text())
+                match_id, text = data["match_id"], data["text"]
+                if not (isinstance(match_id, str) and isinstance(text, str)):
+                    raise TypeError
+            except (ValueError, KeyError, TypeError):
+                await websocket.send_json({"type": "error", "detail": "Expected JSON with string match_id and text"})
+                continue
+
+            # The HTTP middleware never sees websocket frames, so charge the user's bucket here
+            if rate_limit.shared_buckets is not None:
+                allowed, retry_after = await rate_limit.spend(rate_limit.shared_buckets, bucket_key, MESSAGE_COST)
+                if not allowed:
+                    await websocket.send_json({"type": "error", "detail": "Too many requests, slow down.",
+                                               "retry_after": max(1, math.ceil(retry_after))})
+                    continue
+
+            db = SessionLocal()
+            try:
+                user_msg = await accept_user_message(db, user_id, match_id, text)
+                # This session isn't from get_db, so mark the write here: the user's next
+                # GET /api/chat reads go to the primary, not a replica without the message
+                database.recent_writes.note(email)
+                if not user_msg.is_toxic:
+                    # The reply is pushed to this socket by the background job when it's ready
+                    await request_reply(db, user_id, match_id, text)
+            finally:
+                db.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.disconnect(user_id, websocket)
@@ -1,18 +1,27 @@
+import asyncio
+import logging
 import os
-from groq import Groq
+import threading
+from groq import AsyncGroq
 from typing import List, Dict
+from app.services.completion_cache import completion_cache
+from app.services.metrics import stage
 
-# Client will be initialized inside the function to be safe with environment variables
-client = None
+logger = logging.getLogger(__name__)
+
+# Client will be initialized inside the function to be safe with environment variables.
+# The async client's connection pool belongs to the event loop that created it,
+# so keep one client per loop (the app loop and the job queue loop).
+_clients = {}
 
 def get_groq_client():
-    global client
-    if client is None:
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            return None
-        client = Groq(api_key=api_key)
-    return client
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        return None
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        _clients[loop] = AsyncGroq(api_key=api_key)
+    return _clients[loop]
 
 LUNA_PROMPT = """
 You are Luna, a warm, intelligent, and deeply emotionally aware AI companion.
@@ -43,41 +52,108 @@ BOT_CONFIGS = {
     }
 }
 
-async def get_bot_response(bot_id: str, user_message: str, history: List[Dict[str, str]] = None) -> str:
+FALLBACK_REPLY = "I felt a ripple in the energy... let's try that again later. 💫"
+BUSY_REPLY = "So many hearts are reaching out right now... give me a moment and ask again. 💫"
+
+# Cap on upstream LLM calls in flight across all event loops of this process.
+# Past the cap, calls are shed immediately instead of waiting behind the others.
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))
+
+
+class LLMOverloaded(Exception):
+    pass
+
+
+class InFlightLimit:
+    """Non-blocking counting limit, usable from any thread or event loop."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.limit:
+                self.shed += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+llm_slots = InFlightLimit(LLM_MAX_IN_FLIGHT)
+
+async def get_bot_response(bot_id: str, user_message: str, history: List[Dict[str, str]] = None, fallback_on_error: bool = True, summary: str = None) -> str:
+    """
+    Reply of `bot_id` to `user_message`, given the earlier turns (`history`, oldest first)
+    and optionally a summary of turns older than that.
+    Upstream errors (and LLMOverloaded, when LLM_MAX_IN_FLIGHT calls are already running)
+    turn into a friendly fallback reply unless fallback_on_error=False, in which case
+    they are raised so the caller (e.g. a background job) can retry.
+    """
     config = BOT_CONFIGS.get(bot_id)
     if not config:
         return "I'm still tuning into your frequency! 💫"
 
+    # Context: rolling summary of older turns + recent turns, already sized to the
+    # token budget by context_builder.build_context. The current message is not in it.
+    context = []
+    if summary:
+        context.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    for msg in history or []:
+        role = "user" if msg["sender"] == "user" else "assistant"
+        context.append({"role": role, "content": msg["text"]})
+
+    cache_key = None
+    if completion_cache.should_cache(user_message, context):
+        cache_key = completion_cache.key(bot_id, user_message, context)
+        cached = completion_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     client = get_groq_client()
     if not client:
-        print("⚠️ Groq Client could not be initialized (Check GROQ_API_KEY)")
+        logger.warning("⚠️ Groq Client could not be initialized (Check GROQ_API_KEY)")
         return "My connection to the Aura Plane is weak right now. Please check back soon! ✨"
 
     messages = [
         {"role": "system", "content": config["system_prompt"]}
-    ]
-
-    # Add history for context (last 5 messages)
-    if history:
-        for msg in history[-5:]:
-            role = "user" if msg["sender"] == "user" else "assistant"
-            messages.append({"role": role, "content": msg["text"]})
+    ] + context
 
     # Add current message
     messages.append({"role": "user", "content": user_message})
 
+    if not llm_slots.try_acquire():
+        logger.warning("⚠️ %d LLM calls in flight, shedding request for %s", llm_slots.in_flight, bot_id)
+        if not fallback_on_error:
+            raise LLMOverloaded(f"{llm_slots.limit} LLM calls already in flight")
+        return BUSY_REPLY
+
     try:
-        print(f"🤖 AI Request for {bot_id} (Model: llama-3.1-8b-instant)")
-        completion = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=messages,
-            temperature=0.9,
-            max_tokens=200
-        )
+        logger.debug("🤖 AI Request for %s (Model: llama-3.1-8b-instant)", bot_id)
+        with stage("chat.llm_call"):
+            completion = await client.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=messages,
+                temperature=0.9,
+                max_tokens=200
+            )
         ai_reply = completion.choices[0].message.content.strip()
-        print(f"✅ AI Response: {ai_reply[:50]}...")
+        logger.debug("✅ AI Response: %.50s...", ai_reply)
+        if cache_key is not None:
+            usage = getattr(completion, "usage", None)
+            completion_cache.put(cache_key, ai_reply, getattr(usage, "total_tokens", 0) or 0)
         return ai_reply
     except Exception as e:
-        print(f"🔥 Groq API Error: {str(e)}")
-        return "I felt a ripple in the energy... let's try that again later. 💫"
+        logger.error("🔥 Groq API Error: %s", e, extra={"bot_id": bot_id})
+        if not fallback_on_error:
+            raise
+        return FALLBACK_REPLY
+    finally:
+        llm_slots.release()
 
@@ -0,0 +1,228 @@
+import csv
+import io
+import json
+from collections import deque
+from datetime import datetime
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.user import User
+from app.schemas import UserCreate
+from app.utils.geo import apply_location
+
+# Bulk user import (admin endpoint and import_users.py).
+# Records stream in as NDJSON (one per line) or CSV (quoted fields may span lines),
+# with UserCreate fields.
+# Per batch: one SELECT for existing emails, password hashing + bio sentiment on a
+# process pool, and one executemany (COPY on Postgres) instead of a round trip,
+# a bcrypt hash and a commit per user.
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# Hashing processes per web worker (each gunicorn worker gets its own pool); import_users.py takes --workers
+IMPORT_HASH_WORKERS = int(os.getenv("IMPORT_HASH_WORKERS", "2"))
+MAX_REPORTED_ERRORS = 100
+
+USER_COLUMNS = [c for c in User.__table__.columns.keys() if c != "id"]
+_pool = None
+
+
+def _derive(password, hashed_password, bio_text):
+    """(bcrypt hash, bio sentiment) for one record. Runs in the worker processes."""
+    from app.auth_utils import get_password_hash
+    from app.utils.bio_analyzer import analyze_bio
+    return hashed_password or get_password_hash(password), analyze_bio(bio_text)
+
+
+def _derive_all(jobs, workers: int):
+    if workers <= 1 or len(jobs) < 8:
+        return [_derive(*job) for job in jobs]
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the web worker has threads (job queue, write-behind) running
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return list(_pool.map(_derive, *zip(*jobs), chunksize=max(1, len(jobs) // (workers * 4))))
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def parse_line(line: str):
+    """One NDJSON object; None for blank lines."""
+    if not line.strip():
+        return None
+    return json.loads(line)
+
+
+class BulkImporter:
+    """
+    Feed it lines with feed_lines() (or parsed records with add()); it validates,
+    dedupes and inserts them in batches. finish() writes the last batch and returns the report.
+    """
+
+    def __init__(self, db: Session, fmt: str = "ndjson", batch_size: int = IMPORT_BATCH_SIZE, hash_workers: int = IMPORT_HASH_WORKERS):
+        if fmt not in ("ndjson", "csv"):
+            raise ValueError("format must be 'ndjson' or 'csv'")
+        self.db = db
+        self.fmt = fmt
+        self.header = None
+        self.line_no = 0
+        # CSV: one reader over the whole stream. Lines wait in _csv_lines until the
+        # quotes balance, so the reader only ever pulls lines of complete records.
+        self._csv_lines = deque()
+        self._csv_rows = csv.reader(iter(self._csv_lines.popleft, None))
+        self._in_quotes = False
+        self._record_line = 0
+        self.batch_size = batch_size
+        self.hash_workers = hash_workers
+        self.postgres = db.get_bind().dialect.name == "postgresql"
+        self.batch = []
+        self.seen_emails = set()
+        self.started = time.perf_counter()
+        self.counts = {"imported": 0, "existing": 0, "duplicates": 0, "invalid": 0}
+        self.errors = []
+
+    def feed_lines(self, lines):
+        """Text lines, ideally with their line endings (needed to keep newlines inside quoted CSV fields)."""
+        if self.fmt == "csv":
+            self._feed_csv(lines)
+            return
+        for line in lines:
+            self.line_no += 1
+            try:
+                record = parse_line(line)
+            except ValueError as e:
+                self.add_error(self.line_no, f"unparseable line: {e}")
+                continue
+            if record is not None:
+                self.add(self.line_no, record)
+
+    def _feed_csv(self, lines):
+        for line in lines:
+            self.line_no += 1
+            if not self._csv_lines:
+                self._record_line = self.line_no
+            self._csv_lines.append(line)
+            # Escaped quotes come in pairs, so an odd count opens or closes a quoted field
+            self._in_quotes ^= line.count('"') % 2 == 1
+            if self._in_quotes:
+                continue
+            try:
+                values = next(self._csv_rows)
+            except csv.Error as e:
+                self._csv_lines.clear()
+                self.add_error(self._record_line, f"unparseable line: {e}")
+                continue
+            if not any(v.strip() for v in values):
+                continue
+            if self.header is None:
+                self.header = [h.strip() for h in values]
+                continue
+            self.add(self._record_line, {k: v for k, v in zip(self.header, values) if v != ""})
+
+    def add(self, line_no: int, record: dict):
+        if not isinstance(record, dict):
+            self.add_error(line_no, "expected a JSON object")
+            return
+        hashed = record.pop("hashed_password", None)
+        if hashed and "password" not in record:
+            record["password"] = "-"  # migrated account: keep its existing hash
+        try:
+            user = UserCreate(**record)
+        except ValidationError as e:
+            self.add_error(line_no, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            return
+        # Exact match, like the existing-email check in flush(), /register and /login
+        if user.email in self.seen_emails:
+            self.counts["duplicates"] += 1
+            return
+        self.seen_emails.add(user.email)
+        self.batch.append((line_no, user, hashed))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def add_error(self, line_no: int, message: str):
+        self.counts["invalid"] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
+
+    def flush(self):
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        existing = {e for (e,) in self.db.execute(select(User.email).where(User.email.in_([u.email for _, u, _ in batch])))}
+        fresh = [item for item in batch if item[1].email not in existing]
+        self.counts["existing"] += len(batch) - len(fresh)
+        if not fresh:
+            return
+
+        derived = _derive_all([(u.password, hashed, u.bio_text) for _, u, hashed in fresh], self.hash_workers)
+        rows = []
+        now = datetime.utcnow()  # COPY skips column defaults too, so both paths set it here
+        for (_, user, _), (hashed_password, sentiment) in zip(fresh, derived):
+            row = user.model_dump(exclude={"password"})
+            row.update(hashed_password=hashed_password, bio_sentiment=sentiment, updated_at=now)
+            # Core inserts skip the ORM before_insert hook, so derive the location fields here
+            location = SimpleNamespace(location=row["location"])
+            apply_location(location)
+            row.update(latitude=location.latitude, longitude=location.longitude, geo_cell=location.geo_cell)
+            rows.append({col: row[col] for col in USER_COLUMNS if col in row})
+
+        try:
+            self._insert(rows)
+            self.db.commit()
+        except IntegrityError:
+            # Someone registered one of these emails since the check; retry without them
+            self.db.rollback()
+            taken = {e for (e,) in self.db.execute(select(User.email).where(User.email.in_([r["email"] for r in rows])))}
+            rows = [r for r in rows if r["email"] not in taken]
+            self.counts["existing"] += len(taken)
+            self._insert(rows)
+            self.db.commit()
+        self.counts["imported"] += len(rows)
+
+    def _insert(self, rows):
+        if not rows:
+            return
+        if not self.postgres:
+            self.db.execute(insert(User), rows)
+            return
+        # COPY is several times faster than executemany on Postgres
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for r in rows:
+            writer.writerow(["\\N" if r[col] is None else r[col] for col in columns])
+        buffer.seek(0)
+        cursor = self.db.connection().connection.cursor()
+        cursor.copy_expert(
+            f"COPY users ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+        )
+
+    def finish(self) -> dict:
+        if self._csv_lines:
+            self.add_error(self._record_line, "unterminated quoted field")
+            self._csv_lines.clear()
+        self.flush()
+        elapsed = time.perf_counter() - self.started
+        return {
+            **self.counts,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.counts["imported"] / elapsed, 1) if elapsed else 0.0,
+            "errors": self.errors,
+        }
+
+
+def import_lines(db: Session, lines, fmt: str = "ndjson", **options) -> dict:
+    """Import from any iterable of text lines (file, list, generator)."""
+    importer = BulkImporter(db, fmt, **options)
+    importer.feed_lines(lines)
+    return importer.finish()
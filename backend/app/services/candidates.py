@@ -0,0 +1,88 @@
+import math
+from sqlalchemy.orm import Session
+from app.models.user import User
+from app.utils.geo import haversine_km, cells_within, bounding_box
+
+LOAD_BATCH = 5000  # keep IN (...) lists under the SQLite variable limit
+
+
+def eligible_candidates_query(db: Session, user: User):
+    """
+    Users that `user` could be shown in discovery.
+    Applies the user's age preferences and excludes the user themselves.
+    """
+    query = db.query(User).filter(User.id != user.id)
+    if user.min_age_pref is not None:
+        query = query.filter(User.age >= user.min_age_pref)
+    if user.max_age_pref is not None:
+        query = query.filter(User.age <= user.max_age_pref)
+    return query
+
+
+def _within_radius_query(db: Session, user: User, radius_km: float):
+    """
+    Eligible candidates in the grid cells the radius touches (index lookup on geo_cell).
+    This is a superset of the circle; callers finish with an exact haversine check.
+    """
+    query = eligible_candidates_query(db, user)
+    cells = cells_within(user.latitude, user.longitude, radius_km)
+    if cells is not None:
+        return query.filter(User.geo_cell.in_(cells))
+    # Very large radius: a bounding box is cheaper than a huge IN list
+    min_lat, max_lat, min_lon, max_lon = bounding_box(user.latitude, user.longitude, radius_km)
+    return query.filter(User.latitude.between(min_lat, max_lat), User.longitude.between(min_lon, max_lon))
+
+
+def _nearby_ids(db: Session, user: User, radius_km: float, limit: int = None):
+    """(id, distance_km) of candidates within the radius, closest first; only loads (id, lat, lon) per candidate."""
+    if radius_km is None:
+        radius_km = user.max_distance
+    if user.latitude is None or user.longitude is None or radius_km is None:
+        return [(cid, None) for (cid,) in eligible_candidates_query(db, user).with_entities(User.id).limit(limit)]
+
+    def in_radius(rows):
+        results = []
+        for cid, lat, lon in rows:
+            distance = haversine_km(user.latitude, user.longitude, lat, lon)
+            if distance <= radius_km:
+                results.append((cid, distance))
+        return results
+
+    query = _within_radius_query(db, user, radius_km).with_entities(User.id, User.latitude, User.longitude)
+    if not limit:
+        results = in_radius(query)
+    else:
+        # Rank in SQL by flat-earth distance (plain arithmetic, no trig functions needed), so only about
+        # `limit` rows come back instead of everyone in the cells; the exact check and sort below still apply
+        dlat = User.latitude - user.latitude
+        dlon = (User.longitude - user.longitude) * math.cos(math.radians(user.latitude))
+        query = query.order_by(dlat * dlat + dlon * dlon, User.id)
+        fetch = limit
+        while True:
+            rows = query.limit(fetch).all()
+            results = in_radius(rows)
+            if len(results) >= limit or len(rows) < fetch:
+                break
+            fetch *= 4  # the cell corners outside the circle took some of the slots
+    results.sort(key=lambda pair: pair[1])
+    return results[:limit] if limit else results
+
+
+def nearby_candidates(db: Session, user: User, radius_km: float = None, limit: int = None):
+    """
+    Eligible candidates within `radius_km` (default: the user's max_distance), closest first.
+    Returns (User, distance_km) tuples. If the user's city has no coordinates the distance
+    filter can't be applied, so the age-filtered candidates are returned with distance None.
+    Only the `limit` closest candidates are loaded as full rows.
+    """
+    nearby = _nearby_ids(db, user, radius_km, limit)
+    users = {}
+    ids = [cid for cid, _ in nearby]
+    for i in range(0, len(ids), LOAD_BATCH):
+        users.update((u.id, u) for u in db.query(User).filter(User.id.in_(ids[i:i + LOAD_BATCH])))
+    return [(users[cid], distance) for cid, distance in nearby if cid in users]
+
+
+def nearby_candidate_ids(db: Session, user: User, radius_km: float = None, limit: int = None):
+    """Same filter and order as nearby_candidates, without loading the rows."""
+    return [cid for cid, _ in _nearby_ids(db, user, radius_km, limit)]
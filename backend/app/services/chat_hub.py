@@ -0,0 +1,43 @@
+import asyncio
+from typing import Dict
+from fastapi import WebSocket
+
+
+class ChatHub:
+    """
+    Open /ws/chat connections of this worker, grouped by user id.
+    Anything published for a user is pushed to every socket they have open.
+    Publishing works from any event loop (e.g. the job queue's): sends are
+    handed to the loop that owns the socket.
+    """
+
+    def __init__(self):
+        self._sockets: Dict[int, Dict[WebSocket, asyncio.AbstractEventLoop]] = {}
+
+    def connect(self, user_id: int, websocket: WebSocket):
+        self._sockets.setdefault(user_id, {})[websocket] = asyncio.get_running_loop()
+
+    def disconnect(self, user_id: int, websocket: WebSocket):
+        sockets = self._sockets.get(user_id)
+        if sockets:
+            sockets.pop(websocket, None)
+            if not sockets:
+                self._sockets.pop(user_id, None)
+
+    def is_connected(self, user_id: int) -> bool:
+        return user_id in self._sockets
+
+    async def publish(self, user_id: int, event: dict):
+        current = asyncio.get_running_loop()
+        for websocket, loop in list(self._sockets.get(user_id, {}).items()):
+            try:
+                if loop is current:
+                    await websocket.send_json(event)
+                else:
+                    await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(websocket.send_json(event), loop))
+            except Exception:
+                # Socket went away between receive and send
+                self.disconnect(user_id, websocket)
+
+
+hub = ChatHub()
@@ -0,0 +1,91 @@
+import logging
+from datetime import datetime
+from sqlalchemy.orm import Session
+from app.services.message_buffer import save_message
+from app.services.context_builder import build_context
+from app.services.moderation import is_toxic, TOXIC_WARNING
+from app.services.chat_hub import hub
+from app.services.jobs import job_queue, QueueFull
+from app.services.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Shared by POST /api/chat/send and the /ws/chat socket.
+# Every new message and moderation verdict is also pushed to the user's open sockets.
+
+
+def message_to_dict(m) -> dict:
+    return {
+        "id": m.id,
+        "text": m.text,
+        "sender": m.sender,
+        "timestamp": m.timestamp.isoformat(),
+        "is_toxic": m.is_toxic
+    }
+
+
+async def accept_user_message(db: Session, user_id: int, match_id: str, text: str):
+    """Moderate and persist a user message, then push it and the verdict to the user's sockets."""
+    with stage("chat.moderation"):
+        toxic = is_toxic(text)
+    with stage("chat.db_write"):
+        user_msg = save_message(
+            db,
+            user_id=user_id,
+            match_id=match_id,
+            text=text,
+            sender="user",
+            timestamp=datetime.now(),
+            is_toxic=toxic
+        )
+    await hub.publish(user_id, {"type": "message", "match_id": match_id, "message": message_to_dict(user_msg)})
+    await hub.publish(user_id, {
+        "type": "moderation",
+        "match_id": match_id,
+        "message_id": user_msg.id,
+        "is_toxic": toxic,
+        "warning": TOXIC_WARNING if toxic else None
+    })
+    return user_msg
+
+
+async def request_reply(db: Session, user_id: int, match_id: str, text: str):
+    """
+    Queue the match's reply to an already stored message (bot_reply job).
+    With the job queue full, answer with the busy reply right away: failing the
+    request now would make the client resend a message that is already saved.
+    """
+    try:
+        job_queue.enqueue("bot_reply", user_id=user_id, match_id=match_id, text=text)
+    except QueueFull:
+        from app.services.ai_service import BUSY_REPLY
+        logger.warning("⚠️ Job queue full, sent the busy reply to user %s in %s", user_id, match_id)
+        await save_bot_message(db, user_id, match_id, BUSY_REPLY)
+
+
+async def reply_as_bot(db: Session, user_id: int, match_id: str, text: str, fallback_on_error: bool = True):
+    """Generate, persist and push the match's reply to `text`."""
+    # Generate dynamic bot response using AI Service
+    from app.services.ai_service import get_bot_response, BOT_CONFIGS
+
+    summary, history = None, []
+    if match_id in BOT_CONFIGS:
+        with stage("chat.context"):
+            summary, history = build_context(db, user_id, match_id, text, BOT_CONFIGS[match_id]["name"])
+    bot_text = await get_bot_response(match_id, text, history, fallback_on_error=fallback_on_error, summary=summary)
+    return await save_bot_message(db, user_id, match_id, bot_text)
+
+
+async def save_bot_message(db: Session, user_id: int, match_id: str, bot_text: str):
+    with stage("chat.db_write"):
+        bot_msg = save_message(
+            db,
+            user_id=user_id,
+            match_id=match_id,
+            text=bot_text,
+            sender="match",
+            timestamp=datetime.now(),
+            is_toxic=False
+        )
+    await hub.publish(user_id, {"type": "message", "match_id": match_id, "message": message_to_dict(bot_msg)})
+    return bot_msg
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Opt-in cache for coach bot completions.
+# Common openers ("hi", "how do I start a conversation?") get the same kind of answer
+# every time, so re-asking the LLM costs latency and tokens for nothing.
+# Key: bot id + normalized user message + hash of the context window sent with it.
+BOT_CACHE_ENABLED = os.getenv("BOT_CACHE_ENABLED", "0").lower() in ("1", "true", "yes")
+BOT_CACHE_MAX_ENTRIES = int(os.getenv("BOT_CACHE_MAX_ENTRIES", "2000"))
+BOT_CACHE_TTL_SECONDS = float(os.getenv("BOT_CACHE_TTL_SECONDS", "3600"))
+# "openers": only short messages sent without prior context; "always": every message
+BOT_CACHE_POLICY = os.getenv("BOT_CACHE_POLICY", "openers")
+OPENER_MAX_WORDS = int(os.getenv("BOT_CACHE_OPENER_MAX_WORDS", "8"))
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """'Hi!!  How do I START?' -> 'hi how do i start'"""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+class CompletionCache:
+    def __init__(self, enabled=BOT_CACHE_ENABLED, max_entries=BOT_CACHE_MAX_ENTRIES, ttl=BOT_CACHE_TTL_SECONDS, policy=BOT_CACHE_POLICY):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.policy = policy
+        self._entries = OrderedDict()  # key -> (reply, tokens, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+
+    def should_cache(self, user_message: str, context) -> bool:
+        if not self.enabled:
+            return False
+        if self.policy == "always":
+            return True
+        # "openers": context-free and short
+        return not context and len(normalize(user_message).split()) <= OPENER_MAX_WORDS
+
+    def key(self, bot_id: str, user_message: str, context) -> str:
+        context_hash = hashlib.sha1(json.dumps(context or [], sort_keys=True).encode("utf-8")).hexdigest()
+        return f"{bot_id}|{normalize(user_message)}|{context_hash}"
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[2] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_tokens += entry[1]
+            return entry[0]
+
+    def put(self, key: str, reply: str, tokens: int = 0):
+        with self._lock:
+            self._entries[key] = (reply, tokens, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "policy": self.policy,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_upstream_calls": self.hits,
+                "saved_tokens": self.saved_tokens,
+            }
+
+
+completion_cache = CompletionCache()
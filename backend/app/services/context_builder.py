@@ -0,0 +1,118 @@
+import os
+import re
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.message import Message as MessageModel
+from app.models.conversation_summary import ConversationSummary
+from app.services.message_buffer import with_pending
+
+# Token-budgeted prompt context for the coach bots.
+# Recent turns are added newest-first until the budget is full. Turns that fall
+# out of the budget are folded, once, into a rolling per-conversation summary
+# stored in `conversation_summaries`, instead of being re-sent or silently dropped.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("BOT_CONTEXT_TOKEN_BUDGET", "600"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("BOT_SUMMARY_TOKEN_BUDGET", "150"))
+RECENT_FETCH_LIMIT = 40  # newest unsummarized turns looked at per reply
+SUMMARY_LINE_CHARS = 90
+MESSAGE_OVERHEAD_TOKENS = 4  # role + separators in the chat format
+
+_WORD = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local token estimate, no tokenizer download needed.
+    Llama-style BPE averages ~4 characters per token on English chat; words and
+    punctuation give a lower bound for short, emoji- or symbol-heavy messages.
+    """
+    if not text:
+        return 0
+    return max(len(text) // 4, len(_WORD.findall(text)))
+
+
+def _message_tokens(text: str) -> int:
+    return estimate_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _summary_line(msg, bot_name: str) -> str:
+    speaker = "User" if msg.sender == "user" else bot_name
+    first_sentence = _SENTENCE_END.split(msg.text.strip(), maxsplit=1)[0]
+    if len(first_sentence) > SUMMARY_LINE_CHARS:
+        first_sentence = first_sentence[:SUMMARY_LINE_CHARS - 1].rstrip() + "…"
+    return f"{speaker}: {first_sentence}"
+
+
+def fold_into_summary(summary: str, turns, bot_name: str) -> str:
+    """Append one compressed line per turn, dropping the oldest lines beyond the summary budget."""
+    lines = [line for line in (summary or "").split("\n") if line]
+    lines += [_summary_line(m, bot_name) for m in turns]
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > SUMMARY_TOKEN_BUDGET:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def build_context(db: Session, user_id: int, match_id: str, current_text: str, bot_name: str = "Coach"):
+    """
+    Returns (summary, history) for get_bot_response.
+    history is oldest-first [{"text", "sender"}], excludes the message being answered,
+    and together with the summary and current message stays within CONTEXT_TOKEN_BUDGET
+    (of which SUMMARY_TOKEN_BUDGET is reserved for the summary).
+    """
+    row = db.query(ConversationSummary).filter(
+        ConversationSummary.user_id == user_id,
+        ConversationSummary.match_id == match_id
+    ).first()
+
+    query = db.query(MessageModel).filter(
+        MessageModel.user_id == user_id,
+        MessageModel.match_id == match_id,
+        MessageModel.is_toxic == False
+    )
+    if row is not None and row.summarized_through is not None:
+        query = query.filter(MessageModel.timestamp > row.summarized_through)
+    recent = query.order_by(MessageModel.timestamp.desc()).limit(RECENT_FETCH_LIMIT).all()
+    recent = with_pending(list(reversed(recent)), user_id, match_id)
+    recent = [m for m in recent if not m.is_toxic]
+
+    # The message being answered is saved before the reply; it is sent separately
+    if recent and recent[-1].sender == "user" and recent[-1].text == current_text:
+        recent = recent[:-1]
+
+    summary = row.summary if row is not None else ""
+    # Always reserve the summary's share, so which turns fit doesn't depend on
+    # whether a summary exists yet (keeps the prompt size predictable)
+    budget = CONTEXT_TOKEN_BUDGET - SUMMARY_TOKEN_BUDGET - _message_tokens(current_text)
+
+    kept = []
+    for msg in reversed(recent):
+        cost = _message_tokens(msg.text)
+        if cost > budget:
+            break
+        budget -= cost
+        kept.append(msg)
+    kept.reverse()
+
+    overflow = recent[:len(recent) - len(kept)]
+    if overflow:
+        summary = fold_into_summary(summary, overflow, bot_name)
+        _save_summary(db, row, user_id, match_id, summary, overflow[-1].timestamp)
+
+    history = [{"text": m.text, "sender": m.sender} for m in kept]
+    return (summary or None), history
+
+
+def _save_summary(db: Session, row, user_id: int, match_id: str, summary: str, through: datetime):
+    if row is None:
+        row = ConversationSummary(user_id=user_id, match_id=match_id)
+        db.add(row)
+    row.summary = summary
+    row.summarized_through = through
+    row.token_estimate = estimate_tokens(summary)
+    row.updated_at = datetime.utcnow()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another reply for the same conversation created the row first; it will catch up next time
+        db.rollback()
@@ -0,0 +1,273 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# In-process background jobs.
+# Work that doesn't have to finish before the HTTP response (bot replies, sentiment
+# recomputation, score-cache refreshes) is enqueued here and run on a dedicated
+# event loop thread. Each named queue has its own concurrency limit, all queues
+# share a global cap, and failed jobs are retried with exponential backoff.
+# Set JOB_STORE_PATH to persist jobs in SQLite so they survive a restart.
+
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH")
+JOB_MAX_CONCURRENCY = int(os.getenv("JOB_MAX_CONCURRENCY", "8"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "10000"))
+DEFAULT_QUEUE_LIMITS = {"default": 2, "llm": 4, "scores": 1}
+
+
+def _parse_limits(raw: str) -> Dict[str, int]:
+    """'llm=8,scores=2' -> {'llm': 8, 'scores': 2}"""
+    limits = {}
+    for part in filter(None, (p.strip() for p in (raw or "").split(","))):
+        name, _, value = part.partition("=")
+        limits[name.strip()] = int(value)
+    return limits
+
+
+class QueueFull(Exception):
+    pass
+
+
+@dataclass
+class JobSpec:
+    func: Callable
+    queue: str
+    max_attempts: int
+    backoff: float
+    on_failure: Optional[Callable] = None
+
+
+@dataclass
+class Job:
+    name: str
+    kwargs: dict
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    attempts: int = 0
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """SQLite-backed record of unfinished jobs. Finished jobs are deleted, failed ones kept."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, name TEXT, payload TEXT, attempts INTEGER,"
+                " status TEXT, owner INTEGER, last_error TEXT, created_at REAL)"
+            )
+
+    def add(self, job: Job):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, 'pending', ?, NULL, ?)",
+                (job.id, job.name, json.dumps(job.kwargs), job.attempts, os.getpid(), time.time())
+            )
+
+    def retrying(self, job: Job, error: str):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET attempts = ?, last_error = ? WHERE id = ?", (job.attempts, error, job.id))
+
+    def done(self, job: Job):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+
+    def failed(self, job: Job, error: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                (job.attempts, error, job.id)
+            )
+
+    def recover(self):
+        """Claim pending jobs left behind by processes that are no longer running."""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, name, payload, attempts, owner FROM jobs WHERE status = 'pending'").fetchall()
+            jobs = []
+            for job_id, name, payload, attempts, owner in rows:
+                if owner != os.getpid() and _pid_alive(owner):
+                    continue
+                self._conn.execute("UPDATE jobs SET owner = ? WHERE id = ?", (os.getpid(), job_id))
+                jobs.append(Job(name=name, kwargs=json.loads(payload), id=job_id, attempts=attempts))
+            return jobs
+
+
+class JobQueue:
+    def __init__(self, limits=None, max_concurrency=JOB_MAX_CONCURRENCY, max_pending=JOB_MAX_PENDING, store_path=JOB_STORE_PATH):
+        self.limits = dict(DEFAULT_QUEUE_LIMITS, **_parse_limits(os.getenv("JOB_QUEUE_LIMITS")), **(limits or {}))
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.store_path = store_path
+        self.store = None
+        self._registry: Dict[str, JobSpec] = {}
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._queues_lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._unfinished = 0
+        self._idle = threading.Condition()
+
+    def job(self, name: str, queue: str = "default", max_attempts: int = 3, backoff: float = 1.0, on_failure: Callable = None):
+        """
+        Register a handler: @job_queue.job("bot_reply", queue="llm")
+        `on_failure(**kwargs)` runs once the last attempt has failed.
+        """
+        def decorator(func):
+            self._registry[name] = JobSpec(func, queue, max_attempts, backoff, on_failure)
+            return func
+        return decorator
+
+    def enqueue(self, name: str, **kwargs) -> str:
+        """Schedule a registered job. kwargs must be JSON-serializable. Safe to call from any thread."""
+        if name not in self._registry:
+            raise KeyError(f"Unknown job: {name}")
+        self.start()
+        with self._idle:
+            if self._unfinished >= self.max_pending:
+                raise QueueFull(f"{self._unfinished} jobs pending")
+            self._unfinished += 1
+        job = Job(name=name, kwargs=kwargs)
+        if self.store:
+            self.store.add(job)
+        self._loop.call_soon_threadsafe(self._queue_for(job).put_nowait, job)
+        return job.id
+
+    def start(self):
+        """Start the job loop thread (lazily, so each forked worker gets its own)."""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            if self.store_path:
+                self.store = JobStore(self.store_path)
+            self._loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run_loop, args=(ready,), name="job-queue", daemon=True)
+            self._thread.start()
+            ready.wait()
+        if self.store:
+            for job in self.store.recover():
+                with self._idle:
+                    self._unfinished += 1
+                self._loop.call_soon_threadsafe(self._queue_for(job).put_nowait, job)
+
+    @property
+    def pending(self) -> int:
+        """Jobs enqueued and not yet finished (queued, running or waiting to retry)."""
+        return self._unfinished
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Block until every enqueued job has finished (or failed for good)."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._unfinished == 0, timeout)
+
+    def stop(self, timeout: float = 10.0):
+        """Give running jobs `timeout` seconds, then stop. Persisted leftovers resume on next start."""
+        if self._thread is None:
+            return
+        self.wait_idle(timeout)
+        asyncio.run_coroutine_threadsafe(self._cancel_workers(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._thread = None
+        self._queues = {}
+
+    async def _cancel_workers(self):
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _run_loop(self, ready: threading.Event):
+        asyncio.set_event_loop(self._loop)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        ready.set()
+        self._loop.run_forever()
+
+    def _queue_for(self, job: Job) -> asyncio.Queue:
+        # Only called from enqueue/start; queues and their workers are created on first use
+        queue_name = self._registry[job.name].queue if job.name in self._registry else "default"
+        with self._queues_lock:
+            if queue_name not in self._queues:
+                queue = asyncio.Queue()
+                self._queues[queue_name] = queue
+                for _ in range(self.limits.get(queue_name, 1)):
+                    asyncio.run_coroutine_threadsafe(self._worker(queue), self._loop)
+            return self._queues[queue_name]
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            job = await queue.get()
+            async with self._slots:
+                await self._run(job, queue)
+
+    async def _run(self, job: Job, queue: asyncio.Queue):
+        spec = self._registry.get(job.name)
+        if spec is None:
+            self._finish(job, error="handler not registered")
+            return
+        job.attempts += 1
+        try:
+            if asyncio.iscoroutinefunction(spec.func):
+                await spec.func(**job.kwargs)
+            else:
+                await asyncio.to_thread(spec.func, **job.kwargs)
+        except Exception as e:
+            if job.attempts < spec.max_attempts:
+                delay = spec.backoff * 2 ** (job.attempts - 1) * random.uniform(0.8, 1.2)
+                logger.warning("⚠️ Job %s failed (attempt %d/%d), retrying in %.1fs: %s", job.name, job.attempts, spec.max_attempts, delay, e,
+                               extra={"job": job.name, "job_id": job.id})
+                if self.store:
+                    self.store.retrying(job, str(e))
+                self._loop.call_later(delay, queue.put_nowait, job)
+                return
+            logger.error("❌ Job %s failed after %d attempts: %s", job.name, job.attempts, e, extra={"job": job.name, "job_id": job.id})
+            if spec.on_failure:
+                try:
+                    if asyncio.iscoroutinefunction(spec.on_failure):
+                        await spec.on_failure(**job.kwargs)
+                    else:
+                        await asyncio.to_thread(spec.on_failure, **job.kwargs)
+                except Exception as hook_error:
+                    logger.exception("❌ on_failure hook of %s failed: %s", job.name, hook_error)
+            self._finish(job, error=str(e))
+            return
+        self._finish(job)
+
+    def _finish(self, job: Job, error: str = None):
+        if self.store:
+            if error is None:
+                self.store.done(job)
+            else:
+                self.store.failed(job, error)
+        with self._idle:
+            self._unfinished -= 1
+            self._idle.notify_all()
+
+
+job_queue = JobQueue()
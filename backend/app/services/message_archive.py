@@ -0,0 +1,306 @@
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+import orjson
+from sqlalchemy import (
+    Column, DateTime, Index, Integer, LargeBinary, MetaData, String, Table,
+    and_, delete, func, inspect, insert, or_, select, text,
+)
+from sqlalchemy.orm import Session
+from app.models.archived_conversation import ArchivedConversation
+from app.models.message import Message
+from app.services.message_buffer import with_pending
+
+# Hot/cold message storage.
+# `messages` only keeps the recent part of each conversation: archive_messages()
+# moves rows older than ARCHIVE_AFTER_DAYS (except each conversation's newest
+# ARCHIVE_KEEP_RECENT) into zlib-compressed chunks, partitioned by month
+# (native LIST partitions of `message_archive` on Postgres, one
+# `message_archive_YYYY_MM` table per month elsewhere). History reads touch the
+# archive only when a client pages past the oldest hot message.
+# Run it from one place (cron: archive_messages.py, or POST /api/admin/messages/archive).
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_KEEP_RECENT = int(os.getenv("ARCHIVE_KEEP_RECENT", "50"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "5000"))
+CHUNK_MAX_MESSAGES = 500
+DELETE_BATCH = 5000  # keep IN (...) lists under the SQLite variable limit
+HISTORY_PAGE_DEFAULT = 50
+HISTORY_PAGE_MAX = 200
+
+ARCHIVE_TABLE = "message_archive"
+_MONTH_TABLE = re.compile(rf"^{ARCHIVE_TABLE}_\d{{4}}_\d{{2}}$")
+
+_PG_PARENT_DDL = [
+    f"""CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE} (
+        id BIGSERIAL, month VARCHAR(7) NOT NULL, user_id INTEGER NOT NULL, match_id VARCHAR NOT NULL,
+        first_id INTEGER NOT NULL, last_id INTEGER NOT NULL, first_ts TIMESTAMP NOT NULL, last_ts TIMESTAMP NOT NULL,
+        message_count INTEGER NOT NULL, toxic_count INTEGER NOT NULL, payload BYTEA NOT NULL,
+        PRIMARY KEY (month, id)
+    ) PARTITION BY LIST (month)""",
+    f"CREATE INDEX IF NOT EXISTS ix_{ARCHIVE_TABLE}_conversation ON {ARCHIVE_TABLE} (user_id, match_id, last_id)",
+]
+
+_metadata = MetaData()
+_tables = {}
+_tables_lock = threading.Lock()
+_pg_partitions = set()  # months whose partition this process has already created
+
+
+def _chunk_table(name: str) -> Table:
+    with _tables_lock:
+        table = _tables.get(name)
+        if table is None:
+            table = _tables[name] = Table(
+                name, _metadata,
+                Column("id", Integer, primary_key=True),
+                Column("month", String(7), nullable=False),
+                Column("user_id", Integer, nullable=False),
+                Column("match_id", String, nullable=False),
+                Column("first_id", Integer, nullable=False),
+                Column("last_id", Integer, nullable=False),
+                Column("first_ts", DateTime, nullable=False),
+                Column("last_ts", DateTime, nullable=False),
+                Column("message_count", Integer, nullable=False),
+                Column("toxic_count", Integer, nullable=False),
+                Column("payload", LargeBinary, nullable=False),
+                Index(f"ix_{name}_conversation", "user_id", "match_id", "last_id"),
+            )
+        return table
+
+
+def _postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _partition_for(db: Session, month: str) -> Table:
+    """The table chunks of `month` are inserted into, created on first use."""
+    if _postgres(db):
+        if month not in _pg_partitions:
+            for ddl in _PG_PARENT_DDL:
+                db.execute(text(ddl))
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE}_{month} PARTITION OF {ARCHIVE_TABLE} FOR VALUES IN ('{month}')"
+            ))
+            _pg_partitions.add(month)
+        return _chunk_table(ARCHIVE_TABLE)
+    table = _chunk_table(f"{ARCHIVE_TABLE}_{month}")
+    table.create(db.connection(), checkfirst=True)
+    return table
+
+
+def archive_tables(db: Session):
+    """Tables holding archived chunks, newest month first (the partitioned parent on Postgres)."""
+    names = inspect(db.connection()).get_table_names()
+    if _postgres(db):
+        return [_chunk_table(ARCHIVE_TABLE)] if ARCHIVE_TABLE in names else []
+    return [_chunk_table(name) for name in sorted(filter(_MONTH_TABLE.match, names), reverse=True)]
+
+
+def _chunks(user_id: int, match_id: str, month: str, entries):
+    """Chunk rows for one conversation-month. entries: [id, timestamp, sender, text, is_toxic], oldest first."""
+    for start in range(0, len(entries), CHUNK_MAX_MESSAGES):
+        part = entries[start:start + CHUNK_MAX_MESSAGES]
+        yield {
+            "month": month,
+            "user_id": user_id,
+            "match_id": match_id,
+            "first_id": part[0][0],
+            "last_id": part[-1][0],
+            "first_ts": part[0][1],
+            "last_ts": part[-1][1],
+            "message_count": len(part),
+            "toxic_count": sum(1 for e in part if e[4]),
+            "payload": zlib.compress(orjson.dumps(part), 6),
+        }
+
+
+def _entries(payload: bytes):
+    entries = orjson.loads(zlib.decompress(payload))
+    for e in entries:
+        e[1] = datetime.fromisoformat(e[1])
+    return entries
+
+
+def _archivable(db: Session, user_id: int, match_id: str, cutoff: datetime, keep_recent: int):
+    """Messages of one conversation older than cutoff and outside its newest keep_recent, oldest first."""
+    conversation = (Message.user_id == user_id, Message.match_id == match_id)
+    newest_kept = db.execute(
+        select(Message.timestamp, Message.id).where(*conversation)
+        .order_by(Message.timestamp.desc(), Message.id.desc()).offset(keep_recent - 1).limit(1)
+    ).first()
+    if newest_kept is None:
+        return []
+    ts, msg_id = newest_kept
+    return db.execute(
+        select(Message.id, Message.timestamp, Message.sender, Message.text, Message.is_toxic)
+        .where(*conversation, Message.timestamp < cutoff,
+               or_(Message.timestamp < ts, and_(Message.timestamp == ts, Message.id < msg_id)))
+        .order_by(Message.timestamp, Message.id)
+    ).all()
+
+
+def _move(db: Session, user_id: int, match_id: str, rows) -> int:
+    """Write one conversation's rows as chunks, delete them from `messages`, update the catalog."""
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(row.timestamp.strftime("%Y_%m"), []).append(
+            [row.id, row.timestamp, row.sender, row.text, bool(row.is_toxic)]
+        )
+    chunks = 0
+    for month, entries in by_month.items():
+        chunk_rows = list(_chunks(user_id, match_id, month, entries))
+        db.execute(insert(_partition_for(db, month)), chunk_rows)
+        chunks += len(chunk_rows)
+
+    ids = [row.id for row in rows]
+    for start in range(0, len(ids), DELETE_BATCH):
+        db.execute(delete(Message).where(Message.id.in_(ids[start:start + DELETE_BATCH])))
+
+    catalog = db.query(ArchivedConversation).filter(
+        ArchivedConversation.user_id == user_id, ArchivedConversation.match_id == match_id
+    ).first()
+    if catalog is None:
+        catalog = ArchivedConversation(user_id=user_id, match_id=match_id, message_count=0, toxic_count=0)
+        db.add(catalog)
+    catalog.message_count += len(rows)
+    catalog.toxic_count += sum(1 for row in rows if row.is_toxic)
+    catalog.archived_through_id = max(catalog.archived_through_id or 0, ids[-1])
+    catalog.updated_at = datetime.utcnow()
+    return chunks
+
+
+def archive_messages(db: Session, older_than_days: float = ARCHIVE_AFTER_DAYS, keep_recent: int = ARCHIVE_KEEP_RECENT,
+                     batch_size: int = ARCHIVE_BATCH_SIZE, now: datetime = None) -> dict:
+    """Move old messages into the archive, committing every ~batch_size messages."""
+    started = time.perf_counter()
+    cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+    keep_recent = max(1, keep_recent)  # the last message stays hot for GET /api/chats
+    conversations = db.execute(
+        select(Message.user_id, Message.match_id).where(Message.timestamp < cutoff).distinct()
+    ).all()
+
+    report = {"archived": 0, "chunks": 0, "conversations": 0}
+    pending = 0
+    for user_id, match_id in conversations:
+        rows = _archivable(db, user_id, match_id, cutoff, keep_recent)
+        if not rows:
+            continue
+        report["chunks"] += _move(db, user_id, match_id, rows)
+        report["archived"] += len(rows)
+        report["conversations"] += 1
+        pending += len(rows)
+        if pending >= batch_size:
+            db.commit()
+            pending = 0
+    db.commit()
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def compact_archive(db: Session) -> int:
+    """Merge the chunks that repeated archive runs leave per conversation-month. Returns chunks removed."""
+    removed = 0
+    for table in archive_tables(db):
+        c = table.c
+        groups = db.execute(
+            select(c.month, c.user_id, c.match_id).group_by(c.month, c.user_id, c.match_id).having(func.count() > 1)
+        ).all()
+        for month, user_id, match_id in groups:
+            group = (c.month == month, c.user_id == user_id, c.match_id == match_id)
+            chunks = db.execute(select(c.id, c.payload).where(*group).order_by(c.first_ts, c.first_id)).all()
+            entries = [e for chunk in chunks for e in _entries(chunk.payload)]
+            merged = list(_chunks(user_id, match_id, month, entries))
+            if len(merged) >= len(chunks):
+                continue  # already as compact as it gets
+            db.execute(delete(table).where(*group))
+            db.execute(insert(table), merged)
+            removed += len(chunks) - len(merged)
+        db.commit()
+    return removed
+
+
+def run_archival(db: Session, compact: bool = True, **options) -> dict:
+    report = archive_messages(db, **options)
+    report["compacted_chunks"] = compact_archive(db) if compact else 0
+    return report
+
+
+def _older(ts, msg_id, cursor) -> bool:
+    return cursor is None or (ts, msg_id) < cursor
+
+
+def read_archived(db: Session, user_id: int, match_id: str, before=None, limit: int = HISTORY_PAGE_DEFAULT):
+    """Up to `limit` archived messages of a conversation older than the (timestamp, id) cursor `before`, newest first."""
+    found = []
+    for table in archive_tables(db):
+        c = table.c
+        query = select(c.payload).where(c.user_id == user_id, c.match_id == match_id)
+        if before is not None:
+            query = query.where(c.first_ts <= before[0])
+        for payload in db.execute(query.order_by(c.last_ts.desc(), c.last_id.desc())).scalars():
+            for msg_id, ts, sender, body, is_toxic in reversed(_entries(payload)):
+                if not _older(ts, msg_id, before):
+                    continue
+                found.append(Message(id=msg_id, user_id=user_id, match_id=match_id, text=body,
+                                     sender=sender, timestamp=ts, is_toxic=is_toxic))
+                if len(found) >= limit:
+                    return found
+    return found
+
+
+def _cursor(db: Session, user_id: int, match_id: str, before: int):
+    """(timestamp, id) of message `before`, wherever it is now (hot, not yet flushed or archived); None if unknown."""
+    ts = db.query(Message.timestamp).filter(
+        Message.id == before, Message.user_id == user_id, Message.match_id == match_id
+    ).scalar()
+    if ts is None:
+        ts = next((m.timestamp for m in with_pending([], user_id, match_id) if m.id == before), None)
+    if ts is None:
+        ts = next((m.timestamp for m in read_archived(db, user_id, match_id, limit=sys.maxsize) if m.id == before), None)
+    return (ts, before) if ts is not None else None
+
+
+def history_page(db: Session, user_id: int, match_id: str, before: int = None, limit: int = None):
+    """
+    (messages oldest first, has_more) for a conversation.
+    No before/limit: the whole hot window (what GET /api/chat/{id} always returned).
+    Otherwise the `limit` messages older than message id `before`, continuing into
+    the archive once the hot rows run out.
+    Pages are keyed on (timestamp, id), the order messages are shown in: ids alone
+    don't follow time once write-behind hands each worker its own block of ids.
+    """
+    catalog = db.query(ArchivedConversation.message_count).filter(
+        ArchivedConversation.user_id == user_id, ArchivedConversation.match_id == match_id
+    ).scalar()
+    query = db.query(Message).filter(Message.user_id == user_id, Message.match_id == match_id)
+    if before is None and limit is None:
+        messages = query.order_by(Message.timestamp, Message.id).all()
+        return with_pending(messages, user_id, match_id), bool(catalog)
+
+    limit = limit or HISTORY_PAGE_DEFAULT
+    cursor = None
+    if before is not None:
+        cursor = _cursor(db, user_id, match_id, before)
+        if cursor is None:
+            return [], False
+        ts, msg_id = cursor
+        query = query.filter(or_(Message.timestamp < ts, and_(Message.timestamp == ts, Message.id < msg_id)))
+    newest_first = query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit + 1).all()
+    if before is None:
+        newest_first = with_pending(newest_first[::-1], user_id, match_id)[::-1]
+    page = newest_first[:limit]
+    if len(newest_first) > limit:
+        return page[::-1], True
+    if not catalog:
+        return page[::-1], False
+    if len(page) == limit:
+        return page[::-1], True  # everything archived is older than the hot rows
+
+    if page:
+        cursor = (page[-1].timestamp, page[-1].id)
+    page += read_archived(db, user_id, match_id, cursor, limit - len(page) + 1)
+    return page[:limit][::-1], len(page) > limit
@@ -0,0 +1,237 @@
+import logging
+import os
+import threading
+from collections import deque
+from sqlalchemy import Column, Integer, MetaData, Table, insert, text
+from sqlalchemy.exc import OperationalError
+from app.database import engine, SessionLocal
+from app.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+# Write-behind persistence for chat messages (opt-in).
+# Instead of a commit + refresh per message, rows are queued in memory and a
+# background thread writes them in batches (one executemany + one commit).
+# Ids are handed out up front, so callers can return them before the flush.
+WRITE_BEHIND_ENABLED = os.getenv("MESSAGE_WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+FLUSH_INTERVAL_SECONDS = float(os.getenv("MESSAGE_FLUSH_INTERVAL_MS", "50")) / 1000
+FLUSH_SIZE = int(os.getenv("MESSAGE_FLUSH_SIZE", "200"))
+ID_BLOCK_SIZE = int(os.getenv("MESSAGE_ID_BLOCK_SIZE", "100"))
+# Failed batch inserts before the batch is retried row by row, to isolate bad rows
+FLUSH_RETRIES = int(os.getenv("MESSAGE_FLUSH_RETRIES", "3"))
+# Queue cap: past it (database slow or down) messages are written synchronously
+MAX_PENDING = int(os.getenv("MESSAGE_BUFFER_MAX_PENDING", "10000"))
+DEAD_LETTER_MAX = 1000
+
+MESSAGE_COLUMNS = ["id", "user_id", "match_id", "text", "sender", "timestamp", "is_toxic"]
+
+
+# SQLite has no sequences: the highest id handed out so far lives in this one-row table
+_id_metadata = MetaData()
+message_id_blocks = Table(
+    "message_id_blocks", _id_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("high", Integer, nullable=False),
+)
+
+# One statement, so SQLite runs it atomically even with several worker processes:
+# the new block starts after both the last block handed out and the highest stored id
+_SQLITE_RESERVE = text("""
+    INSERT INTO message_id_blocks (id, high) VALUES (1, (SELECT COALESCE(MAX(id), 0) FROM messages) + :n)
+    ON CONFLICT (id) DO UPDATE SET high = MAX(high, (SELECT COALESCE(MAX(id), 0) FROM messages)) + :n
+    RETURNING high
+""")
+
+
+class IdAllocator:
+    """
+    Reserves message ids in blocks, safe across worker processes.
+    Postgres: pulls a block from the table's sequence.
+    SQLite: bumps the counter in message_id_blocks in one atomic statement.
+    With write-behind on, every message insert must take its id from here
+    (save_message does), or SQLite's own max(id) + 1 could reuse a reserved id.
+    """
+
+    def __init__(self, block_size=ID_BLOCK_SIZE):
+        self.block_size = block_size
+        self._ids = deque()
+        self._lock = threading.Lock()
+        self._table_ready = False
+
+    def next_id(self) -> int:
+        with self._lock:
+            if not self._ids:
+                self._reserve()
+            return self._ids.popleft()
+
+    def _reserve(self):
+        with engine.begin() as conn:
+            if engine.dialect.name == "postgresql":
+                rows = conn.execute(
+                    text("SELECT nextval(pg_get_serial_sequence('messages', 'id')) FROM generate_series(1, :n)"),
+                    {"n": self.block_size}
+                )
+                self._ids.extend(r[0] for r in rows)
+                return
+            if not self._table_ready:
+                message_id_blocks.create(conn, checkfirst=True)
+                self._table_ready = True
+            high = conn.execute(_SQLITE_RESERVE, {"n": self.block_size}).scalar_one()
+        self._ids.extend(range(high - self.block_size + 1, high + 1))
+
+
+class MessageBuffer:
+    def __init__(self, interval=FLUSH_INTERVAL_SECONDS, flush_size=FLUSH_SIZE, retries=FLUSH_RETRIES, max_pending=MAX_PENDING):
+        self.interval = interval
+        self.flush_size = flush_size
+        self.retries = retries
+        self.max_pending = max_pending
+        self.dead_letters = deque(maxlen=DEAD_LETTER_MAX)  # rows dropped after the row-by-row retry
+        self._failures = 0  # consecutive failed batch inserts
+        self.ids = IdAllocator()
+        self._pending = []
+        self._in_flight = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush at a time keeps batches in order
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def add(self, **fields) -> Message:
+        """Queue a message and return it with its id already assigned (not yet in the DB)."""
+        msg = Message(id=self.ids.next_id(), **fields)
+        with self._lock:
+            self._pending.append(msg)
+            size = len(self._pending)
+        if self._thread is None:
+            self.start()
+        if size >= self.flush_size:
+            self._wakeup.set()
+        return msg
+
+    def pending(self, user_id, match_id=None):
+        """Queued or flushing messages of one conversation (default: all of the user's), oldest first."""
+        with self._lock:
+            return [m for m in self._in_flight + self._pending if m.user_id == user_id and match_id in (None, m.match_id)]
+
+    def full(self) -> bool:
+        with self._lock:
+            return len(self._pending) >= self.max_pending
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._in_flight = batch
+            if not batch:
+                return 0
+            try:
+                self._insert(batch)
+                self._failures = 0
+                return len(batch)
+            except Exception as e:
+                self._failures += 1
+                if self._failures < self.retries:
+                    logger.warning("❌ Message flush of %d rows failed (attempt %d), will retry: %s", len(batch), self._failures, e)
+                    self._requeue(batch)
+                    return 0
+                logger.warning("❌ Message flush of %d rows failed %d times, retrying row by row: %s", len(batch), self._failures, e)
+                self._failures = 0
+                return self._insert_rows(batch)
+            finally:
+                with self._lock:
+                    self._in_flight = []
+
+    def _insert(self, rows):
+        db = SessionLocal()
+        try:
+            db.execute(insert(Message), [{col: getattr(m, col) for col in MESSAGE_COLUMNS} for m in rows])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _insert_rows(self, batch) -> int:
+        """One insert per row: bad rows are dead-lettered, the rest are written (or requeued if the DB is down)."""
+        written = 0
+        for i, msg in enumerate(batch):
+            try:
+                self._insert([msg])
+                written += 1
+            except OperationalError as e:
+                # Connection or lock trouble, not this row: keep the rest for the next flush
+                logger.warning("❌ Message flush stopped, database unavailable: %s", e)
+                self._requeue(batch[i:])
+                break
+            except Exception as e:
+                logger.error("☠️ Dropping message %s (user %s, match %s) that cannot be stored: %s", msg.id, msg.user_id, msg.match_id, e)
+                self.dead_letters.append(msg)
+        return written
+
+    def _requeue(self, rows):
+        with self._lock:
+            self._pending = rows + self._pending
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="message-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and write out everything still queued (called on shutdown)."""
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._lock:
+            rest, self._pending = self._pending, []
+        if rest:
+            # Last chance: isolate bad rows instead of waiting out the retries
+            self._insert_rows(rest)
+        if self._pending:
+            logger.error("❌ %d queued messages could not be written before shutdown", len(self._pending))
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+message_buffer = MessageBuffer()
+
+
+def save_message(db, **fields) -> Message:
+    """Persist one message, through the write-behind buffer when it is enabled."""
+    if WRITE_BEHIND_ENABLED:
+        if not message_buffer.full():
+            return message_buffer.add(**fields)
+        # Queue at its cap: write this one now, with an allocator id so it can't take a reserved one
+        fields["id"] = message_buffer.ids.next_id()
+    msg = Message(**fields)
+    db.add(msg)
+    db.commit()
+    db.refresh(msg)
+    return msg
+
+
+def with_pending(messages, user_id, match_id):
+    """Append not-yet-flushed messages to a history read from the DB (oldest first)."""
+    if not WRITE_BEHIND_ENABLED:
+        return messages
+    seen = {m.id for m in messages}
+    return messages + [m for m in message_buffer.pending(user_id, match_id) if m.id not in seen]
+
+
+def pending_for_user(user_id):
+    """Not-yet-flushed messages of all the user's conversations (oldest first)."""
+    if not WRITE_BEHIND_ENABLED:
+        return []
+    return message_buffer.pending(user_id)
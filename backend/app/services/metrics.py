@@ -0,0 +1,135 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# Per-stage latency histograms, exposed in Prometheus text format at /metrics.
+#   with stage("predict.model"): ...
+#   @timed("chat.llm_call")
+# With METRICS_ENABLED=0, stage() hands back a shared no-op context manager, so
+# instrumented code pays one function call and nothing else.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL = nullcontext()
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        """(cumulative counts per upper bound incl. +Inf, sum, count)"""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Registry:
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.stages = {}  # stage name -> Histogram
+        self.gauges = {}  # metric name -> (help, value)
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str) -> Histogram:
+        histogram = self.stages.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(name, Histogram())
+        return histogram
+
+    def stage(self, name: str):
+        """Context manager timing one stage into the `name` histogram."""
+        if not self.enabled:
+            return _NULL
+        return _Timer(self.histogram(name))
+
+    def timed(self, name: str):
+        """Decorator version of stage(); works on sync and async functions."""
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.stage(name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def set_gauge(self, name: str, value: float, help_text: str = ""):
+        self.gauges[name] = (help_text, value)
+
+    def render(self, extra_gauges=()) -> str:
+        """Prometheus text exposition. extra_gauges: (name, help, value, labels dict) tuples."""
+        lines = [
+            "# HELP soulsync_stage_duration_seconds Time spent in an instrumented stage.",
+            "# TYPE soulsync_stage_duration_seconds histogram",
+        ]
+        for name, histogram in sorted(self.stages.items()):
+            cumulative, total, count = histogram.snapshot()
+            bounds = [_format(b) for b in histogram.buckets] + ["+Inf"]
+            for bound, value in zip(bounds, cumulative):
+                lines.append(f'soulsync_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {value}')
+            lines.append(f'soulsync_stage_duration_seconds_sum{{stage="{name}"}} {_format(total)}')
+            lines.append(f'soulsync_stage_duration_seconds_count{{stage="{name}"}} {count}')
+
+        gauges = [(name, help_text, value, {}) for name, (help_text, value) in sorted(self.gauges.items())]
+        declared = set()
+        for name, help_text, value, labels in gauges + list(extra_gauges):
+            if value is None:
+                continue
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {_format(value)}" if label_text else f"{name} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format(value) -> str:
+    return repr(float(value)) if not isinstance(value, int) else str(value)
+
+
+metrics = Registry()
+stage = metrics.stage
+timed = metrics.timed
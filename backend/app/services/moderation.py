@@ -0,0 +1,15 @@
+from better_profanity import profanity
+
+# Load the word list once per process instead of on every message
+profanity.load_censor_words()
+
+TOXIC_KEYWORDS = ["hate", "stupid", "idiot", "ugly"]
+TOXIC_WARNING = "This message contains inappropriate content. Please be respectful."
+
+
+def is_toxic(text: str) -> bool:
+    """Profanity filter plus a few extra keywords."""
+    if profanity.contains_profanity(text):
+        return True
+    lowered = text.lower()
+    return any(word in lowered for word in TOXIC_KEYWORDS)
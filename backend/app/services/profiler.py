@@ -0,0 +1,141 @@
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from app.auth_utils import bearer_token, token_subject, is_admin
+
+logger = logging.getLogger(__name__)
+
+# On-demand statistical profiling (off unless PROFILE_DIR is set).
+# A sampler thread reads every thread's stack each PROFILE_INTERVAL_MS and the
+# result is written to PROFILE_DIR in folded-stack format ("a;b;c 12" per line),
+# which flamegraph.pl, speedscope and inferno all read.
+#   - Requests: an admin sends "X-Profile: 1", or PROFILE_SAMPLE_RATE of all requests.
+#   - Startup: PROFILE_STARTUP=1 profiles the model load and the feature stats CSV load.
+# When PROFILE_DIR is unset the middleware isn't installed and the startup hooks
+# are a shared no-op, so there is nothing on the request path at all.
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_STARTUP = bool(PROFILE_DIR) and os.getenv("PROFILE_STARTUP", "0").lower() in ("1", "true", "yes")
+PROFILE_HEADER = "x-profile"
+
+_SLUG = re.compile(r"[^A-Za-z0-9]+")
+_NULL = nullcontext()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})".replace(";", ",")
+
+
+class SamplingProfiler:
+    """
+    Samples call stacks on a background thread.
+    thread_ids=None samples every thread; a request can hop between the event loop
+    and the threadpool, so request profiles include all threads, rooted at the thread
+    name (concurrent requests show up under their own threads too).
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def write(self, tag: str, duration: float, directory: str = PROFILE_DIR) -> str:
+        """Write the folded stacks to <dir>/<time>_<tag>_<duration>ms.folded and return the path."""
+        os.makedirs(directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}_{_SLUG.sub('_', tag).strip('_')}_{duration * 1000:.0f}ms.folded"
+        path = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.write(self.folded())
+        return path
+
+
+@contextmanager
+def _profile_block(tag: str):
+    profiler = SamplingProfiler(thread_ids={threading.get_ident()}).start()
+    started = time.perf_counter()
+    try:
+        yield profiler
+    finally:
+        duration = time.perf_counter() - started
+        path = profiler.stop().write(tag, duration)
+        logger.info("🔥 Profile of %s (%.0f ms, %d samples) written to %s", tag, duration * 1000, profiler.samples, path)
+
+
+def startup_profile(tag: str):
+    """Profile a startup step (this thread only) when PROFILE_STARTUP is on; a no-op otherwise."""
+    if not PROFILE_STARTUP:
+        return _NULL
+    return _profile_block(f"startup_{tag}")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: profile admin requests that ask for it, plus a random sample."""
+
+    def __init__(self, app, sample_rate=PROFILE_SAMPLE_RATE, directory=PROFILE_DIR):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.directory = directory
+
+    def _wants_profile(self, scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER.encode()) not in (b"1", b"true"):
+            return False
+        token = bearer_token(headers.get(b"authorization", b"").decode("latin-1"))
+        return is_admin(token_subject(token) if token else None)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler().start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            duration = time.perf_counter() - started
+            profiler.stop()
+            tag = f"{scope['method']} {scope['path']}"
+            path = profiler.write(tag, duration, self.directory)
+            logger.info("🔥 Profile of %s (%.0f ms, %d samples) written to %s", tag, duration * 1000, profiler.samples, path)
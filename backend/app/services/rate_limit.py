@@ -0,0 +1,192 @@
+import math
+import os
+import threading
+import time
+from sqlalchemy import Column, Float, MetaData, String, Table, case, create_engine, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from app.auth_utils import bearer_token, token_subject
+
+# Token-bucket admission control for the API (opt-in).
+# Every client (JWT subject, or IP address when unauthenticated) has a bucket of
+# RATE_LIMIT_BURST tokens refilled at RATE_LIMIT_PER_SECOND. Each request spends
+# its route's cost; expensive routes cost more. An empty bucket means 429 with
+# Retry-After instead of another bcrypt hash, model run or LLM call queued up.
+# Chat websocket messages are charged to the same buckets (routes/realtime.py).
+# RATE_LIMIT_BACKEND=db keeps the buckets in a shared table so every worker
+# process sees the same counts (default: in-memory, per process).
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "0").lower() in ("1", "true", "yes")
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "60"))
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "2"))
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DATABASE_URL = os.getenv("RATE_LIMIT_DATABASE_URL")  # default: the app database
+# Proxies in front of the app that append to X-Forwarded-For (Render: 1; 0 ignores the header).
+# Hops left of those were written by the client and can't be trusted.
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "1"))
+
+DEFAULT_COST = 1
+ROUTE_COSTS = {
+    ("POST", "/api/auth/login"): 10,  # bcrypt verify
+    ("POST", "/api/auth/register"): 10,  # bcrypt hash
+    ("POST", "/api/chat/send"): 5,  # LLM call
+    ("POST", "/api/predict_compatibility"): 5,  # model run + DB writes
+    ("POST", "/api/admin/users/import"): 60,  # bulk bcrypt hashing
+}
+EXEMPT_PATHS = {"/", "/docs", "/openapi.json", "/redoc"}
+
+
+def route_cost(method: str, path: str) -> int:
+    return ROUTE_COSTS.get((method, path.rstrip("/") or "/"), DEFAULT_COST)
+
+
+def user_key(subject: str) -> str:
+    return f"user:{subject}"
+
+
+def client_key(headers: dict, client_host: str, trusted_proxies: int = RATE_LIMIT_TRUSTED_PROXIES) -> str:
+    """'user:<email>' for a valid bearer token, otherwise 'ip:<address>'."""
+    token = bearer_token(headers.get("authorization"))
+    sub = token_subject(token) if token else None
+    if sub:
+        return user_key(sub)
+    hops = [h.strip() for h in headers.get("x-forwarded-for", "").split(",") if h.strip()]
+    if trusted_proxies > 0 and len(hops) >= trusted_proxies:
+        # The address our outermost trusted proxy saw; anything before it is client-supplied
+        client_host = hops[-trusted_proxies]
+    return f"ip:{client_host or 'unknown'}"
+
+
+class MemoryBuckets:
+    """Per-process buckets. A missing bucket is a full one, so idle buckets are pruned."""
+
+    def __init__(self, burst=RATE_LIMIT_BURST, rate=RATE_LIMIT_PER_SECOND, max_keys=100_000):
+        self.burst = burst
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float):
+        """Spend `cost` tokens. Returns (allowed, retry_after_seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self._buckets[key] = [self.burst, now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= cost:
+                bucket[0] = tokens - cost
+                return True, 0.0
+            bucket[0] = tokens
+            return False, (cost - tokens) / self.rate
+
+    def _prune(self, now: float):
+        refill_time = self.burst / self.rate
+        for key in [k for k, (_, updated) in self._buckets.items() if now - updated >= refill_time]:
+            del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+_metadata = MetaData()
+rate_limit_buckets = Table(
+    "rate_limit_buckets", _metadata,
+    Column("key", String, primary_key=True),
+    Column("tokens", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),  # unix time, comparable across workers
+)
+
+
+class DatabaseBuckets:
+    """
+    Buckets in a shared SQLite/Postgres table, for consistent limits across workers.
+    Refill and spend happen in one conditional UPDATE, so concurrent requests for the
+    same key can't both spend the last tokens.
+    """
+
+    def __init__(self, burst=RATE_LIMIT_BURST, rate=RATE_LIMIT_PER_SECOND, url=RATE_LIMIT_DATABASE_URL):
+        self.burst = burst
+        self.rate = rate
+        if url:
+            connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+            self.engine = create_engine(url, connect_args=connect_args)
+        else:
+            from app.database import engine
+            self.engine = engine
+        _metadata.create_all(self.engine)
+
+    def take(self, key: str, cost: float):
+        now = time.time()
+        t = rate_limit_buckets.c
+        refilled = t.tokens + (now - t.updated_at) * self.rate
+        available = case((refilled > self.burst, self.burst), else_=refilled)
+        with self.engine.begin() as conn:
+            spent = conn.execute(
+                update(rate_limit_buckets)
+                .where(t.key == key, available >= cost)
+                .values(tokens=available - cost, updated_at=now)
+            )
+            if spent.rowcount == 1:
+                return True, 0.0
+            tokens = conn.execute(select(available).where(t.key == key)).scalar()
+        if tokens is None:
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(rate_limit_buckets).values(key=key, tokens=self.burst - cost, updated_at=now))
+                return True, 0.0
+            except IntegrityError:
+                # Another worker created it first; go through the normal path
+                return self.take(key, cost)
+        return False, max(cost - tokens, 0.0) / self.rate
+
+    def clear(self):
+        with self.engine.begin() as conn:
+            conn.execute(rate_limit_buckets.delete())
+
+
+# The app's buckets, shared by the HTTP middleware and the chat websocket (None when disabled)
+shared_buckets = (DatabaseBuckets() if RATE_LIMIT_BACKEND == "db" else MemoryBuckets()) if RATE_LIMIT_ENABLED else None
+
+
+async def spend(buckets, key: str, cost: float):
+    """buckets.take() without blocking the event loop on the shared table."""
+    if isinstance(buckets, MemoryBuckets):
+        return buckets.take(key, cost)
+    return await run_in_threadpool(buckets.take, key, cost)
+
+
+class RateLimitMiddleware:
+    """ASGI middleware: charge each HTTP request to its client's bucket, 429 when empty."""
+
+    def __init__(self, app, buckets=None, enabled=RATE_LIMIT_ENABLED):
+        self.app = app
+        self.enabled = enabled
+        if buckets is None and enabled:
+            buckets = shared_buckets if shared_buckets is not None else MemoryBuckets()
+        self.buckets = buckets
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope["path"] in EXEMPT_PATHS or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        key = client_key(headers, scope["client"][0] if scope.get("client") else None)
+        cost = route_cost(scope["method"], scope["path"])
+        allowed, retry_after = await spend(self.buckets, key, cost)
+
+        if not allowed:
+            response = JSONResponse(
+                {"detail": "Too many requests, slow down."},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
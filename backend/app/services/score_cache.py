@@ -0,0 +1,75 @@
+import os
+from datetime import datetime
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+from app.model_loader import loader
+from app.models.user import User
+from app.models.compatibility_score import CompatibilityScore
+from app.services.candidates import LOAD_BATCH, nearby_candidates
+from app.utils.bio_analyzer import analyze_bio
+from app.utils.pairwise import profile_arrays, model_probabilities, pairwise_scores
+
+# Keeps the precomputed `compatibility_scores` rows (see score_pairs.py) fresh
+# for one user after their profile changes, without rerunning the bulk job.
+# Both writers store the same thing: the pairwise score (pairwise.pairwise_scores,
+# the scale /nearby and /scores serve) of each user's closest candidates.
+MAX_SCORED_CANDIDATES = int(os.getenv("SCORE_MAX_CANDIDATES", "500"))
+
+
+def bio_sentiments(users):
+    """Stored sentiment where we have it, computed otherwise."""
+    return [u.bio_sentiment if u.bio_sentiment is not None else analyze_bio(u.bio_text) for u in users]
+
+
+def _score_rows(user_ids, candidate_ids, block):
+    now = datetime.utcnow()
+    return [
+        {
+            "user_id": uid,
+            "candidate_id": cid,
+            "score": float(block[i, j] * 100),
+            "ghosting_probability": float((1.0 - block[i, j]) * 100),
+            "computed_at": now,
+        }
+        for i, uid in enumerate(user_ids)
+        for j, cid in enumerate(candidate_ids)
+    ]
+
+
+def refresh_user_scores(db: Session, user_id: int) -> int:
+    """
+    Rescore (pairwise) the user's closest MAX_SCORED_CANDIDATES candidates, and every existing row where
+    the user is somebody else's candidate. Returns the number of rows written.
+    """
+    user = db.get(User, user_id)
+    if user is None or not loader.model:
+        return 0
+    user_arrays = profile_arrays([user], bio_sentiments([user]))
+
+    # The user as requester
+    candidates = [c for c, _ in nearby_candidates(db, user, limit=MAX_SCORED_CANDIDATES)]
+    rows = []
+    if candidates:
+        cand_arrays = profile_arrays(candidates, bio_sentiments(candidates))
+        block = pairwise_scores(user_arrays, cand_arrays, model_probabilities(loader.model, cand_arrays))
+        rows += _score_rows([user.id], [c.id for c in candidates], block)
+
+    db.execute(delete(CompatibilityScore).where(CompatibilityScore.user_id == user.id))
+    if rows:
+        db.execute(insert(CompatibilityScore), rows)
+    written = len(rows)
+
+    # The user as candidate of others: replace those rows in batches, a popular user has many
+    requester_ids = [uid for (uid,) in db.query(CompatibilityScore.user_id).filter(CompatibilityScore.candidate_id == user.id)]
+    db.execute(delete(CompatibilityScore).where(CompatibilityScore.candidate_id == user.id))
+    user_probs = model_probabilities(loader.model, user_arrays)
+    for start in range(0, len(requester_ids), LOAD_BATCH):
+        requesters = db.query(User).filter(User.id.in_(requester_ids[start:start + LOAD_BATCH])).all()
+        if not requesters:
+            continue
+        block = pairwise_scores(profile_arrays(requesters, bio_sentiments(requesters)), user_arrays, user_probs)
+        rows = _score_rows([r.id for r in requesters], [user.id], block)
+        db.execute(insert(CompatibilityScore), rows)
+        written += len(rows)
+    db.commit()
+    return written
@@ -0,0 +1,80 @@
+import logging
+from app.database import SessionLocal
+from app.models.user import User
+from app.services.jobs import job_queue, QueueFull
+from app.services.score_cache import refresh_user_scores
+from app.utils.bio_analyzer import analyze_bio
+
+logger = logging.getLogger(__name__)
+
+# Background job handlers. Enqueue with job_queue.enqueue("<name>", **kwargs).
+
+
+async def _bot_reply_failed(user_id: int, match_id: str, text: str):
+    # Out of retries: answer with the usual fallback so the conversation doesn't just hang
+    from app.services.ai_service import FALLBACK_REPLY
+    from app.services.chat_service import save_bot_message
+    db = SessionLocal()
+    try:
+        await save_bot_message(db, user_id, match_id, FALLBACK_REPLY)
+    finally:
+        db.close()
+
+
+@job_queue.job("bot_reply", queue="llm", max_attempts=3, backoff=2.0, on_failure=_bot_reply_failed)
+async def bot_reply(user_id: int, match_id: str, text: str):
+    from app.services.chat_service import reply_as_bot
+    db = SessionLocal()
+    try:
+        await reply_as_bot(db, user_id, match_id, text, fallback_on_error=False)
+    finally:
+        db.close()
+
+
+@job_queue.job("bio_sentiment")
+def bio_sentiment(user_id: int):
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        if user is not None:
+            user.bio_sentiment = analyze_bio(user.bio_text)
+            db.commit()
+    finally:
+        db.close()
+    # Scores depend on the sentiment, so refresh them only once it is stored
+    try:
+        job_queue.enqueue("refresh_scores", user_id=user_id)
+    except QueueFull:
+        # Raising would retry this job and recompute the sentiment it already stored
+        logger.warning("⚠️ Job queue full, skipped the score refresh for user %s", user_id)
+
+
+@job_queue.job("refresh_scores", queue="scores")
+def refresh_scores(user_id: int):
+    db = SessionLocal()
+    try:
+        refresh_user_scores(db, user_id)
+    finally:
+        db.close()
+
+
+@job_queue.job("archive_messages", max_attempts=1)
+def archive_messages(**options):
+    from app.services.message_archive import run_archival
+    db = SessionLocal()
+    try:
+        report = run_archival(db, **options)
+    finally:
+        db.close()
+    logger.info("🗄️ Archived %d messages from %d conversations (%d chunks, %d merged) in %ss",
+                report["archived"], report["conversations"], report["chunks"], report["compacted_chunks"],
+                report["seconds"], extra={"report": report})
+
+
+def profile_changed(user_id: int):
+    """Recompute everything derived from a user's profile, off the request path."""
+    try:
+        job_queue.enqueue("bio_sentiment", user_id=user_id)
+    except QueueFull:
+        # Derived data only; the next profile save or score_pairs run catches up
+        logger.warning("⚠️ Job queue full, skipped derived-data refresh for user %s", user_id)
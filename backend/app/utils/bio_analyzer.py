@@ -1,11 +1,17 @@
-from textblob import TextBlob
+_TextBlob = None
 
 def analyze_bio(text: str) -> float:
     """
     Analyzes the sentiment of the bio text.
     Returns a polarity score between -1.0 and 1.0.
     """
+    global _TextBlob
     if not text:
         return 0.0
-    blob = TextBlob(text)
+    if _TextBlob is None:
+        # TextBlob imports nltk, scipy and scikit-learn (~150 MB per worker),
+        # so only load it once a bio actually needs scoring
+        from textblob import TextBlob
+        _TextBlob = TextBlob
+    blob = _TextBlob(text)
     return blob.sentiment.polarity
@@ -1,21 +1,33 @@
+import logging
 import pandas as pd
 import json
 import os
 import numpy as np
+import time
+from app.services.metrics import metrics
+from app.services.profiler import startup_profile
+from app.services.memory import release_memory
+
+logger = logging.getLogger(__name__)
 
 class FeatureStats:
+    """Training-set mean/std per numeric column, as float32 arrays (the CSV frame is dropped after loading)."""
     _instance = None
-    stats = {}
+    columns = {}  # column -> index into mean/std
+    mean = np.zeros(0, dtype=np.float32)
+    std = np.ones(0, dtype=np.float32)
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(FeatureStats, cls).__new__(cls)
-            cls._instance._load_stats()
+            with startup_profile("feature_stats"):
+                cls._instance._load_stats()
         return cls._instance
 
     def _load_stats(self):
         # We need Mean and Std for numeric columns to scale inputs manually
         # since the provided scaler.pkl is suspicious.
+        started = time.perf_counter()
         csv_path = "/Users/shyamganeshs/data science/01_python_programming/india_matchmaking_dataset_5000.csv"
         
         if os.path.exists(csv_path):
@@ -25,19 +37,29 @@ class FeatureStats:
             # We'll valid types
             numerics = df.select_dtypes(include=[np.number])
             
-            self.stats = {
-                "mean": numerics.mean().to_dict(),
-                "std": numerics.std().to_dict()
-            }
-            print(f"✅ Feature stats loaded from CSV. (Columns: {len(self.stats['mean'])})")
+            self.columns = {col: i for i, col in enumerate(numerics.columns)}
+            self.mean = numerics.mean().to_numpy(dtype=np.float32)
+            self.std = numerics.std().to_numpy(dtype=np.float32)
+            del df, numerics
+            release_memory()
+            logger.info("✅ Feature stats loaded from CSV. (Columns: %d)", len(self.columns))
         else:
-            print("❌ CSV for feature stats not found. using defaults.")
-            self.stats = {"mean": {}, "std": {}}
+            logger.warning("❌ CSV for feature stats not found. using defaults.")
+        metrics.set_gauge("soulsync_feature_stats_load_seconds", time.perf_counter() - started, "Time spent loading the feature stats CSV.")
+
+    def __contains__(self, col: str) -> bool:
+        return col in self.columns
 
     def get_mean(self, col: str, default=0.0):
-        return self.stats["mean"].get(col, default)
+        i = self.columns.get(col)
+        return default if i is None else float(self.mean[i])
 
     def get_std(self, col: str, default=1.0):
-        return self.stats["std"].get(col, default)
+        i = self.columns.get(col)
+        return default if i is None else float(self.std[i])
+
+    @property
+    def nbytes(self) -> int:
+        return self.mean.nbytes + self.std.nbytes
 
 feature_stats = FeatureStats()
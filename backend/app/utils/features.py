@@ -0,0 +1,100 @@
+import pandas as pd
+from app.utils.mappings import mappings
+from app.utils.bio_analyzer import analyze_bio
+from app.utils.feature_stats import feature_stats
+from app.services.metrics import stage
+
+# The CatBoost model expects specific feature names.
+# We must match the order from inspect_model output.
+EXPECTED_FEATURES = [
+    'age', 'gender', 'location', 'openness', 'extroversion', 'agreeableness',
+    'neuroticism', 'conscientiousness', 'words_of_affirmation', 'quality_time',
+    'gifts', 'physical_touch', 'acts_of_service', 'likes_music', 'likes_travel',
+    'likes_pets', 'foodie', 'gym_person', 'movie_lover', 'gamer', 'reader',
+    'night_owl', 'early_bird', 'zodiac_sign', 'relationship_goal', 'fav_music_genre',
+    'bio_text', 'bio_sentiment', 'humor_score', 'confidence_score', 'reply_time_avg',
+    'msg_length_avg', 'sentiment_chat', 'engagement_rate', 'compatibility_score',
+    'ghosting_probability', 'toxicity_label'
+]
+
+NUMERIC_FEATURES = [
+    "age", "openness", "extroversion", "agreeableness", "neuroticism", "conscientiousness",
+    "words_of_affirmation", "quality_time", "gifts", "physical_touch", "acts_of_service",
+    "likes_music", "likes_travel", "likes_pets", "foodie", "gym_person", "movie_lover",
+    "gamer", "reader", "night_owl", "early_bird",
+]
+
+CATEGORICAL_FEATURES = ["gender", "location", "zodiac_sign", "relationship_goal", "fav_music_genre"]
+
+# These are features the model expects but a new user doesn't have yet.
+# We use the mean from the training set to "neutralize" them.
+MISSING_FEATURES = [
+    "humor_score", "confidence_score", "reply_time_avg", "msg_length_avg",
+    "sentiment_chat", "engagement_rate",
+    # Targets that are used as input (Model Artifact Issue)
+    "compatibility_score", "ghosting_probability", "toxicity_label"
+]
+
+
+def encode(col, val):
+    """Map a categorical value to the ordinal code used at training time."""
+    val_str = str(val).lower() if isinstance(val, str) else str(val)
+    # Try exact match first
+    if val in mappings.get(col, {}):
+        return mappings[col][val]
+    # Try lowercase match
+    for k, v in mappings.get(col, {}).items():
+        if k.lower() == val_str:
+            return v
+    # Default/Unknown
+    return 0
+
+
+def build_feature_row(profile, bio_sentiment=None) -> dict:
+    """
+    Build the raw (unscaled) feature dict for one profile.
+    `profile` can be a UserProfile or a User row - anything with the profile attributes.
+    """
+    # 1. Basic Features
+    data = {col: getattr(profile, col) for col in NUMERIC_FEATURES}
+
+    # 2. Categorical Features
+    with stage("features.encode"):
+        for col in CATEGORICAL_FEATURES:
+            data[col] = encode(col, getattr(profile, col))
+
+    # 3. Bio
+    # We map bio_text to 0 (unknown) because exact text match is impossible
+    data["bio_text"] = 0
+    # Calculate sentiment dynamically
+    if bio_sentiment is None:
+        with stage("features.bio_sentiment"):
+            bio_sentiment = analyze_bio(profile.bio_text)
+    data["bio_sentiment"] = bio_sentiment
+
+    # 4. Fill Behavioral/Missing Features with Dataset Mean
+    for feat in MISSING_FEATURES:
+        data[feat] = feature_stats.get_mean(feat)
+
+    return data
+
+
+def scale_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Apply scaling manually: (x - mean) / std for every column in feature_stats.
+    Notebook scaled almost everything including binary.
+    """
+    for col in df.columns:
+        if col in feature_stats:
+            mean = feature_stats.get_mean(col)
+            std = feature_stats.get_std(col)
+            if std == 0: std = 1
+            df[col] = (df[col] - mean) / std
+    return df
+
+
+def build_feature_frame(rows) -> pd.DataFrame:
+    """Turn a list of raw feature dicts into a scaled DataFrame in model column order."""
+    with stage("features.scale"):
+        df = pd.DataFrame(rows, columns=EXPECTED_FEATURES)
+        return scale_features(df)
@@ -0,0 +1,103 @@
+import math
+
+# Offline city -> (latitude, longitude) table.
+# Covers every location in mappings.json plus common alternate spellings.
+CITY_COORDS = {
+    "Coimbatore": (11.0168, 76.9558),
+    "Delhi": (28.6139, 77.2090),
+    "Hyderabad": (17.3850, 78.4867),
+    "Surat": (21.1702, 72.8311),
+    "Vizag": (17.6868, 83.2185),
+    "Jaipur": (26.9124, 75.7873),
+    "Pune": (18.5204, 73.8567),
+    "Trichy": (10.7905, 78.7047),
+    "Kochi": (9.9312, 76.2673),
+    "Madurai": (9.9252, 78.1198),
+    "Kolkata": (22.5726, 88.3639),
+    "Ahmedabad": (23.0225, 72.5714),
+    "Bangalore": (12.9716, 77.5946),
+    "Chennai": (13.0827, 80.2707),
+    "Mumbai": (19.0760, 72.8777),
+}
+
+CITY_ALIASES = {
+    "new delhi": "Delhi",
+    "visakhapatnam": "Vizag",
+    "tiruchirappalli": "Trichy",
+    "cochin": "Kochi",
+    "bengaluru": "Bangalore",
+    "madras": "Chennai",
+    "bombay": "Mumbai",
+    "calcutta": "Kolkata",
+}
+
+_CITY_LOOKUP = {name.lower(): coords for name, coords in CITY_COORDS.items()}
+_CITY_LOOKUP.update({alias: CITY_COORDS[city] for alias, city in CITY_ALIASES.items()})
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = 111.32
+
+# Grid index: the globe is cut into CELL_DEG x CELL_DEG cells (~55 km at the equator).
+# A user's cell id is stored in an indexed column, so a radius query becomes
+# an IN (...) lookup over the handful of cells the circle touches.
+CELL_DEG = 0.5
+_LON_CELLS = int(360 / CELL_DEG)
+MAX_QUERY_CELLS = 400  # above this a lat/lon bounding box is cheaper than a huge IN list
+
+
+def city_coordinates(location):
+    """(lat, lon) for a free-text city, or None if it isn't in the table."""
+    if not location:
+        return None
+    return _CITY_LOOKUP.get(location.strip().lower())
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _cell_index(lat, lon):
+    row = int(math.floor((lat + 90) / CELL_DEG))
+    col = int(math.floor((lon + 180) / CELL_DEG)) % _LON_CELLS
+    return row, col
+
+
+def grid_cell(lat, lon) -> int:
+    row, col = _cell_index(lat, lon)
+    return row * _LON_CELLS + col
+
+
+def bounding_box(lat, lon, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon) enclosing the circle."""
+    dlat = radius_km / KM_PER_DEG_LAT
+    dlon = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def cells_within(lat, lon, radius_km):
+    """Every grid cell overlapping the circle's bounding box, or None if that is too many."""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    if max_lon - min_lon >= 360:
+        return None
+    row_lo, col_lo = _cell_index(max(min_lat, -90), min_lon)
+    row_hi, col_hi = _cell_index(min(max_lat, 89.999), max_lon)
+    n_cols = (col_hi - col_lo) % _LON_CELLS + 1
+    if (row_hi - row_lo + 1) * n_cols > MAX_QUERY_CELLS:
+        return None
+    return [
+        row * _LON_CELLS + (col_lo + i) % _LON_CELLS
+        for row in range(row_lo, row_hi + 1)
+        for i in range(n_cols)
+    ]
+
+
+def apply_location(user):
+    """Persist coordinates and grid cell for the user's city (cleared if the city is unknown)."""
+    coords = city_coordinates(user.location)
+    if coords is None:
+        user.latitude = user.longitude = user.geo_cell = None
+    else:
+        user.latitude, user.longitude = coords
+        user.geo_cell = grid_cell(*coords)
@@ -0,0 +1,74 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+# Fast JSON responses and HTTP conditional requests (ETag / Last-Modified -> 304).
+# Mobile clients re-fetch the same few endpoints constantly; a 304 skips the body
+# (and for static payloads, the work of building it).
+
+APP_STARTED = datetime.now(timezone.utc).replace(microsecond=0)
+# Identifies the code + model artifacts that produced a response. Render sets
+# RENDER_GIT_COMMIT; locally every restart counts as a new build.
+BUILD_ID = os.getenv("RENDER_GIT_COMMIT") or os.getenv("BUILD_ID") or APP_STARTED.isoformat()
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (several times faster than json.dumps)."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def etag_for(*parts) -> str:
+    """Weak ETag (weak, because GZipMiddleware may re-encode the body)."""
+    digest = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def not_modified(request: Request, etag: str, last_modified: datetime = None) -> bool:
+    """RFC 9110: If-None-Match wins; If-Modified-Since is only used without it."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return _as_utc(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def validator_headers(etag: str, last_modified: datetime = None, cache_control: str = "private, no-cache") -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+
+def conditional_json(request: Request, body: bytes, etag: str = None, last_modified: datetime = None,
+                     cache_control: str = "private, no-cache") -> Response:
+    """200 with the (already serialized) body and validators, or an empty 304 if the client's copy is current."""
+    etag = etag or etag_for(body)
+    headers = validator_headers(etag, last_modified, cache_control)
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
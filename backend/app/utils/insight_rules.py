@@ -0,0 +1,224 @@
+import numpy as np
+from app.utils.pairwise import TRAITS, LOVE_LANGUAGES
+from app.utils.profile_batch import field_values
+
+# Rule-based insights: personality flags, icebreakers, relationship timeline,
+# safety score and match details. None of it needs the model, so it is kept as
+# data here and compiled once into predicate tables; evaluate() then handles any
+# number of profiles with a handful of array ops (see /api/discovery/insights/lite).
+#
+# A predicate is (field, op, value):
+#   (field, ">", x)       numeric threshold (missing values never match)
+#   (field, "==", value)  category match (zodiac_sign, relationship_goal, ...)
+#   (field, "truthy", None)  interest flags and other non-zero values
+# `ghosting_prob` is only known when the model ran; in lite mode its rules never fire.
+
+FLAG_RULES = [
+    # Green
+    {"type": "green", "text": "Replies fast ⚡", "when": ("conscientiousness", ">", 7)},
+    {"type": "green", "text": "Adventurous 🌍", "when": ("openness", ">", 7)},
+    {"type": "green", "text": "Walking Therapist 🧠", "when": ("agreeableness", ">", 7)},
+    # Beige
+    {"type": "beige", "text": "Protein obsession 🏋️", "when": ("gym_person", "truthy", None)},
+    {"type": "beige", "text": "Gamer Rage potential 🎮", "when": ("gamer", "truthy", None)},
+    {"type": "beige", "text": "Mysterious AF 🦂", "when": ("zodiac_sign", "==", "Scorpio")},
+    {"type": "beige", "text": "Food > You 🍕", "when": ("foodie", "truthy", None)},
+    # Red
+    {"type": "red", "text": "Overthinks everything 🤯", "when": ("neuroticism", ">", 8)},
+    {"type": "red", "text": "Ghosting Risk 👻", "when": ("ghosting_prob", ">", 0.6)},
+]
+MAX_FLAGS = 4
+
+ICEBREAKER_RULES = [
+    ("I see you like music! What's the best concert you've ever been to?", ("likes_music", "truthy", None)),
+    ("If you could teleport anywhere right now, where would you go?", ("likes_travel", "truthy", None)),
+    ("What's your absolute comfort food?", ("foodie", "truthy", None)),
+    ("Console or PC? (Careful, there's a right answer 😉)", ("gamer", "truthy", None)),
+    ("What's the last book that kept you up all night?", ("reader", "truthy", None)),
+]
+DEFAULT_ICEBREAKER = "What's the most spontaneous thing you've done recently?"
+MAX_ICEBREAKERS = 3
+
+# Per milestone: the first matching rule picks the event, otherwise the default
+TIMELINE_RULES = [
+    ("Month 1", [
+        (("foodie", "truthy", None), "Exploring the city's hidden food gems 🍜"),
+        (("gamer", "truthy", None), "Co-op gaming marathon 🎮"),
+        (("likes_music", "truthy", None), "First concert date together 🎸"),
+    ], "Late night drive & deep talks 🌙"),
+    ("Month 6", [
+        (("likes_travel", "truthy", None), "First weekend getaway trip ✈️"),
+        (("likes_pets", "truthy", None), "Adopted a stray cat together 🐈"),
+    ], "Meeting the best friends 👯‍♀️"),
+    ("Year 1", [
+        (("relationship_goal", "==", "Long-term"), "Moving in together? 🏠"),
+        (("relationship_goal", "==", "Marriage"), "The 'Talk' happens 💍"),
+    ], "Still vibing (surprisingly) ✨"),
+]
+
+# High Conscientiousness + High Agreeableness + Positive Bio = High Safety
+SAFETY_BASE = 50
+SAFETY_WEIGHTS = {"agreeableness": 3, "conscientiousness": 3, "bio_sentiment": 10}
+
+# Sub-scores 0-100: mean of the fields times the scale
+MATCH_DETAILS = {
+    "personality_strength": (TRAITS, 10),
+    "love_style_intensity": (LOVE_LANGUAGES, 20),
+    "lifestyle_match": (["likes_music", "likes_travel", "foodie", "gym_person"], 100),
+}
+
+BIO_FEEDBACK = ("Great bio!", "Consider making your bio more positive.")
+
+
+class RuleSet:
+    """Rules compiled into predicate tables. Build once (see `rules` below), evaluate many times."""
+
+    def __init__(self, flags=FLAG_RULES, icebreakers=ICEBREAKER_RULES, timeline=TIMELINE_RULES):
+        self._index = {}
+        self._thresholds = {}  # field -> (predicate columns, thresholds)
+        self._truthy = {}  # field -> predicate column
+        self._categories = {}  # field -> {value: row of the lookup table}
+        self._tables = {}  # field -> (predicate columns, bool table [len(values) + 1, n])
+
+        self.flags = [(r["type"], r["text"]) for r in flags]
+        self.flag_columns = np.array([self._predicate(r["when"]) for r in flags], dtype=int)
+        self.icebreakers = [text for text, _ in icebreakers]
+        self.icebreaker_columns = np.array([self._predicate(when) for _, when in icebreakers], dtype=int)
+        self.timeline = []
+        for label, choices, default in timeline:
+            columns = np.array([self._predicate(when) for when, _ in choices], dtype=int)
+            self.timeline.append((label, columns, [event for _, event in choices] + [default]))
+        self._build_tables()
+        self._flag_lists, self._icebreaker_lists, self._timeline_lists = {}, {}, {}
+
+        numeric = set(self._thresholds) | set(self._truthy) | set(SAFETY_WEIGHTS)
+        numeric |= {f for fields, _ in MATCH_DETAILS.values() for f in fields}
+        self.numeric_fields = sorted(numeric - {"ghosting_prob", "bio_sentiment"})
+        self.categorical_fields = sorted(self._categories)
+
+    def _predicate(self, predicate) -> int:
+        if predicate in self._index:
+            return self._index[predicate]
+        column = self._index[predicate] = len(self._index)
+        field, op, value = predicate
+        if op == ">":
+            self._thresholds.setdefault(field, []).append((column, float(value)))
+        elif op == "truthy":
+            self._truthy[field] = column
+        elif op == "==":
+            self._categories.setdefault(field, {}).setdefault(value, []).append(column)
+        else:
+            raise ValueError(f"Unknown rule operator {op!r}")
+        return column
+
+    def _build_tables(self):
+        self._thresholds = {
+            field: (np.array([c for c, _ in items]), np.array([t for _, t in items]))
+            for field, items in self._thresholds.items()
+        }
+        for field, by_value in self._categories.items():
+            columns = sorted({c for cols in by_value.values() for c in cols})
+            values = list(by_value)
+            # One row per known value plus a last all-False row for everything else
+            table = np.zeros((len(values) + 1, len(columns)), dtype=bool)
+            for row, value in enumerate(values):
+                for c in by_value[value]:
+                    table[row, columns.index(c)] = True
+            self._tables[field] = (np.array(columns), table)
+            self._categories[field] = {value: row for row, value in enumerate(values)}
+
+    def predicates(self, columns: dict, n: int) -> np.ndarray:
+        """Boolean matrix [n profiles, n predicates]."""
+        out = np.zeros((n, len(self._index)), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            for field, (cols, thresholds) in self._thresholds.items():
+                out[:, cols] = columns[field][:, None] > thresholds
+        for field, col in self._truthy.items():
+            out[:, col] = np.nan_to_num(columns[field]) != 0
+        for field, (cols, table) in self._tables.items():
+            lookup = self._categories[field]
+            unknown = len(lookup)
+            out[:, cols] = table[[lookup.get(v, unknown) for v in columns[field]]]
+        return out
+
+    def columns(self, profiles, bio_sentiments, ghosting=None) -> dict:
+        columns = {f: np.asarray(field_values(profiles, f), dtype=float) for f in self.numeric_fields}
+        for f in self.categorical_fields:
+            columns[f] = field_values(profiles, f)
+        columns["bio_sentiment"] = np.asarray(bio_sentiments, dtype=float)
+        columns["ghosting_prob"] = np.full(len(profiles), np.nan) if ghosting is None else np.asarray(ghosting, dtype=float)
+        return columns
+
+    def evaluate(self, profiles, bio_sentiments, ghosting=None) -> list:
+        """
+        Rule-based insights for each profile (UserProfile, User rows, anything with the fields, or a ProfileBatch).
+        bio_sentiments: analyze_bio() of each bio; ghosting: model ghosting probabilities (0-1) if known.
+        """
+        n = len(profiles)
+        if n == 0:
+            return []
+        columns = self.columns(profiles, bio_sentiments, ghosting)
+        hits = self.predicates(columns, n)
+
+        # Each profile's flags / icebreakers / timeline as one integer (a bit per rule,
+        # a digit per milestone), so the output lists are built once per distinct pattern
+        flag_hits = hits[:, self.flag_columns]
+        flag_hits &= np.cumsum(flag_hits, axis=1) <= MAX_FLAGS
+        flag_keys = (flag_hits @ (1 << np.arange(flag_hits.shape[1]))).tolist()
+        ice_hits = hits[:, self.icebreaker_columns]
+        ice_hits &= np.cumsum(ice_hits, axis=1) <= MAX_ICEBREAKERS
+        ice_keys = (ice_hits @ (1 << np.arange(ice_hits.shape[1]))).tolist()
+        timeline_keys = np.zeros(n, dtype=np.int64)
+        for _, cols, events in self.timeline:
+            slot = hits[:, cols]
+            timeline_keys = timeline_keys * len(events) + np.where(slot.any(axis=1), slot.argmax(axis=1), len(events) - 1)
+        timeline_keys = timeline_keys.tolist()
+
+        safety = np.full(n, float(SAFETY_BASE))
+        for field, weight in SAFETY_WEIGHTS.items():
+            safety += weight * columns[field]
+        safety = np.clip(safety, 0.0, 100.0).tolist()
+        details = [
+            (name, (np.column_stack([columns[f] for f in fields]).mean(axis=1) * scale).tolist())
+            for name, (fields, scale) in MATCH_DETAILS.items()
+        ]
+        positive_bio = (columns["bio_sentiment"] > 0).tolist()
+
+        return [
+            {
+                "safety_score": safety[i],
+                "match_details": {name: values[i] for name, values in details},
+                "icebreakers": self._icebreaker_list(ice_keys[i]),
+                "timeline": self._timeline_list(timeline_keys[i]),
+                "flags": self._flag_list(flag_keys[i]),
+                "bio_feedback": BIO_FEEDBACK[0] if positive_bio[i] else BIO_FEEDBACK[1],
+            }
+            for i in range(n)
+        ]
+
+    # The lists below are shared between results: read them, don't mutate them
+
+    def _flag_list(self, key: int) -> list:
+        if key not in self._flag_lists:
+            self._flag_lists[key] = [
+                {"type": kind, "text": text} for j, (kind, text) in enumerate(self.flags) if key >> j & 1
+            ]
+        return self._flag_lists[key]
+
+    def _icebreaker_list(self, key: int) -> list:
+        if key not in self._icebreaker_lists:
+            self._icebreaker_lists[key] = [t for j, t in enumerate(self.icebreakers) if key >> j & 1] or [DEFAULT_ICEBREAKER]
+        return self._icebreaker_lists[key]
+
+    def _timeline_list(self, key: int) -> list:
+        entries = self._timeline_lists.get(key)
+        if entries is None:
+            rest, entries = key, []
+            for label, _, events in reversed(self.timeline):
+                rest, pick = divmod(rest, len(events))
+                entries.append({"time": label, "event": events[pick]})
+            entries = self._timeline_lists[key] = entries[::-1]
+        return entries
+
+
+rules = RuleSet()
@@ -1,6 +1,9 @@
 import json
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 # Load mappings from JSON file sibling to this script
 current_dir = os.path.dirname(os.path.abspath(__file__))
 json_path = os.path.join(current_dir, "mappings.json")
@@ -9,5 +12,7 @@ mappings = {}
 if os.path.exists(json_path):
     with open(json_path, "r") as f:
         mappings = json.load(f)
+    # bio_text is never encoded (features.py maps it to 0), so don't keep its mapping
+    mappings.pop("bio_text", None)
 else:
-    print(f"❌ Mappings file not found at {json_path}")
+    logger.error("❌ Mappings file not found at %s", json_path)
@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+from app.utils.bio_analyzer import analyze_bio
+from app.utils.feature_stats import feature_stats
+from app.utils.features import (
+    EXPECTED_FEATURES, NUMERIC_FEATURES, CATEGORICAL_FEATURES, MISSING_FEATURES, encode
+)
+from app.utils.profile_batch import field_values
+
+# Pairwise mode
+# -------------
+# The CatBoost model only ever sees one profile, so on its own it cannot tell whether
+# two people fit together. Pairwise mode keeps the model score of the candidate and
+# blends it with features built from both sides. Everything works on column arrays,
+# so one user vs M candidates (or an N x M block) is a few array ops + one model call.
+
+TRAITS = ["openness", "extroversion", "agreeableness", "neuroticism", "conscientiousness"]
+LOVE_LANGUAGES = ["words_of_affirmation", "quality_time", "gifts", "physical_touch", "acts_of_service"]
+INTERESTS = [
+    "likes_music", "likes_travel", "likes_pets", "foodie", "gym_person",
+    "movie_lover", "gamer", "reader", "night_owl", "early_bird",
+]
+
+# Weights of the blended pair score (sum of positive weights = 1)
+PAIR_WEIGHTS = {
+    "model": 0.5,
+    "trait_similarity": 0.2,
+    "love_similarity": 0.1,
+    "interest_overlap": 0.1,
+    "goal_agreement": 0.1,
+    "chronotype_clash": -0.05,
+}
+
+TRAIT_RANGE = 10.0  # Big 5 and love languages are scored on 0-10 in the app
+
+
+def _column(profiles, col):
+    # dtype=float turns missing values (None) into NaN
+    return np.asarray(field_values(profiles, col), dtype=float)
+
+
+def profile_arrays(profiles, bio_sentiments=None) -> dict:
+    """
+    Columnar view of a list of profiles (UserProfile or User rows) or of a ProfileBatch.
+    Build it once per candidate pool and reuse it for every requesting user.
+    """
+    arrays = {col: _column(profiles, col) for col in NUMERIC_FEATURES}
+    for col in CATEGORICAL_FEATURES:
+        # encode() scans the mapping, so only do it once per distinct value
+        values = field_values(profiles, col)
+        codes = {v: encode(col, v) for v in set(values)}
+        arrays[col] = np.array([codes[v] for v in values], dtype=float)
+    if bio_sentiments is None:
+        bio_sentiments = [analyze_bio(text) for text in field_values(profiles, "bio_text")]
+    arrays["bio_sentiment"] = np.asarray(bio_sentiments, dtype=float)
+
+    arrays["traits"] = np.column_stack([arrays[c] for c in TRAITS])
+    arrays["love"] = np.column_stack([arrays[c] for c in LOVE_LANGUAGES])
+    arrays["interests"] = (np.column_stack([arrays[c] for c in INTERESTS]) > 0).astype(np.float32)
+    arrays["size"] = len(profiles)
+    return arrays
+
+
+def model_frame(arrays) -> pd.DataFrame:
+    """Scaled model input for every profile in `arrays`, same values as features.build_feature_frame."""
+    n = arrays["size"]
+    columns = []
+    for col in EXPECTED_FEATURES:
+        if col == "bio_text":
+            values = np.zeros(n)
+        elif col in MISSING_FEATURES:
+            values = np.full(n, feature_stats.get_mean(col))
+        else:
+            values = arrays[col]
+        if col in feature_stats:
+            std = feature_stats.get_std(col) or 1
+            values = (values - feature_stats.get_mean(col)) / std
+        columns.append(values)
+    return pd.DataFrame(np.column_stack(columns), columns=EXPECTED_FEATURES)
+
+
+def model_probabilities(model, arrays) -> np.ndarray:
+    """Single-profile success probability for every profile, in one predict_proba call."""
+    if arrays["size"] == 0:
+        return np.zeros(0)
+    return np.asarray(model.predict_proba(model_frame(arrays)))[:, 1]
+
+
+def _mean_abs_diff(a, b):
+    # Accumulate column by column to avoid an N x M x K temporary
+    total = np.zeros((a.shape[0], b.shape[0]))
+    for k in range(a.shape[1]):
+        total += np.abs(a[:, k][:, None] - b[:, k][None, :])
+    return total / max(a.shape[1], 1)
+
+
+def pair_features(users, candidates) -> dict:
+    """N x M matrices describing how each user (rows) fits each candidate (columns)."""
+    # Mean absolute difference -> similarity in [0, 1]
+    trait_diff = _mean_abs_diff(users["traits"], candidates["traits"])
+    love_diff = _mean_abs_diff(users["love"], candidates["love"])
+
+    # Jaccard overlap of interest flags
+    shared = users["interests"] @ candidates["interests"].T
+    union = users["interests"].sum(axis=1)[:, None] + candidates["interests"].sum(axis=1)[None, :] - shared
+
+    # Same relationship goal, and both goals actually known
+    user_goal = users["relationship_goal"][:, None]
+    cand_goal = candidates["relationship_goal"][None, :]
+    goal_agreement = (user_goal == cand_goal) & (user_goal > 0)
+
+    # Night owl paired with early bird
+    night = INTERESTS.index("night_owl")
+    early = INTERESTS.index("early_bird")
+    clash = np.outer(users["interests"][:, night], candidates["interests"][:, early]) + \
+        np.outer(users["interests"][:, early], candidates["interests"][:, night])
+
+    return {
+        "trait_similarity": np.nan_to_num(1.0 - trait_diff / TRAIT_RANGE),
+        "love_similarity": np.nan_to_num(1.0 - love_diff / TRAIT_RANGE),
+        "shared_interests": shared,
+        "interest_overlap": np.divide(shared, union, out=np.zeros_like(shared), where=union > 0),
+        "goal_agreement": goal_agreement.astype(float),
+        "chronotype_clash": np.minimum(clash, 1.0),
+    }
+
+
+def pairwise_scores(users, candidates, candidate_probabilities) -> np.ndarray:
+    """
+    Blend per-candidate model probabilities (shape M) with the pair features.
+    Returns an N x M matrix of success probabilities in [0, 1].
+    """
+    features = pair_features(users, candidates)
+    score = PAIR_WEIGHTS["model"] * np.nan_to_num(candidate_probabilities)[None, :]
+    score = score + PAIR_WEIGHTS["trait_similarity"] * features["trait_similarity"]
+    score = score + PAIR_WEIGHTS["love_similarity"] * features["love_similarity"]
+    score = score + PAIR_WEIGHTS["interest_overlap"] * features["interest_overlap"]
+    score = score + PAIR_WEIGHTS["goal_agreement"] * features["goal_agreement"]
+    score = score + PAIR_WEIGHTS["chronotype_clash"] * features["chronotype_clash"]
+    return np.clip(score, 0.0, 1.0)
+
+
+def score_user_against(model, user, candidates, candidate_arrays=None) -> np.ndarray:
+    """Convenience wrapper: one profile vs M candidates -> M probabilities."""
+    if candidate_arrays is None:
+        candidate_arrays = profile_arrays(candidates)
+    probs = model_probabilities(model, candidate_arrays)
+    return pairwise_scores(profile_arrays([user]), candidate_arrays, probs)[0]
@@ -0,0 +1,57 @@
+"""
+Shared helpers for the scripts in benchmarks/.
+Run them from the repo root, e.g. `python benchmarks/bench_pairwise.py`.
+"""
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import numpy as np
+from app.utils.mappings import mappings
+
+
+class StubModel:
+    """Stand-in for the CatBoost pickle: same predict_proba contract, cheap logistic score."""
+
+    def __init__(self, n_features=37, seed=0):
+        self.weights = np.random.default_rng(seed).normal(0, 0.3, n_features)
+
+    def predict_proba(self, X):
+        z = np.nan_to_num(np.asarray(X, dtype=float)) @ self.weights
+        p = 1.0 / (1.0 + np.exp(-z))
+        return np.column_stack([1.0 - p, p])
+
+
+def synthetic_profiles(n, seed=0):
+    """`n` profile-shaped objects with the categories from mappings.json."""
+    rng = random.Random(seed)
+    categories = {col: [k for k in mappings.get(col, {}) if k != "nan"] or ["Unknown"]
+                  for col in ("gender", "location", "zodiac_sign", "relationship_goal", "fav_music_genre")}
+    profiles = []
+    for _ in range(n):
+        p = {col: rng.choice(values) for col, values in categories.items()}
+        p["age"] = rng.randint(18, 45)
+        for col in ("openness", "extroversion", "agreeableness", "neuroticism", "conscientiousness"):
+            p[col] = round(rng.uniform(1, 10), 1)
+        for col in ("words_of_affirmation", "quality_time", "gifts", "physical_touch", "acts_of_service"):
+            p[col] = rng.randint(1, 10)
+        for col in ("likes_music", "likes_travel", "likes_pets", "foodie", "gym_person",
+                    "movie_lover", "gamer", "reader", "night_owl", "early_bird"):
+            p[col] = int(rng.random() < 0.4)
+        p["bio_text"] = ""
+        profiles.append(SimpleNamespace(**p))
+    return profiles
+
+
+def timeit(fn, repeat=5):
+    """Best-of-`repeat` wall time of fn() in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
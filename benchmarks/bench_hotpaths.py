@@ -0,0 +1,188 @@
+"""
+Microbenchmarks for the scoring and moderation hot paths, with JSON baselines.
+
+    python benchmarks/bench_hotpaths.py run                           # prints + saves benchmarks/results/<time>.json
+    python benchmarks/bench_hotpaths.py run --output baseline.json
+    python benchmarks/bench_hotpaths.py compare baseline.json         # runs now, compares against the baseline
+    python benchmarks/bench_hotpaths.py compare baseline.json new.json --threshold 0.2
+
+`compare` exits with status 1 if any benchmark got slower than the threshold (default 15%).
+The predict_proba benchmarks use the real model pickle when present, otherwise a synthetic
+stand-in, so the suite runs anywhere; results record which one was used and comparisons
+refuse to mix them. The handler benchmark always uses the stand-in, so it measures the
+handler's own overhead rather than the model.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+# The handler benchmark writes a profile row; keep it away from the real database
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+
+from _common import StubModel, synthetic_profiles
+
+from app.auth_utils import get_password_hash, verify_password
+from app.database import Base, SessionLocal, engine
+from app.model_loader import loader
+from app.models.user import User
+from app.routes import predict as predict_route
+from app.schemas import UserProfile
+from app.services.moderation import is_toxic
+from app.utils.bio_analyzer import analyze_bio
+from app.utils.features import CATEGORICAL_FEATURES, build_feature_frame, build_feature_row, encode
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+BIO = "Coffee snob, weekend hiker and terrible at karaoke. Looking for someone kind who loves long walks and good books."
+CLEAN_MESSAGE = "Hey! I saw you like travelling too, where was your favourite trip?"
+TOXIC_MESSAGE = "you are such an idiot, I hate this"
+
+
+def measure(fn, number, repeat=5):
+    """Seconds per call: median (and min) over `repeat` runs of `number` calls."""
+    fn()  # warm-up
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - start) / number)
+    return {"median": statistics.median(runs), "min": min(runs), "number": number, "repeat": repeat}
+
+
+def _handler_benchmark():
+    """Full predict_compatibility handler: DB write, features, stub model, heuristics (job enqueue stubbed)."""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(email=f"bench_{time.time_ns()}@example.com", hashed_password="x", full_name="Bench")
+    db.add(user)
+    db.commit()
+    payload = UserProfile(**{**vars(synthetic_profiles(1, seed=7)[0]), "bio_text": BIO})
+    predict_route.profile_changed = lambda user_id: None  # measure the handler, not the background work
+    loader._model = StubModel()  # the handler reads loader.model
+    loop = asyncio.new_event_loop()
+
+    def call():
+        return loop.run_until_complete(predict_route.predict_compatibility(payload, db=db, current_user=user))
+
+    return call, lambda: (loop.close(), db.close())
+
+
+def run_suite(quick=False):
+    scale = 0.2 if quick else 1.0
+    n = lambda count: max(1, int(count * scale))
+
+    real_model = loader.model
+    model = real_model if real_model is not None else StubModel()
+
+    profiles = synthetic_profiles(1024, seed=3)
+    rows = [build_feature_row(p, bio_sentiment=0.1) for p in profiles]
+    frames = {size: build_feature_frame(rows[:size]) for size in (1, 64, 1024)}
+    one = profiles[0]
+    hashed = get_password_hash("secret123")
+
+    benchmarks = {
+        "encode_categoricals": (lambda: [encode(col, getattr(one, col)) for col in CATEGORICAL_FEATURES], n(2000)),
+        "scale_features_1": (lambda: build_feature_frame(rows[:1]), n(200)),
+        "scale_features_64": (lambda: build_feature_frame(rows[:64]), n(100)),
+        "scale_features_1024": (lambda: build_feature_frame(rows), n(20)),
+        "analyze_bio": (lambda: analyze_bio(BIO), n(200)),
+        "predict_proba_1": (lambda: model.predict_proba(frames[1]), n(200)),
+        "predict_proba_64": (lambda: model.predict_proba(frames[64]), n(100)),
+        "predict_proba_1024": (lambda: model.predict_proba(frames[1024]), n(20)),
+        "toxicity_clean": (lambda: is_toxic(CLEAN_MESSAGE), n(500)),
+        "toxicity_toxic": (lambda: is_toxic(TOXIC_MESSAGE), n(500)),
+        "bcrypt_verify": (lambda: verify_password("secret123", hashed), n(10)),
+    }
+    handler, cleanup = _handler_benchmark()
+    benchmarks["predict_compatibility_handler"] = (handler, n(50))
+
+    results = {}
+    try:
+        for name, (fn, number) in benchmarks.items():
+            results[name] = measure(fn, number, repeat=3 if quick else 5)
+            print(f"{name:32s} {results[name]['median'] * 1e6:12.1f} µs/call")
+    finally:
+        cleanup()
+
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor() or platform.machine(),
+            "model": "real" if real_model is not None else "stub",
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> bool:
+    """Print a per-benchmark comparison of medians. Returns True if nothing regressed."""
+    if baseline["meta"].get("model") != current["meta"].get("model"):
+        print(f"Baseline used the {baseline['meta'].get('model')} model, current run the {current['meta'].get('model')} one; not comparable.")
+        return False
+    ok = True
+    print(f"{'benchmark':32s} {'baseline µs':>12s} {'current µs':>12s} {'change':>8s}")
+    for name, base in baseline["results"].items():
+        cur = current["results"].get(name)
+        if cur is None:
+            print(f"{name:32s} {base['median'] * 1e6:12.1f} {'missing':>12s}")
+            continue
+        change = cur["median"] / base["median"] - 1.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:32s} {base['median'] * 1e6:12.1f} {cur['median'] * 1e6:12.1f} {change:+7.1%}{flag}")
+    return ok
+
+
+def _save(result: dict, path: str = None) -> str:
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"hotpaths-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved {path}")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="run the suite and save the results as JSON")
+    run_parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/<time>.json)")
+    run_parser.add_argument("--quick", action="store_true", help="fewer iterations, for smoke runs")
+    compare_parser = sub.add_parser("compare", help="compare a baseline with a results file, or with a fresh run")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current", nargs="?")
+    compare_parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown, 0.15 = 15%%")
+    compare_parser.add_argument("--quick", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        _save(run_suite(args.quick), args.output)
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run_suite(args.quick)
+        _save(current)
+    sys.exit(0 if compare(baseline, current, args.threshold) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Per-request logging cost: the old synchronous prints vs the queue pipeline at INFO and DEBUG.
+
+    python benchmarks/bench_logging.py --requests 20000
+
+One "request" makes the log calls of an authenticated chat send: the auth and
+LLM call debug lines, plus the access log line. Times are what the request
+thread pays. For the queue pipeline the JSON encoding and the write happen on
+the listener thread, which is drained (and timed) separately.
+"""
+import argparse
+import contextlib
+import logging
+import os
+import tempfile
+import time
+
+# Big enough that nothing is dropped: measure the enqueue, not the drop path
+os.environ.setdefault("LOG_QUEUE_SIZE", "1000000")
+
+from _common import timeit
+from app.logging_config import setup_logging, stop_logging
+
+auth_log = logging.getLogger("app.auth_utils")
+ai_log = logging.getLogger("app.services.ai_service")
+access_log = logging.getLogger("uvicorn.access")
+
+EMAIL = "someone@example.com"
+REPLY = "That sounds like a great start! Try asking about their favourite trip and what they loved about it."
+
+
+def old_prints():
+    """What every request printed before (plus uvicorn's own access line)."""
+    print("DEBUG AUTH: Decoding token... (SECRET_KEY start: soul...)")
+    print(f"DEBUG AUTH: Token decoded successfully for {EMAIL}")
+    print(f"DEBUG AUTH: User {EMAIL} authenticated successfully")
+    print("🤖 AI Request for bot_luna (Model: llama-3.1-8b-instant)")
+    print(f"✅ AI Response: {REPLY[:50]}...")
+    print('127.0.0.1:52878 - "POST /api/chat/send HTTP/1.1" 200')
+
+
+def log_calls():
+    auth_log.debug("User %s authenticated successfully", EMAIL)
+    ai_log.debug("🤖 AI Request for %s (Model: llama-3.1-8b-instant)", "bot_luna")
+    ai_log.debug("✅ AI Response: %.50s...", REPLY)
+    access_log.info('%s - "%s %s HTTP/%s" %d', "127.0.0.1:52878", "POST", "/api/chat/send", "1.1", 200)
+
+
+def per_request(fn, requests):
+    return timeit(lambda: [fn() for _ in range(requests)], repeat=3) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    # Write to a real file: /dev/null would hide the cost of the write itself
+    out = open(os.path.join(tempfile.mkdtemp(), "bench.log"), "w", buffering=1)  # line-buffered, like PYTHONUNBUFFERED
+    try:
+        with contextlib.redirect_stdout(out):
+            prints = per_request(old_prints, args.requests)
+
+        results = {"print (before)": (prints, None)}
+        for level in ("INFO", "DEBUG"):
+            handler = setup_logging(level=level, levels="", fmt="json", stream=out)
+            request_side = per_request(log_calls, args.requests)
+            started = time.perf_counter()
+            stop_logging()  # waits until the listener has written everything
+            results[f"queue + JSON, {level}"] = (request_side, time.perf_counter() - started)
+            if handler.dropped:
+                print(f"  ({handler.dropped} records dropped at {level}: queue full)")
+    finally:
+        out.close()
+
+    print(f"{'pipeline':24s} {'µs/request':>12s} {'listener drain':>16s}")
+    for name, (seconds, drain) in results.items():
+        drain_text = f"{drain * 1000:13.0f} ms" if drain is not None else f"{'-':>16s}"
+        print(f"{name:24s} {seconds * 1e6:12.2f} {drain_text}")
+
+
+if __name__ == "__main__":
+    main()
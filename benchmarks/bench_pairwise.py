@@ -0,0 +1,40 @@
+"""
+Pairwise scoring benchmark: one user vs M candidates and an N x M block.
+
+    python benchmarks/bench_pairwise.py --candidates 10000 --users 100
+"""
+import argparse
+
+from _common import StubModel, synthetic_profiles, timeit
+from app.utils.pairwise import profile_arrays, model_probabilities, pairwise_scores
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candidates", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    model = StubModel()
+    candidates = synthetic_profiles(args.candidates, seed=1)
+    users = synthetic_profiles(args.users, seed=2)
+
+    build = timeit(lambda: profile_arrays(candidates), repeat=3)
+    cand_arrays = profile_arrays(candidates)
+    user_arrays = profile_arrays(users)
+    one_user = profile_arrays(users[:1])
+
+    model_call = timeit(lambda: model_probabilities(model, cand_arrays))
+    probs = model_probabilities(model, cand_arrays)
+    one_vs_m = timeit(lambda: pairwise_scores(one_user, cand_arrays, probs))
+    n_vs_m = timeit(lambda: pairwise_scores(user_arrays, cand_arrays, probs), repeat=3)
+
+    M, N = args.candidates, args.users
+    print(f"candidate arrays (M={M}):     {build * 1e3:8.2f} ms  (once per candidate pool)")
+    print(f"model call (M={M}):           {model_call * 1e3:8.2f} ms")
+    print(f"pair block 1 x {M}:           {one_vs_m * 1e3:8.2f} ms")
+    print(f"pair block {N} x {M}:         {n_vs_m * 1e3:8.2f} ms  ({N * M / n_vs_m / 1e6:.1f}M pairs/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Validation + conversion cost of profile payloads, per 1k profiles.
+
+    python benchmarks/bench_profile_decode.py --profiles 1000
+
+Each path starts from the raw JSON body and ends with the model's column
+arrays (pairwise.profile_arrays), bio sentiment excluded:
+  - per item: UserProfile per profile, then .dict() and a setattr per field
+    (what /predict_compatibility did for each profile)
+  - list model: pydantic validates the whole array (list[UserProfile]) in one call
+  - columnar: profile_batch.decode_profiles, straight into per-field arrays
+"""
+import argparse
+import warnings
+from types import SimpleNamespace
+
+import orjson
+from pydantic import TypeAdapter
+
+from _common import synthetic_profiles, timeit
+from app.schemas import UserProfile
+from app.utils.pairwise import profile_arrays
+from app.utils.profile_batch import decode_profiles
+
+warnings.simplefilter("ignore", DeprecationWarning)  # .dict() warns on pydantic v2
+profile_list = TypeAdapter(list[UserProfile])
+
+
+def payload(n):
+    return orjson.dumps([{**vars(p), "bio_text": "Coffee, hikes and terrible karaoke"} for p in synthetic_profiles(n)])
+
+
+def per_item(body):
+    profiles = []
+    for row in orjson.loads(body):
+        profile = UserProfile(**row)
+        target = SimpleNamespace()
+        for key, value in profile.dict().items():
+            setattr(target, key, value)
+        profiles.append(target)
+    return profile_arrays(profiles, [0.0] * len(profiles))
+
+
+def list_model(body):
+    profiles = profile_list.validate_json(body)
+    return profile_arrays(profiles, [0.0] * len(profiles))
+
+
+def columnar(body):
+    batch = decode_profiles(body, max_size=len(body))
+    return profile_arrays(batch, [0.0] * len(batch))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profiles", type=int, default=1000)
+    args = parser.parse_args()
+
+    body = payload(args.profiles)
+    print(f"{args.profiles} profiles, {len(body) / 1024:.0f} KiB of JSON")
+    print(f"{'path':12s} {'ms / 1k profiles':>18s}")
+    for name, fn in (("per item", per_item), ("list model", list_model), ("columnar", columnar)):
+        seconds = timeit(lambda: fn(body), repeat=5)
+        print(f"{name:12s} {seconds * 1000 / args.profiles * 1000:18.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Bulk user import from NDJSON or CSV, straight into DATABASE_URL.
+Same code path as POST /api/admin/users/import, without the HTTP upload.
+
+Run from the repo root:
+    python import_users.py users.ndjson
+    python import_users.py users.csv --batch-size 2000 --workers 8
+    python loadtest/synthetic_users.py --count 50000 --output - | python import_users.py -
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app.database import SessionLocal, engine, Base
+from app.migrations import run_migrations
+from app import models  # noqa: F401
+from app.services.bulk_import import BulkImporter, IMPORT_BATCH_SIZE, IMPORT_HASH_WORKERS, shutdown_pool
+from app.logging_config import setup_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="NDJSON or CSV file, or - for stdin")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=IMPORT_HASH_WORKERS, help="password hashing processes")
+    args = parser.parse_args()
+    setup_logging(fmt="text", stream=sys.stderr)  # app log lines; stdout is the report
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    db = SessionLocal()
+    source = sys.stdin if args.path == "-" else open(args.path, newline="")
+    try:
+        importer = BulkImporter(db, fmt, batch_size=args.batch_size, hash_workers=args.workers)
+        chunk = []
+        for line in source:
+            chunk.append(line)
+            if len(chunk) >= args.batch_size:
+                importer.feed_lines(chunk)
+                chunk = []
+                print(f"... {importer.counts['imported']} imported", file=sys.stderr)
+        importer.feed_lines(chunk)
+        report = importer.finish()
+    finally:
+        db.close()
+        if source is not sys.stdin:
+            source.close()
+        shutdown_pool()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
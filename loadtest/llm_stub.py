@@ -0,0 +1,66 @@
+"""
+Local stand-in for the Groq chat-completions API, with configurable latency.
+
+    python loadtest/llm_stub.py --port 8090 --latency-ms 400 --jitter-ms 150 --error-rate 0.01
+
+Point the backend at it with:
+    GROQ_API_KEY=stub GROQ_BASE_URL=http://127.0.0.1:8090
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="LLM stub")
+settings = {"latency_ms": 400.0, "jitter_ms": 150.0, "error_rate": 0.0}
+REPLIES = [
+    "That sounds like a great start! Try asking about their favourite trip.",
+    "Keep it light and curious - people love talking about what excites them.",
+    "Honestly? Just be yourself, and ask one question you actually care about.",
+]
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    delay = max(0.0, random.gauss(settings["latency_ms"], settings["jitter_ms"])) / 1000
+    await asyncio.sleep(delay)
+    if random.random() < settings["error_rate"]:
+        return JSONResponse({"error": {"message": "stub overloaded", "type": "server_error"}}, status_code=503)
+
+    prompt_tokens = sum(len(m.get("content", "")) // 4 for m in body.get("messages", []))
+    reply = random.choice(REPLIES)
+    completion_tokens = len(reply) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=400)
+    parser.add_argument("--jitter-ms", type=float, default=150)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    settings.update(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Scripted load test against a running SoulSync backend.
+
+    # 1. seed users and start the LLM stub
+    DATABASE_URL=sqlite:///./load.db python loadtest/synthetic_users.py --count 5000
+    python loadtest/llm_stub.py --latency-ms 400 &
+    # 2. start the backend (cd backend)
+    DATABASE_URL=sqlite:///./load.db GROQ_API_KEY=stub GROQ_BASE_URL=http://127.0.0.1:8090 \\
+        gunicorn app.main:app -k uvicorn.workers.UvicornWorker -w 1 -b 127.0.0.1:8000
+    # 3. run
+    python loadtest/run_load.py --users 50 --duration 60 --output report.json
+
+Each virtual user logs in as one of the seeded users, then loops over the
+scenarios, picked by --mix weights, with --think-ms between requests.
+Reports requests, throughput, p50/p95/p99 latency and error rate per route.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+
+import httpx
+
+from synthetic_users import LOADTEST_PASSWORD
+
+DEFAULT_MIX = "profile_update=1,insights=3,chat_send=2,history=4"
+MATCH_IDS = ["match_1", "match_2", "match_3"]
+BOT_IDS = ["bot_luna", "bot_atlas"]
+CHAT_LINES = [
+    "hey! how's your week going?",
+    "any tips for a first date?",
+    "what should I ask someone who loves travelling?",
+    "I get nervous texting first, help",
+]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route: str, seconds: float, ok: bool):
+        self.latencies[route].append(seconds)
+        if not ok:
+            self.errors[route] += 1
+
+
+async def timed_request(recorder: Recorder, route: str, request):
+    started = time.perf_counter()
+    try:
+        response = await request
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        response, ok = None, False
+    recorder.record(route, time.perf_counter() - started, ok)
+    return response
+
+
+async def login(client, recorder, email):
+    """Log in and load the profile (PUT /me takes the full profile). Returns the session or None."""
+    response = await timed_request(recorder, "POST /api/auth/login", client.post(
+        "/api/auth/login", data={"username": email, "password": LOADTEST_PASSWORD}
+    ))
+    if response is None or response.status_code != 200:
+        return None
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    response = await timed_request(recorder, "GET /api/auth/me", client.get("/api/auth/me", headers=headers))
+    if response is None or response.status_code != 200:
+        return None
+    profile = {k: v for k, v in response.json().items() if k not in ("id", "email", "full_name")}
+    return {"headers": headers, "profile": profile}
+
+
+async def profile_update(client, recorder, session, rng):
+    profile = dict(session["profile"], openness=round(rng.uniform(1, 10), 1), bio_text=rng.choice(CHAT_LINES))
+    await timed_request(recorder, "PUT /api/auth/me", client.put("/api/auth/me", headers=session["headers"], json=profile))
+
+
+async def insights(client, recorder, session, rng):
+    await timed_request(recorder, "GET /api/discovery/insights/{id}", client.get(
+        f"/api/discovery/insights/{rng.choice(MATCH_IDS)}", headers=session["headers"]
+    ))
+
+
+async def chat_send(client, recorder, session, rng):
+    await timed_request(recorder, "POST /api/chat/send", client.post(
+        "/api/chat/send", headers=session["headers"],
+        json={"match_id": rng.choice(BOT_IDS + MATCH_IDS), "text": rng.choice(CHAT_LINES), "sender": "user"}
+    ))
+
+
+async def history(client, recorder, session, rng):
+    await timed_request(recorder, "GET /api/chat/{id}", client.get(
+        f"/api/chat/{rng.choice(BOT_IDS + MATCH_IDS)}", headers=session["headers"]
+    ))
+
+
+SCENARIOS = {
+    "profile_update": profile_update,
+    "insights": insights,
+    "chat_send": chat_send,
+    "history": history,
+}
+
+
+def parse_mix(raw: str):
+    weights = {}
+    for part in filter(None, raw.split(",")):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def virtual_user(index, args, weights, recorder, deadline):
+    rng = random.Random(args.seed * 100_000 + index)
+    email = f"loadtest_{args.seed}_{rng.randrange(args.population)}@example.com"
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        session = await login(client, recorder, email)
+        if session is None:
+            return
+        names, w = list(weights), list(weights.values())
+        while time.perf_counter() < deadline:
+            await SCENARIOS[rng.choices(names, weights=w)[0]](client, recorder, session, rng)
+            if args.think_ms:
+                await asyncio.sleep(rng.expovariate(1000 / args.think_ms))
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    routes = {}
+    for route, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        routes[route] = {
+            "requests": len(values),
+            "throughput_rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "error_rate": recorder.errors[route] / len(values),
+        }
+    total = sum(r["requests"] for r in routes.values())
+    errors = sum(recorder.errors.values())
+    return {
+        "elapsed_s": elapsed,
+        "requests": total,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "error_rate": errors / total if total else 0.0,
+        "routes": routes,
+    }
+
+
+def print_report(report: dict):
+    print(f"{'route':36s} {'reqs':>7s} {'rps':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'errors':>7s}")
+    for route, r in report["routes"].items():
+        print(f"{route:36s} {r['requests']:7d} {r['throughput_rps']:8.1f} {r['p50_ms']:8.1f} "
+              f"{r['p95_ms']:8.1f} {r['p99_ms']:8.1f} {r['error_rate']:7.1%}")
+    print(f"total: {report['requests']} requests in {report['elapsed_s']:.1f}s, "
+          f"{report['throughput_rps']:.1f} req/s, {report['error_rate']:.1%} errors")
+
+
+async def run(args):
+    weights = parse_mix(args.mix)
+    recorder = Recorder()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(virtual_user(i, args, weights, recorder, deadline) for i in range(args.users)))
+    return summarize(recorder, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--population", type=int, default=1000, help="how many seeded users to pick from")
+    parser.add_argument("--seed", type=int, default=0, help="seed used by synthetic_users.py")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--think-ms", type=float, default=200, help="mean pause between requests (0 = none)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Synthetic SoulSync users for load tests.
+
+    python loadtest/synthetic_users.py --count 10000                   # bulk-load into DATABASE_URL
+    python loadtest/synthetic_users.py --count 10000 --output users.ndjson
+
+Profiles use the categories from app/utils/mappings.json and the fields of
+schemas.UserCreate, with skewed (not uniform) distributions: ages cluster in the
+mid-twenties, traits around the middle of the 1-10 scale, big cities dominate.
+Users get deterministic emails (loadtest_<seed>_<i>@example.com) and share
+LOADTEST_PASSWORD, so run_load.py can log in as any of them.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from app.schemas import UserCreate
+from app.utils.mappings import mappings
+
+LOADTEST_PASSWORD = "loadtest123"
+# Relative weights by category name; categories not listed (e.g. added to mappings.json later) get weight 1
+BIG_CITIES = {"Mumbai": 5, "Delhi": 5, "Bangalore": 5, "Hyderabad": 3, "Chennai": 3, "Pune": 3, "Kolkata": 3}
+GENDER_WEIGHTS = {"male": 12, "female": 12}
+GOAL_WEIGHTS = {"friendship": 2, "serious": 4, "casual": 3, "not_sure": 2}
+TRAITS = ["openness", "extroversion", "agreeableness", "neuroticism", "conscientiousness"]
+LOVE_LANGUAGES = ["words_of_affirmation", "quality_time", "gifts", "physical_touch", "acts_of_service"]
+INTEREST_RATES = {
+    "likes_music": 0.7, "likes_travel": 0.55, "likes_pets": 0.4, "foodie": 0.5, "gym_person": 0.3,
+    "movie_lover": 0.6, "gamer": 0.25, "reader": 0.35, "night_owl": 0.45, "early_bird": 0.25,
+}
+BIO_PARTS = {
+    "likes_music": "always have headphones on",
+    "likes_travel": "planning the next trip",
+    "likes_pets": "dog person through and through",
+    "foodie": "will cross the city for good biryani",
+    "gym_person": "early gym sessions keep me sane",
+    "movie_lover": "ask me for film recommendations",
+    "gamer": "co-op games are my love language",
+    "reader": "currently reading three books at once",
+}
+BIO_ENDINGS = [
+    "Looking for someone kind and curious.",
+    "Here for good conversations and better coffee.",
+    "Not great at small talk, great at deep talk.",
+    "Let's see where this goes!",
+]
+
+
+def _categories(col):
+    return [k for k in mappings.get(col, {}) if k != "nan"]
+
+
+def _pick(rng, col, weights):
+    values = _categories(col)
+    return rng.choices(values, weights=[weights.get(v, 1) for v in values])[0]
+
+
+def _scale(rng, mean, sd, low, high, step=0.5):
+    value = min(high, max(low, rng.gauss(mean, sd)))
+    return round(value / step) * step
+
+
+def generate_user(rng: random.Random, index: int, seed: int) -> dict:
+    age = int(min(60, max(18, rng.triangular(18, 60, 25))))
+    user = {
+        "email": f"loadtest_{seed}_{index}@example.com",
+        "password": LOADTEST_PASSWORD,
+        "full_name": f"Load Tester {index}",
+        "age": age,
+        "gender": _pick(rng, "gender", GENDER_WEIGHTS),
+        "location": _pick(rng, "location", BIG_CITIES),
+        "zodiac_sign": rng.choice(_categories("zodiac_sign")),
+        "relationship_goal": _pick(rng, "relationship_goal", GOAL_WEIGHTS),
+        "fav_music_genre": rng.choice(_categories("fav_music_genre")),
+        "max_distance": rng.choice([10, 25, 50, 50, 100, 200]),
+        "min_age_pref": max(18, age - rng.randint(2, 8)),
+        "max_age_pref": age + rng.randint(2, 10),
+    }
+    for trait in TRAITS:
+        user[trait] = _scale(rng, 5.5, 1.8, 1, 10)
+    for language in LOVE_LANGUAGES:
+        user[language] = int(_scale(rng, 5, 2.2, 1, 10, step=1))
+    for interest, rate in INTEREST_RATES.items():
+        user[interest] = rng.random() < rate
+    parts = [text for key, text in BIO_PARTS.items() if user.get(key)]
+    rng.shuffle(parts)
+    user["bio_text"] = (", ".join(parts[:3]).capitalize() + ". " if parts else "") + rng.choice(BIO_ENDINGS)
+    # Same shape and types as a register request
+    UserCreate(**user)
+    return user
+
+
+def generate_users(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield generate_user(rng, i, seed)
+
+
+def bulk_load(users, batch_size: int = 1000) -> int:
+    """
+    Insert users with one executemany per batch. All of them share one bcrypt hash
+    (hashing per user would dominate seeding time and isn't what a load test measures).
+    """
+    from sqlalchemy import insert
+    from app.auth_utils import get_password_hash
+    from app.database import Base, SessionLocal, engine
+    from app.models.user import User
+    from app.utils.geo import apply_location
+
+    Base.metadata.create_all(bind=engine)
+    hashed = get_password_hash(LOADTEST_PASSWORD)
+    columns = set(User.__table__.columns.keys())
+    db = SessionLocal()
+    loaded, batch = 0, []
+    try:
+        for user in users:
+            row = {k: v for k, v in user.items() if k in columns}
+            row["hashed_password"] = hashed
+            # Core inserts skip the ORM before_insert hook, so derive the location fields here
+            location = SimpleNamespace(location=row["location"])
+            apply_location(location)
+            row.update(latitude=location.latitude, longitude=location.longitude, geo_cell=location.geo_cell)
+            batch.append(row)
+            if len(batch) >= batch_size:
+                db.execute(insert(User), batch)
+                db.commit()
+                loaded += len(batch)
+                batch = []
+        if batch:
+            db.execute(insert(User), batch)
+            db.commit()
+            loaded += len(batch)
+    finally:
+        db.close()
+    return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--output", help="write NDJSON (- for stdout) instead of loading into the database")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    users = generate_users(args.count, args.seed)
+    if args.output:
+        f = sys.stdout if args.output == "-" else open(args.output, "w")
+        for user in users:
+            f.write(json.dumps(user) + "\n")
+        if f is not sys.stdout:
+            f.close()
+            print(f"Wrote {args.count} users to {args.output}")
+        return
+    loaded = bulk_load(users, args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"Loaded {loaded} users in {elapsed:.1f}s ({loaded / elapsed:.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Create missing tables and apply pending schema migrations (backend/app/migrations.py)
+to DATABASE_URL. The API does the same at startup; run this to migrate ahead of a deploy.
+
+Run from the repo root:
+    python migrate.py
+    python migrate.py --list
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app.database import engine, Base
+from app import models  # noqa: F401
+from app.migrations import MIGRATIONS, run_migrations
+from app.logging_config import setup_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--list", action="store_true", help="only list the known migrations")
+    args = parser.parse_args()
+    setup_logging(fmt="text", stream=sys.stderr)
+
+    if args.list:
+        for name, _ in MIGRATIONS:
+            print(name)
+        return
+    Base.metadata.create_all(bind=engine)
+    applied = run_migrations(engine)
+    print("\n".join(applied) if applied else "Database is up to date.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Offline bulk pair scoring.
+
+Streams users out of the `users` table in chunks, scores each user against their
+closest eligible candidates (age preferences + max_distance, at most SCORE_MAX_CANDIDATES)
+with the pairwise score /nearby serves (one N x M block per chunk, see app/utils/pairwise.py),
+and bulk-writes the results to the `compatibility_scores` table. Profile saves keep a
+user's rows fresh on the same scale (app/services/score_cache.py).
+
+Run from the repo root:
+    python score_pairs.py --chunk-size 200 --workers 8
+    python score_pairs.py --restart   # ignore the checkpoint and rescore everyone
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool, cpu_count
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import numpy as np
+from sqlalchemy import delete, insert
+from app.database import SessionLocal, engine, Base
+from app.migrations import run_migrations
+from app.models.user import User
+from app.models.compatibility_score import CompatibilityScore
+from app.services.candidates import nearby_candidate_ids
+from app.services.score_cache import MAX_SCORED_CANDIDATES
+from app.utils.bio_analyzer import analyze_bio
+from app.utils.pairwise import profile_arrays, model_probabilities, pairwise_scores
+from app.model_loader import loader
+from app.logging_config import setup_logging
+
+DEFAULT_CHECKPOINT = "score_pairs.checkpoint.json"
+
+# Per-process caches keyed by candidate id. A candidate's model probability does not
+# depend on who is asking, so every worker runs the model on each candidate at most once.
+_score_cache = {}
+_sentiment_cache = {}
+
+LOAD_BATCH = 5000  # keep IN (...) lists under the SQLite variable limit
+
+
+def _init_worker():
+    # Connections inherited from the parent must not be shared across processes
+    engine.dispose(close=False)
+    loader.model  # lazy load once per worker instead of once per chunk
+
+
+def _load_users(db, ids):
+    users = []
+    for i in range(0, len(ids), LOAD_BATCH):
+        users.extend(db.query(User).filter(User.id.in_(ids[i:i + LOAD_BATCH])).all())
+    return users
+
+
+def _sentiments(users):
+    for u in users:
+        if u.id not in _sentiment_cache:
+            _sentiment_cache[u.id] = u.bio_sentiment if u.bio_sentiment is not None else analyze_bio(u.bio_text)
+    return [_sentiment_cache[u.id] for u in users]
+
+
+def _model_probabilities(candidates):
+    missing = [j for j, c in enumerate(candidates) if c.id not in _score_cache]
+    if missing:
+        subset = [candidates[j] for j in missing]
+        probabilities = model_probabilities(loader.model, profile_arrays(subset, _sentiments(subset)))
+        for cand, prob in zip(subset, probabilities):
+            _score_cache[cand.id] = float(prob)
+    return np.array([_score_cache[c.id] for c in candidates])
+
+
+def _score_block(db, users, eligible):
+    """Score the whole chunk as one N x M block over the union of candidates."""
+    candidates = _load_users(db, sorted(set().union(*eligible.values())))
+    if not candidates:
+        return
+    column = {c.id: j for j, c in enumerate(candidates)}
+    cand_arrays = profile_arrays(candidates, _sentiments(candidates))
+    probs = _model_probabilities(candidates)
+    block = pairwise_scores(profile_arrays(users, _sentiments(users)), cand_arrays, probs)
+    for i, user in enumerate(users):
+        for cid in eligible[user.id]:
+            if cid in column:
+                yield user.id, cid, float(block[i, column[cid]])
+
+
+def score_chunk(user_ids):
+    """Score every user in `user_ids` against their candidates. Runs in a worker process."""
+    db = SessionLocal()
+    try:
+        users = db.query(User).filter(User.id.in_(user_ids)).order_by(User.id).all()
+        eligible = {user.id: nearby_candidate_ids(db, user, limit=MAX_SCORED_CANDIDATES) for user in users}
+        rows = [
+            {
+                "user_id": user_id,
+                "candidate_id": cid,
+                "score": prob * 100,
+                "ghosting_probability": (1.0 - prob) * 100,
+            }
+            for user_id, cid, prob in _score_block(db, users, eligible)
+        ]
+        return user_ids, rows
+    finally:
+        db.close()
+
+
+def iter_user_chunks(after_id, chunk_size):
+    """Keyset-paginate user ids so the users table is never loaded at once."""
+    db = SessionLocal()
+    try:
+        while True:
+            ids = [uid for (uid,) in db.query(User.id).filter(User.id > after_id).order_by(User.id).limit(chunk_size)]
+            if not ids:
+                return
+            yield ids
+            after_id = ids[-1]
+    finally:
+        db.close()
+
+
+def load_checkpoint(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"last_user_id": 0, "rows_written": 0}
+
+
+def save_checkpoint(path, state):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def write_scores(user_ids, rows):
+    """Replace the scores of one chunk of users with a single bulk insert."""
+    db = SessionLocal()
+    try:
+        db.execute(delete(CompatibilityScore).where(CompatibilityScore.user_id.in_(user_ids)))
+        if rows:
+            db.execute(insert(CompatibilityScore), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def run(chunk_size, workers, checkpoint, restart=False, log=print):
+    """Score every user after the checkpoint; workers=0 scores in this process. Returns the final checkpoint state."""
+    state = {"last_user_id": 0, "rows_written": 0} if restart else load_checkpoint(checkpoint)
+    if state["last_user_id"]:
+        log(f"Resuming after user {state['last_user_id']} ({state['rows_written']} rows already written)")
+
+    start = time.perf_counter()
+    rows_this_run = 0
+    chunks = iter_user_chunks(state["last_user_id"], chunk_size)
+    pool = Pool(processes=workers, initializer=_init_worker) if workers else None
+    try:
+        # imap keeps chunk order, so the checkpoint only ever moves past fully written users
+        results = (pool.imap if pool else map)(score_chunk, chunks)
+        for user_ids, rows in results:
+            write_scores(user_ids, rows)
+            rows_this_run += len(rows)
+            state = {"last_user_id": user_ids[-1], "rows_written": state["rows_written"] + len(rows)}
+            save_checkpoint(checkpoint, state)
+
+            elapsed = time.perf_counter() - start
+            log(f"users <= {user_ids[-1]}: {rows_this_run} rows in {elapsed:.1f}s ({rows_this_run / elapsed:.0f} rows/s)")
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+    elapsed = time.perf_counter() - start
+    log(f"✅ Done. {rows_this_run} rows in {elapsed:.1f}s ({rows_this_run / max(elapsed, 1e-9):.0f} rows/s)")
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute compatibility scores for every user.")
+    parser.add_argument("--chunk-size", type=int, default=200, help="users per work unit")
+    parser.add_argument("--workers", type=int, default=cpu_count(), help="scoring processes (default: all cores; 0: no pool)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="checkpoint file used to resume")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+    setup_logging(fmt="text", stream=sys.stderr)  # app log lines; stdout is the report
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    if not loader.model:
+        print("❌ Model not loaded, nothing to score.")
+        sys.exit(1)
+
+    run(args.chunk_size, args.workers, args.checkpoint, restart=args.restart)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,18 @@
 from fastapi.testclient import TestClient
 from app.main import app
+from app.services.jobs import job_queue
 import json
+import uuid
 
 client = TestClient(app)
 
+def register_and_login(**profile):
+    email = f"test_{uuid.uuid4().hex[:12]}@example.com"
+    payload = {"email": email, "password": "secret123", "full_name": "Test User", **profile}
+    assert client.post("/api/auth/register", json=payload).status_code == 200
+    response = client.post("/api/auth/login", data={"username": email, "password": "secret123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
 def test_root():
     response = client.get("/")
     assert response.status_code == 200
@@ -47,6 +56,928 @@ def test_predict():
     assert "compatibility_score" in data
     assert 0 <= data["compatibility_score"] <= 100
 
+def test_pairwise_scores():
+    import numpy as np
+    from app.schemas import UserProfile
+    from app.utils.pairwise import profile_arrays, pairwise_scores
+
+    base = UserProfile(
+        age=25, gender="female", location="Mumbai", openness=7, extroversion=6,
+        agreeableness=8, neuroticism=4, conscientiousness=7, words_of_affirmation=5,
+        quality_time=4, gifts=2, physical_touch=3, acts_of_service=4, likes_music=1,
+        likes_travel=1, likes_pets=0, foodie=1, gym_person=0, movie_lover=0, gamer=0,
+        reader=1, night_owl=0, early_bird=1, zodiac_sign="Leo", relationship_goal="serious",
+        fav_music_genre="rock", bio_text=""
+    )
+    twin = base.model_copy()
+    opposite = base.model_copy(update={
+        "openness": 1, "extroversion": 1, "agreeableness": 1, "neuroticism": 10, "conscientiousness": 1,
+        "likes_music": 0, "likes_travel": 0, "foodie": 0, "reader": 0, "gamer": 1,
+        "early_bird": 0, "night_owl": 1, "relationship_goal": "casual",
+    })
+    users = profile_arrays([base, base])
+    candidates = profile_arrays([twin, opposite])
+    scores = pairwise_scores(users, candidates, np.array([0.5, 0.5]))
+
+    assert scores.shape == (2, 2)
+    assert np.all((scores >= 0) & (scores <= 1))
+    # Same model score, so the pair features decide: the twin must rank higher
+    assert scores[0, 0] > scores[0, 1]
+
+def test_nearby_candidates():
+    tag = uuid.uuid4().hex[:8]
+    headers = register_and_login(age=25, location="Pune", full_name=f"me {tag}")
+    register_and_login(age=26, location="Pune", full_name=f"near {tag}")
+    register_and_login(age=27, location="Delhi", full_name=f"far {tag}")
+
+    for bad in (0, -1, 101):
+        assert client.get(f"/api/discovery/nearby?limit={bad}", headers=headers).status_code == 422
+    response = client.get("/api/discovery/nearby?limit=100", headers=headers)
+    assert response.status_code == 200
+    names = {c["full_name"]: c for c in response.json()["candidates"]}
+    assert f"near {tag}" in names
+    assert names[f"near {tag}"]["distance_km"] == 0
+    assert f"far {tag}" not in names
+
+def test_conversation_list():
+    headers = register_and_login()
+    for match_id, text in [("match_1", "hello there"), ("match_2", "hey"), ("match_1", "you idiot")]:
+        response = client.post("/api/chat/send", json={"match_id": match_id, "text": text, "sender": "user"}, headers=headers)
+        assert response.status_code == 200
+        job_queue.wait_idle(timeout=10)  # bot replies are generated in the background
+
+    response = client.get("/api/chats", headers=headers)
+    assert response.status_code == 200
+    conversations = {c["match_id"]: c for c in response.json()["conversations"]}
+    assert set(conversations) == {"match_1", "match_2"}
+    assert conversations["match_1"]["last_message"]["text"] == "you idiot"
+    assert conversations["match_1"]["toxic_count"] == 1
+    assert conversations["match_1"]["message_count"] == 3  # two user messages + one reply
+    assert conversations["match_2"]["toxic_count"] == 0
+
+def test_write_behind_messages(monkeypatch):
+    from app.services import message_buffer as mb
+    from app.database import SessionLocal
+    from app.models.message import Message
+
+    monkeypatch.setattr(mb, "WRITE_BEHIND_ENABLED", True)
+    headers = register_and_login()
+    response = client.post("/api/chat/send", json={"match_id": "match_3", "text": "hi", "sender": "user"}, headers=headers)
+    assert response.status_code == 200
+    msg_id = response.json()["message"]["id"]
+    job_queue.wait_idle(timeout=10)
+
+    # Visible to reads straight away, before or after the flush
+    history = client.get("/api/chat/match_3", headers=headers).json()["messages"]
+    assert [m["sender"] for m in history] == ["user", "match"]
+    assert history[0]["id"] == msg_id
+
+    mb.message_buffer.stop()
+    db = SessionLocal()
+    try:
+        assert db.query(Message).filter(Message.id == msg_id).count() == 1
+    finally:
+        db.close()
+    assert client.get("/api/chat/match_3", headers=headers).json()["messages"] == history
+
+def test_chat_websocket():
+    import pytest
+    from starlette.websockets import WebSocketDisconnect
+
+    token = register_and_login()["Authorization"].split()[1]
+    with client.websocket_connect(f"/ws/chat?token={token}") as ws:
+        ws.send_json({"match_id": "match_1", "text": "hello"})
+        events = [ws.receive_json() for _ in range(3)]
+        assert [e["type"] for e in events] == ["message", "moderation", "message"]
+        assert events[0]["message"]["text"] == "hello"
+        assert events[1]["is_toxic"] is False
+        assert events[2]["message"]["sender"] == "match"
+
+        ws.send_json({"match_id": "match_1", "text": "you idiot"})
+        assert ws.receive_json()["type"] == "message"
+        verdict = ws.receive_json()
+        assert verdict["is_toxic"] is True and verdict["warning"]
+
+        # Malformed frames get an error frame and the socket stays open
+        for frame in ({"match_id": "match_1", "text": 42}, {"match_id": None, "text": "hi"}, ["match_1", "hi"], "plain"):
+            ws.send_json(frame)
+            assert ws.receive_json()["type"] == "error"
+        ws.send_text("not json")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"match_id": "match_1", "text": "still here"})
+        assert ws.receive_json()["message"]["text"] == "still here"
+
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/ws/chat?token=garbage") as ws:
+            ws.receive_json()
+
+def test_job_queue_retries_with_durable_store(tmp_path):
+    from app.services.jobs import JobQueue
+
+    queue = JobQueue(store_path=str(tmp_path / "jobs.db"))
+    calls = []
+
+    @queue.job("flaky", max_attempts=3, backoff=0.01)
+    def flaky(n):
+        calls.append(n)
+        if len(calls) < 2:
+            raise RuntimeError("upstream hiccup")
+
+    queue.enqueue("flaky", n=1)
+    assert queue.wait_idle(timeout=5)
+    assert calls == [1, 1]
+    assert queue.store.recover() == []  # finished jobs are removed from the store
+    queue.stop()
+
+def test_bot_completion_cache(monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+    from app.services import ai_service
+    from app.services.completion_cache import CompletionCache
+
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Hey you! ✨"))],
+            usage=SimpleNamespace(total_tokens=120),
+        )
+
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(ai_service, "get_groq_client", lambda: fake_client)
+    monkeypatch.setattr(ai_service, "completion_cache", CompletionCache(enabled=True, policy="openers"))
+
+    assert asyncio.run(ai_service.get_bot_response("bot_luna", "hi", [])) == "Hey you! ✨"
+    assert asyncio.run(ai_service.get_bot_response("bot_luna", "Hi!!", [])) == "Hey you! ✨"
+    assert len(calls) == 1
+
+    # Not an opener once there is context
+    asyncio.run(ai_service.get_bot_response("bot_luna", "hi", [{"text": "earlier", "sender": "match"}]))
+    assert len(calls) == 2
+
+    stats = ai_service.completion_cache.stats()
+    assert stats["hits"] == 1 and stats["saved_tokens"] == 120
+
+def test_context_builder_budget_and_summary(monkeypatch):
+    from datetime import datetime, timedelta
+    from app.database import SessionLocal
+    from app.models.message import Message
+    from app.services import context_builder as cb
+
+    monkeypatch.setattr(cb, "CONTEXT_TOKEN_BUDGET", 250)
+    monkeypatch.setattr(cb, "SUMMARY_TOKEN_BUDGET", 100)
+    headers = register_and_login()
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+
+    db = SessionLocal()
+    try:
+        start = datetime.now() - timedelta(minutes=30)
+        for i in range(12):
+            sender = "user" if i % 2 == 0 else "match"
+            db.add(Message(user_id=user_id, match_id="bot_luna", sender=sender, is_toxic=False,
+                           text=f"turn {i}: " + "words " * 20, timestamp=start + timedelta(minutes=i)))
+        db.commit()
+
+        summary, history = cb.build_context(db, user_id, "bot_luna", "what now?", "Luna")
+        used = sum(cb.estimate_tokens(m["text"]) + cb.MESSAGE_OVERHEAD_TOKENS for m in history)
+        assert history and used <= 250 - 100
+        assert history[-1]["text"].startswith("turn 11")
+        # Everything older than the kept turns went into the summary, which has its own budget
+        first_kept = int(history[0]["text"].split(":")[0].split()[1])
+        assert f"turn {first_kept - 1}:" in summary.split("\n")[-1]
+        assert cb.estimate_tokens(summary) <= cb.SUMMARY_TOKEN_BUDGET
+
+        # Folded turns are not re-read: the next call starts after the summary cursor
+        summary_again, history_again = cb.build_context(db, user_id, "bot_luna", "what now?", "Luna")
+        assert summary_again == summary and history_again == history
+    finally:
+        db.close()
+
+def test_rate_limit_buckets(tmp_path, monkeypatch):
+    import asyncio
+    from app.services.rate_limit import RateLimitMiddleware, MemoryBuckets, DatabaseBuckets
+    from app.services.ai_service import get_bot_response, llm_slots, LLMOverloaded, BUSY_REPLY
+
+    limited = TestClient(RateLimitMiddleware(app, MemoryBuckets(burst=25, rate=0.001), enabled=True))
+    headers = register_and_login()  # via the unlimited client
+    assert limited.get("/api/auth/me", headers=headers).status_code == 200
+    # Login costs 10: two fit in the remaining IP bucket, the third is rejected
+    for _ in range(2):
+        assert limited.post("/api/auth/login", data={"username": "nobody@example.com", "password": "x"}).status_code == 401
+    response = limited.post("/api/auth/login", data={"username": "nobody@example.com", "password": "x"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    # Authenticated requests are charged to the user, not the IP
+    assert limited.get("/api/auth/me", headers=headers).status_code == 200
+
+    # Shared table backend: a second instance (another worker) sees the same bucket
+    url = f"sqlite:///{tmp_path / 'ratelimit.db'}"
+    first, second = DatabaseBuckets(burst=10, rate=0.001, url=url), DatabaseBuckets(burst=10, rate=0.001, url=url)
+    assert first.take("ip:1.2.3.4", 6) == (True, 0.0)
+    allowed, retry_after = second.take("ip:1.2.3.4", 6)
+    assert not allowed and retry_after > 0
+    assert second.take("ip:1.2.3.4", 4)[0]
+
+    # Clients can prepend X-Forwarded-For hops; only the trusted proxies' entries count
+    from app.services.rate_limit import client_key
+    spoofed = {"x-forwarded-for": "6.6.6.6, 1.2.3.4"}
+    assert client_key(spoofed, "10.0.0.1", trusted_proxies=1) == "ip:1.2.3.4"
+    assert client_key(spoofed, "10.0.0.1", trusted_proxies=2) == "ip:6.6.6.6"
+    assert client_key(spoofed, "10.0.0.1", trusted_proxies=0) == "ip:10.0.0.1"
+    assert client_key({"x-forwarded-for": "1.2.3.4"}, "10.0.0.1", trusted_proxies=2) == "ip:10.0.0.1"
+    assert client_key({}, "10.0.0.1") == "ip:10.0.0.1"
+
+    # Past the in-flight cap, LLM calls are shed instead of queued
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    limit = llm_slots.limit
+    llm_slots.limit = 0
+    try:
+        assert asyncio.run(get_bot_response("bot_luna", "hi there")) == BUSY_REPLY
+        try:
+            asyncio.run(get_bot_response("bot_luna", "hi there", fallback_on_error=False))
+            assert False, "expected LLMOverloaded"
+        except LLMOverloaded:
+            pass
+    finally:
+        llm_slots.limit = limit
+
+def test_metrics_endpoint(monkeypatch):
+    from app.routes import metrics as metrics_route
+    from app.services.metrics import Registry
+
+    headers = register_and_login()
+    assert client.post("/api/chat/send", json={"match_id": "match_3", "text": "hello", "sender": "user"}, headers=headers).status_code == 200
+    job_queue.wait_idle(10)
+    # Without a token only direct loopback requests are served
+    assert client.get("/metrics").status_code == 403
+    local = TestClient(app, client=("127.0.0.1", 50000))
+    assert local.get("/metrics", headers={"X-Forwarded-For": "6.6.6.6"}).status_code == 403
+    monkeypatch.setattr(metrics_route, "METRICS_TOKEN", "scrape-token")
+    assert local.get("/metrics").status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'soulsync_stage_duration_seconds_count{stage="chat.moderation"}' in body
+    assert 'soulsync_stage_duration_seconds_bucket{stage="chat.db_write",le="+Inf"}' in body
+    assert "soulsync_bot_cache_hit_ratio" in body
+    assert "soulsync_jobs_pending" in body
+    monkeypatch.setattr(metrics_route, "METRICS_TOKEN", None)
+    assert local.get("/metrics").status_code == 200
+
+    registry = Registry(enabled=True)
+
+    @registry.timed("demo")
+    def work():
+        return 42
+
+    assert work() == 42
+    assert registry.stages["demo"].count == 1
+    assert Registry(enabled=False).stage("demo") is Registry(enabled=False).stage("other")
+
+def test_profiling_middleware(tmp_path, monkeypatch):
+    from app import auth_utils
+    from app.services.profiler import ProfilingMiddleware, startup_profile
+
+    admin_email = f"admin_{uuid.uuid4().hex[:8]}@example.com"
+    monkeypatch.setattr(auth_utils, "ADMIN_EMAILS", {admin_email})
+    assert client.post("/api/auth/register", json={"email": admin_email, "password": "secret123", "full_name": "Admin"}).status_code == 200
+    token = client.post("/api/auth/login", data={"username": admin_email, "password": "secret123"}).json()["access_token"]
+    profiled = TestClient(ProfilingMiddleware(app, sample_rate=0, directory=str(tmp_path)))
+
+    # Header from a regular user is ignored
+    assert profiled.get("/api/auth/me", headers={**register_and_login(), "X-Profile": "1"}).status_code == 200
+    assert list(tmp_path.iterdir()) == []
+
+    assert profiled.get("/api/auth/me", headers={"Authorization": f"Bearer {token}", "X-Profile": "1"}).status_code == 200
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1
+    assert "GET_api_auth_me" in files[0].name and files[0].name.endswith("ms.folded")
+    for line in files[0].read_text().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and ";" in stack
+
+    # Disabled startup hook is a no-op
+    assert startup_profile("model_load") is startup_profile("feature_stats")
+
+def test_bulk_user_import(monkeypatch):
+    from app import auth_utils
+    from app.database import SessionLocal
+    from app.models.user import User
+
+    admin_email = f"admin_{uuid.uuid4().hex[:8]}@example.com"
+    monkeypatch.setattr(auth_utils, "ADMIN_EMAILS", {admin_email})
+    assert client.post("/api/auth/register", json={"email": admin_email, "password": "secret123", "full_name": "Admin"}).status_code == 200
+    token = client.post("/api/auth/login", data={"username": admin_email, "password": "secret123"}).json()["access_token"]
+    admin = {"Authorization": f"Bearer {token}"}
+
+    tag = uuid.uuid4().hex[:8]
+    ndjson = "\n".join([
+        json.dumps({"email": f"a_{tag}@example.com", "password": "pw1", "full_name": "A", "location": "Chennai", "bio_text": "I love long happy walks"}),
+        json.dumps({"email": f"a_{tag}@example.com", "password": "pw1", "full_name": "A again"}),
+        json.dumps({"email": admin_email, "password": "pw", "full_name": "Taken"}),
+        "{not json",
+        json.dumps({"email": f"b_{tag}@example.com", "password": "pw2", "full_name": "B", "age": 31}),
+    ])
+    assert client.post("/api/admin/users/import", content=ndjson, headers=register_and_login()).status_code == 403
+    report = client.post("/api/admin/users/import", content=ndjson, headers=admin).json()
+    assert (report["imported"], report["duplicates"], report["existing"], report["invalid"]) == (2, 1, 1, 1)
+    assert report["errors"][0]["line"] == 4
+
+    # Rows carry updated_at themselves: COPY on Postgres skips the column default
+    from app.services import bulk_import
+    inserted, insert_rows = [], bulk_import.BulkImporter._insert
+    monkeypatch.setattr(bulk_import.BulkImporter, "_insert", lambda self, rows: (inserted.extend(rows), insert_rows(self, rows)))
+    csv_body = f"email,password,full_name,age,likes_music\nc_{tag}@example.com,pw3,C,27,1\n"
+    report = client.post("/api/admin/users/import?format=csv", content=csv_body, headers=admin).json()
+    assert report["imported"] == 1
+    assert [r["updated_at"] is not None for r in inserted] == [True]
+
+    # Streamed byte by byte: multi-byte characters split across chunks, quoted fields spanning lines
+    body = f'email,password,full_name,bio_text\nd_{tag}@example.com,pw4,Zoë,"Chai lover ☕\nand ""night owl"""\n'.encode()
+    report = client.post("/api/admin/users/import?format=csv", content=(body[i:i + 1] for i in range(len(body))), headers=admin).json()
+    assert (report["imported"], report["invalid"]) == (1, 0)
+
+    # Emails are matched exactly, in the batch and against the database alike (as /register does)
+    cased = "\n".join(json.dumps({"email": email, "password": "pw5", "full_name": "E"}) for email in (f"E_{tag}@example.com", f"e_{tag}@example.com"))
+    assert client.post("/api/admin/users/import", content=cased, headers=admin).json()["imported"] == 2
+    report = client.post("/api/admin/users/import", content=cased, headers=admin).json()
+    assert (report["imported"], report["existing"], report["duplicates"]) == (0, 2, 0)
+
+    # Imported users can log in, and derived fields were filled in the same pass
+    assert client.post("/api/auth/login", data={"username": f"a_{tag}@example.com", "password": "pw1"}).status_code == 200
+    db = SessionLocal()
+    try:
+        a = db.query(User).filter(User.email == f"a_{tag}@example.com").one()
+        c = db.query(User).filter(User.email == f"c_{tag}@example.com").one()
+        d = db.query(User).filter(User.email == f"d_{tag}@example.com").one()
+        assert (d.full_name, d.bio_text) == ("Zoë", 'Chai lover ☕\nand "night owl"')
+        assert a.bio_sentiment > 0 and a.geo_cell is not None
+        assert c.age == 27 and c.likes_music is True
+    finally:
+        db.close()
+
+def test_conditional_requests_and_compression():
+    response = client.get("/api/matches")
+    assert response.status_code == 200 and len(response.json()["matches"]) == 5
+    etag = response.headers["ETag"]
+    assert "Last-Modified" in response.headers
+    assert client.get("/api/matches", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/matches", headers={"If-Modified-Since": response.headers["Last-Modified"]}).status_code == 304
+
+    headers = register_and_login()
+    me = client.get("/api/auth/me", headers=headers)
+    assert me.status_code == 200 and me.json()["email"].startswith("test_")
+    assert client.get("/api/auth/me", headers={**headers, "If-None-Match": me.headers["ETag"]}).status_code == 304
+    profile = {k: v for k, v in me.json().items() if k not in ("id", "email", "full_name")}
+    assert client.put("/api/auth/me", json={**profile, "age": 33}, headers=headers).status_code == 200
+    changed = client.get("/api/auth/me", headers={**headers, "If-None-Match": me.headers["ETag"]})
+    assert changed.status_code == 200 and changed.json()["age"] == 33
+
+    # Insights validators don't depend on the model run, so revalidation works even without the model
+    insights = client.get("/api/discovery/insights/match_1", headers={**headers, "If-None-Match": '"stale"'})
+    if insights.status_code == 200:
+        assert client.get("/api/discovery/insights/match_1", headers={**headers, "If-None-Match": insights.headers["ETag"]}).status_code == 304
+
+    for i in range(30):
+        client.post("/api/chat/send", json={"match_id": "match_2", "text": f"long history message number {i}", "sender": "user"}, headers=headers)
+    history = client.get("/api/chat/match_2", headers={**headers, "Accept-Encoding": "gzip"})
+    assert history.headers.get("content-encoding") == "gzip"
+    assert len(history.json()["messages"]) >= 30
+
+def test_read_replica_routing(tmp_path, monkeypatch):
+    from sqlalchemy import insert, select
+    from sqlalchemy.orm import sessionmaker
+    from app import database
+    from app.models.user import User
+
+    headers = register_and_login()
+    me = client.get("/api/auth/me", headers=headers).json()
+
+    # Second SQLite file as the replica, holding a lagging copy of the user
+    replica = database._make_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    database.Base.metadata.create_all(bind=replica)
+    with database.engine.connect() as conn:
+        row = dict(conn.execute(select(User.__table__).where(User.id == me["id"])).mappings().one())
+    with replica.begin() as conn:
+        conn.execute(insert(User.__table__), {**row, "full_name": "Replica Copy"})
+    monkeypatch.setattr(database, "ReplicaSessionLocal", sessionmaker(bind=replica))
+    monkeypatch.setattr(database, "recent_writes", database.RecentWrites(window=60))
+
+    assert client.get("/api/auth/me", headers=headers).json()["full_name"] == "Replica Copy"
+    assert client.get("/api/chat/match_1", headers=headers).json()["messages"] == []
+
+    # After a write the same user reads the primary for the sticky window...
+    profile = {k: v for k, v in me.items() if k not in ("id", "email", "full_name")}
+    assert client.put("/api/auth/me", json={**profile, "age": 41}, headers=headers).status_code == 200
+    fresh = client.get("/api/auth/me", headers=headers).json()
+    assert fresh["full_name"] == "Test User" and fresh["age"] == 41
+
+    # ...other users keep reading the replica, and so does this one once the window has passed
+    assert not database.recent_writes.recent("someone_else@example.com")
+    monkeypatch.setattr(database.recent_writes, "window", 0)
+    assert client.get("/api/auth/me", headers=headers).json()["full_name"] == "Replica Copy"
+
+    # Messages sent over the websocket count as writes too
+    monkeypatch.setattr(database, "recent_writes", database.RecentWrites(window=60))
+    token = headers["Authorization"].split()[1]
+    with client.websocket_connect(f"/ws/chat?token={token}") as ws:
+        ws.send_json({"match_id": "match_1", "text": "over the socket"})
+        assert ws.receive_json()["type"] == "message"
+    job_queue.wait_idle(10)
+    history = client.get("/api/chat/match_1", headers=headers).json()["messages"]
+    assert "over the socket" in [m["text"] for m in history]
+
+def test_message_archive_pagination():
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from app.database import SessionLocal
+    from app.models.message import Message
+    from app.services.message_archive import archive_messages, archive_tables, compact_archive
+
+    headers = register_and_login()
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    now = datetime.utcnow()
+    # 60 messages spread over two months, 200+ days ago, then 5 recent ones
+    rows = [
+        {"user_id": user_id, "match_id": "match_1", "text": f"old {i}", "sender": "user" if i % 2 else "match",
+         "timestamp": now - timedelta(days=230 - i), "is_toxic": i % 10 == 0}
+        for i in range(60)
+    ] + [
+        {"user_id": user_id, "match_id": "match_1", "text": f"new {i}", "sender": "user",
+         "timestamp": now - timedelta(minutes=5 - i), "is_toxic": False}
+        for i in range(5)
+    ]
+    db = SessionLocal()
+    try:
+        db.execute(insert(Message), rows)
+        db.commit()
+        # Two runs with different cutoffs leave several chunks per month; compaction merges them
+        first = archive_messages(db, older_than_days=215, keep_recent=10, now=now)
+        second = archive_messages(db, older_than_days=90, keep_recent=10, now=now)
+        assert first["archived"] + second["archived"] == 55
+        assert len(archive_tables(db)) >= 2
+        assert compact_archive(db) > 0
+        assert db.query(Message).filter(Message.user_id == user_id).count() == 10
+    finally:
+        db.close()
+
+    # The unpaged history is the hot window only
+    hot = client.get("/api/chat/match_1", headers=headers).json()
+    assert len(hot["messages"]) == 10 and hot["has_more"] is True
+    assert hot["messages"][-1]["text"] == "new 4"
+
+    # Paging back crosses from the hot rows into the archive, in order and without gaps
+    collected, before = [], None
+    while True:
+        params = {"limit": 12, **({"before": before} if before else {})}
+        page = client.get("/api/chat/match_1", params=params, headers=headers).json()
+        collected = page["messages"] + collected
+        if not page["has_more"]:
+            break
+        before = page["messages"][0]["id"]
+    assert [m["text"] for m in collected] == [r["text"] for r in rows]
+    assert [m["is_toxic"] for m in collected] == [r["is_toxic"] for r in rows]
+
+    conversation = client.get("/api/chats", headers=headers).json()["conversations"][0]
+    assert conversation["message_count"] == 65 and conversation["toxic_count"] == 6
+    assert conversation["last_message"]["text"] == "new 4"
+
+def test_structured_logging():
+    import io
+    import logging
+    from app.logging_config import setup_logging, stop_logging
+
+    out = io.StringIO()
+    setup_logging(level="INFO", levels="app.chatty=DEBUG", fmt="json", stream=out)
+    try:
+        logging.getLogger("app.chatty").debug("debug for %s", "chatty", extra={"user_id": 7})
+        logging.getLogger("app.quiet").debug("filtered out")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("app.quiet").exception("failed: %s", "boom")
+        stop_logging()  # drains the queue
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+    finally:
+        setup_logging()
+
+    assert [r["logger"] for r in records] == ["app.chatty", "app.quiet"]
+    assert records[0]["level"] == "DEBUG" and records[0]["msg"] == "debug for chatty" and records[0]["user_id"] == 7
+    assert records[1]["level"] == "ERROR" and "ValueError: boom" in records[1]["exc"]
+
+def test_lite_insights():
+    from app.utils.insight_rules import rules
+    from app.schemas import UserProfile
+
+    response = client.get("/api/discovery/insights/lite?ids=match_1,match_2")
+    assert response.status_code == 200
+    insights = {i["match_id"]: i for i in response.json()["insights"]}
+    assert list(insights) == ["match_1", "match_2"]
+    priya = insights["match_1"]
+    assert [f["text"] for f in priya["flags"]] == ["Adventurous 🌍", "Walking Therapist 🧠", "Food > You 🍕"]
+    assert [t["event"] for t in priya["timeline"]][2] == "Moving in together? 🏠"
+    assert "ghosting_probability" not in priya
+    assert client.get("/api/discovery/insights/lite", headers={"If-None-Match": response.headers["ETag"]}).status_code == 200
+    assert client.get("/api/discovery/insights/lite?ids=match_1,match_2", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+    assert client.get("/api/discovery/insights/lite?ids=nope").status_code == 404
+
+    # Batch evaluation matches one-at-a-time evaluation, and the ghosting rule only fires with a probability
+    base = {"age": 25, "gender": "Female", "location": "Pune", "extroversion": 5, "words_of_affirmation": 3, "quality_time": 3,
+            "gifts": 3, "physical_touch": 3, "acts_of_service": 3, "likes_pets": 0, "movie_lover": 0, "night_owl": 0,
+            "early_bird": 0, "fav_music_genre": "Pop", "bio_text": ""}
+    profiles = [
+        UserProfile(**base, openness=o, agreeableness=a, neuroticism=n, conscientiousness=c, likes_music=m, likes_travel=t,
+                    foodie=f, gym_person=g, gamer=gm, reader=r, zodiac_sign=z, relationship_goal=goal)
+        for o, a, n, c, m, t, f, g, gm, r, z, goal in [
+            (9, 9, 9, 9, 1, 1, 1, 1, 1, 1, "Scorpio", "Marriage"),
+            (1, 1, 1, 1, 0, 0, 0, 0, 0, 0, "Leo", "Casual"),
+            (5, 8, 9, 8, 0, 1, 0, 0, 1, 0, "Scorpio", "Long-term"),
+        ]
+    ]
+    batch = rules.evaluate(profiles, [0.5, -0.2, 0.0], [0.1, 0.9, 0.7])
+    assert batch == [rules.evaluate([p], [s], [g])[0] for p, s, g in zip(profiles, [0.5, -0.2, 0.0], [0.1, 0.9, 0.7])]
+    assert len(batch[0]["flags"]) == 4 and len(batch[0]["icebreakers"]) == 3
+    assert batch[1]["flags"] == [{"type": "red", "text": "Ghosting Risk 👻"}]
+    assert batch[1]["icebreakers"] == ["What's the most spontaneous thing you've done recently?"]
+    assert batch[1]["bio_feedback"] == "Consider making your bio more positive."
+    assert batch[0]["safety_score"] == 100.0 and batch[1]["safety_score"] == 50 + 3 + 3 - 2
+    assert "Ghosting Risk 👻" not in [f["text"] for f in rules.evaluate(profiles[1:2], [0.0])[0]["flags"]]
+
+def test_debug_memory(monkeypatch):
+    import tracemalloc
+    from app import auth_utils
+    from app.utils.feature_stats import feature_stats
+    from app.utils.mappings import mappings
+
+    admin_email = f"admin_{uuid.uuid4().hex[:8]}@example.com"
+    monkeypatch.setattr(auth_utils, "ADMIN_EMAILS", {admin_email})
+    assert client.post("/api/auth/register", json={"email": admin_email, "password": "secret123", "full_name": "Admin"}).status_code == 200
+    token = client.post("/api/auth/login", data={"username": admin_email, "password": "secret123"}).json()["access_token"]
+    admin = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/api/admin/debug/memory", headers=register_and_login()).status_code == 403
+    report = client.get("/api/admin/debug/memory", headers=admin).json()
+    assert report["rss_bytes"] > 0 and report["peak_rss_bytes"] >= report["rss_bytes"] // 2
+    assert report["artifacts"]["feature_stats"]["bytes"] == feature_stats.nbytes
+    assert "bio_text" not in mappings and report["artifacts"]["mappings"]["columns"] == len(mappings)
+    assert feature_stats.mean.dtype.name == "float32"
+    if not tracemalloc.is_tracing():
+        assert report["tracing"] is False and report["top_allocations"] is None
+        tracemalloc.start()
+        try:
+            blob = [bytearray(1024) for _ in range(2000)]
+            report = client.get("/api/admin/debug/memory?top=5", headers=admin).json()
+        finally:
+            tracemalloc.stop()
+        assert report["tracing"] is True and 0 < len(report["top_allocations"]) <= 5
+        assert any("test_backend.py" in site["site"] for site in report["top_allocations"])
+        del blob
+
+def test_batch_profile_decode():
+    import numpy as np
+    from app.schemas import UserProfile
+    from app.utils.pairwise import profile_arrays
+    from app.utils.profile_batch import decode_profiles
+    from app.model_loader import loader
+
+    base = {"age": 25, "gender": "Female", "location": "Pune", "openness": 8.5, "extroversion": 5, "agreeableness": 8,
+            "neuroticism": 3, "conscientiousness": 6, "words_of_affirmation": 3, "quality_time": 4, "gifts": 2,
+            "physical_touch": 3, "acts_of_service": 5, "likes_music": 1, "likes_travel": 0, "likes_pets": 1, "foodie": 1,
+            "gym_person": 0, "movie_lover": 0, "gamer": 0, "reader": 1, "night_owl": 0, "early_bird": 1,
+            "zodiac_sign": "Scorpio", "relationship_goal": "Marriage", "fav_music_genre": "Rock", "bio_text": "hi"}
+    rows = [base, {**base, "age": "31", "gender": "Male", "gamer": True, "bio_text": ""}]
+    batch = decode_profiles(json.dumps(rows).encode())
+    expected = profile_arrays([UserProfile(**row) for row in rows], [0.1, 0.0])
+    for key, value in profile_arrays(batch, [0.1, 0.0]).items():
+        assert np.array_equal(value, expected[key]), key
+
+    headers = register_and_login()
+    bad = [base, {**base, "age": 2.5, "bio_text": None}, {k: v for k, v in base.items() if k != "gender"}]
+    response = client.post("/api/predict_compatibility/batch", content=json.dumps(bad), headers=headers)
+    assert response.status_code == 422
+    assert {tuple(e["loc"]) for e in response.json()["detail"]} == {("body", 2, "gender")}
+    bad.pop()
+    locs = {tuple(e["loc"]) for e in client.post("/api/predict_compatibility/batch", content=json.dumps(bad), headers=headers).json()["detail"]}
+    assert locs == {("body", 1, "age"), ("body", 1, "bio_text")}
+    # "inf" and "nan" convert to floats but are rejected
+    infinite = json.dumps([{**base, "openness": "inf", "age": "-inf"}])
+    errors = client.post("/api/predict_compatibility/batch", content=infinite, headers=headers).json()["detail"]
+    assert {(tuple(e["loc"]), e["type"]) for e in errors} == {(("body", 0, "openness"), "finite_number"), (("body", 0, "age"), "finite_number")}
+
+    response = client.post("/api/predict_compatibility/batch", content=json.dumps(rows), headers=headers)
+    if not loader.model:
+        assert response.status_code == 503
+    else:
+        results = response.json()["results"]
+        assert len(results) == 2 and all(0 <= r["compatibility_score"] <= 100 for r in results)
+        assert results[0]["flags"][0]["text"] == "Adventurous 🌍"
+
+def test_candidate_search_uses_indexes(tmp_path):
+    import random
+    from sqlalchemy import MetaData, Table, create_engine, func, inspect, select
+    from sqlalchemy.orm import sessionmaker
+    from app import models  # noqa: F401
+    from app.database import Base, query_plan
+    from app.migrations import run_migrations
+    from app.models.user import User
+    from app.services.candidates import eligible_candidates_query, _nearby_ids, _within_radius_query
+    from app.utils.geo import CITY_COORDS, city_coordinates, grid_cell
+
+    # A database from before the geo/sentiment columns and the candidate indexes, with 100k users
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    added = {"latitude", "longitude", "geo_cell", "bio_sentiment", "updated_at"}
+    old_users = Table("users", MetaData(), *[c._copy() for c in User.__table__.columns if c.name not in added])
+    old_users.create(engine)
+    rng = random.Random(7)
+    cities = list(CITY_COORDS) + ["Atlantis"]
+    with engine.begin() as conn:
+        conn.execute(old_users.insert(), [
+            {"email": f"u{i}@example.com", "full_name": f"U{i}", "age": rng.randint(18, 60), "location": rng.choice(cities),
+             "min_age_pref": 18, "max_age_pref": 100, "max_distance": 50}
+            for i in range(100_000)
+        ])
+
+    Base.metadata.create_all(bind=engine)
+    assert run_migrations(engine) == [
+        "0001_users_geo_columns", "0002_messages_conversation_index", "0003_users_bio_sentiment",
+        "0004_users_updated_at", "0005_users_candidate_search_indexes",
+    ]
+    assert run_migrations(engine) == []
+    assert added <= {c["name"] for c in inspect(engine).get_columns("users")}
+    indexes = {i["name"] for i in inspect(engine).get_indexes("users")}
+    assert {"ix_users_geo_cell_age", "ix_users_age"} <= indexes and "ix_users_geo_cell" not in indexes
+
+    db = sessionmaker(bind=engine)()
+    try:
+        pune = db.scalars(select(User).where(User.location == "Pune").limit(1)).one()
+        assert (pune.latitude, pune.longitude) == city_coordinates("Pune") and pune.geo_cell == grid_cell(*city_coordinates("Pune"))
+        assert db.scalar(select(func.count()).select_from(User).where(User.location == "Atlantis", User.geo_cell.isnot(None))) == 0
+
+        pune.min_age_pref, pune.max_age_pref = 25, 30
+        for query in (_within_radius_query(db, pune, 50), eligible_candidates_query(db, pune)):
+            plan = query_plan(db, query)
+            scans = [step for step in plan if step.startswith("SCAN") or "Seq Scan" in step]
+            assert not scans, plan
+            assert any("USING INDEX ix_users_" in step for step in plan), plan
+
+        # A limited search ranks and cuts in SQL, and agrees with the full sort (Pune and Mumbai are ~120 km apart)
+        full = _nearby_ids(db, pune, 200)
+        n = sum(1 for _, d in full if d == 0) + 5
+        limited = _nearby_ids(db, pune, 200, limit=n)
+        assert len(limited) == n and [d for _, d in limited] == [d for _, d in full[:n]]
+        assert _nearby_ids(db, pune, 50, limit=10 ** 6) == sorted(_nearby_ids(db, pune, 50), key=lambda pair: (pair[1], pair[0]))
+    finally:
+        db.close()
+
+def test_score_pairs_resume(tmp_path, monkeypatch):
+    import numpy as np
+    import pytest
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import sessionmaker
+    import score_pairs
+    from app.database import Base
+    from app.model_loader import loader
+    from app.models.compatibility_score import CompatibilityScore
+    from app.models.user import User
+
+    class StubModel:
+        def predict_proba(self, frame):
+            p = 1.0 / (1.0 + np.exp(-np.nan_to_num(np.asarray(frame, dtype=float)).sum(axis=1) / 100))
+            return np.column_stack([1.0 - p, p])
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'pairs.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all([
+            User(email=f"p{i}@example.com", full_name=f"P{i}", age=20 + i % 15, location=("Pune", "Mumbai", "Atlantis")[i % 3],
+                 min_age_pref=18, max_age_pref=40, max_distance=50, bio_sentiment=0.1)
+            for i in range(23)
+        ])
+        db.commit()
+    monkeypatch.setattr(score_pairs, "SessionLocal", Session)
+    monkeypatch.setattr(loader, "_model", StubModel())
+
+    def pairs():
+        with Session() as db:
+            rows = db.execute(select(CompatibilityScore.user_id, CompatibilityScore.candidate_id, CompatibilityScore.score)).all()
+        return sorted((u, c, round(s, 6)) for u, c, s in rows)
+
+    quiet = lambda *_: None
+    score_pairs._score_cache.clear()
+    expected_state = score_pairs.run(5, 0, str(tmp_path / "full.json"), log=quiet)
+    expected = pairs()
+    assert expected and len(set((u, c) for u, c, _ in expected)) == len(expected)
+
+    # Interrupt after two chunks, then resume from the checkpoint
+    with Session() as db:
+        db.query(CompatibilityScore).delete()
+        db.commit()
+    write_scores, calls = score_pairs.write_scores, []
+    def flaky_write(user_ids, rows):
+        calls.append(user_ids)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        write_scores(user_ids, rows)
+    monkeypatch.setattr(score_pairs, "write_scores", flaky_write)
+    checkpoint = str(tmp_path / "resume.json")
+    score_pairs._score_cache.clear()
+    with pytest.raises(KeyboardInterrupt):
+        score_pairs.run(5, 0, checkpoint, log=quiet)
+    assert score_pairs.load_checkpoint(checkpoint)["last_user_id"] == calls[1][-1]
+
+    monkeypatch.setattr(score_pairs, "write_scores", write_scores)
+    score_pairs._score_cache.clear()
+    state = score_pairs.run(5, 0, checkpoint, log=quiet)
+    assert pairs() == expected
+    assert state == expected_state
+
+    # A profile save rescores the user's rows on the same scale as the bulk job
+    from app.services import score_cache
+    with Session() as db:
+        assert score_cache.refresh_user_scores(db, 1) > 0
+    assert pairs() == expected
+
+    # Requesters are loaded and rescored a few at a time
+    monkeypatch.setattr(score_cache, "LOAD_BATCH", 2)
+    with Session() as db:
+        assert score_cache.refresh_user_scores(db, 1) > 0
+    assert pairs() == expected
+
+def test_message_ids_unique_across_processes():
+    from app.services.message_buffer import IdAllocator
+
+    # Two allocators stand in for two workers sharing one database
+    first, second = IdAllocator(block_size=5), IdAllocator(block_size=5)
+    ids = [first.next_id(), second.next_id()] + [a.next_id() for _ in range(6) for a in (first, second)]
+    assert len(set(ids)) == len(ids)
+
+def test_write_behind_poison_row():
+    from app.services.message_buffer import MessageBuffer
+    from app.database import SessionLocal
+    from app.models.message import Message
+
+    buffer = MessageBuffer(interval=3600, flush_size=1000, retries=2, max_pending=3)
+    good = [buffer.add(user_id=None, match_id="poison", text=f"ok {i}", sender="user") for i in range(2)]
+    bad = buffer.add(user_id=None, match_id="poison", text="bad", sender="user", is_toxic="not a bool")
+    assert buffer.full()
+
+    assert buffer.flush() == 0  # first failure: the batch goes back to the queue
+    assert len(buffer.pending(None, "poison")) == 3
+    assert buffer.flush() == 2  # out of retries: row by row, the bad row is dead-lettered
+    assert buffer.pending(None, "poison") == [] and not buffer.full()
+    assert list(buffer.dead_letters) == [bad]
+    buffer.stop()
+
+    db = SessionLocal()
+    try:
+        stored = db.query(Message.id).filter(Message.match_id == "poison").all()
+        assert sorted(i for (i,) in stored) == sorted(m.id for m in good)
+    finally:
+        db.close()
+
+def test_chat_websocket_rate_limited(monkeypatch):
+    from app.services import rate_limit
+
+    # Room for exactly one message (cost 5), refilling far too slowly for a second
+    monkeypatch.setattr(rate_limit, "shared_buckets", rate_limit.MemoryBuckets(burst=5, rate=0.001))
+    token = register_and_login()["Authorization"].split()[1]
+    with client.websocket_connect(f"/ws/chat?token={token}") as ws:
+        ws.send_json({"match_id": "match_1", "text": "hello"})
+        assert [ws.receive_json()["type"] for _ in range(3)] == ["message", "moderation", "message"]
+        ws.send_json({"match_id": "match_1", "text": "hello again"})
+        error = ws.receive_json()
+        assert error["type"] == "error" and error["retry_after"] >= 1
+
+def test_send_message_with_full_job_queue(monkeypatch):
+    from app.services.ai_service import BUSY_REPLY
+
+    # No room for the reply job: the stored message still succeeds, answered with the busy reply
+    monkeypatch.setattr(job_queue, "max_pending", 0)
+    headers = register_and_login()
+    response = client.post("/api/chat/send", json={"match_id": "match_2", "text": "hey", "sender": "user"}, headers=headers)
+    assert response.status_code == 200 and response.json()["success"] is True
+    history = client.get("/api/chat/match_2", headers=headers).json()["messages"]
+    assert [(m["sender"], m["text"]) for m in history] == [("user", "hey"), ("match", BUSY_REPLY)]
+
+def test_nearby_uses_stored_sentiment(monkeypatch):
+    import numpy as np
+    from app.database import SessionLocal
+    from app.model_loader import loader
+    from app.models.user import User
+    from app.utils import pairwise
+
+    class StubModel:
+        def predict_proba(self, frame):
+            p = 1.0 / (1.0 + np.exp(-np.nan_to_num(np.asarray(frame, dtype=float)).sum(axis=1) / 100))
+            return np.column_stack([1.0 - p, p])
+
+    tag = uuid.uuid4().hex[:8]
+    headers = register_and_login(age=25, location="Pune", full_name=f"me {tag}")
+    register_and_login(age=26, location="Pune", full_name=f"near {tag}")
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.bio_sentiment.is_(None)).update({User.bio_sentiment: 0.0})
+        db.commit()
+    finally:
+        db.close()
+
+    # Every sentiment is stored, so scoring and flags must not fall back to TextBlob
+    def no_textblob(text):
+        raise AssertionError("analyze_bio on the request path")
+    monkeypatch.setattr(pairwise, "analyze_bio", no_textblob)
+    monkeypatch.setattr("app.services.score_cache.analyze_bio", no_textblob)
+    monkeypatch.setattr(loader, "_model", StubModel())
+    response = client.get("/api/discovery/nearby", headers=headers)
+    assert response.status_code == 200
+    near = next(c for c in response.json()["candidates"] if c["full_name"] == f"near {tag}")
+    assert 0 <= near["compatibility_score"] <= 100
+
+def test_history_paging_with_out_of_order_ids():
+    from datetime import datetime, timedelta
+    from sqlalchemy import func, insert
+    from app.database import SessionLocal
+    from app.models.message import Message
+    from app.services.message_archive import archive_messages
+
+    headers = register_and_login()
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        # Two write-behind workers with their own id blocks: ids alternate between blocks over time
+        base = (db.query(func.max(Message.id)).scalar() or 0) + 1000
+        rows = [
+            {"id": base + (i % 2) * 100 + i // 2, "user_id": user_id, "match_id": "match_2", "text": f"msg {i}",
+             "sender": "user", "timestamp": now - timedelta(days=200 - i) if i < 30 else now - timedelta(minutes=40 - i),
+             "is_toxic": False}
+            for i in range(40)
+        ]
+        db.execute(insert(Message), rows)
+        db.commit()
+        archive_messages(db, older_than_days=90, keep_recent=5, now=now)
+        assert db.query(Message).filter(Message.user_id == user_id).count() == 10
+    finally:
+        db.close()
+
+    collected, before = [], None
+    while True:
+        params = {"limit": 7, **({"before": before} if before else {})}
+        page = client.get("/api/chat/match_2", params=params, headers=headers).json()
+        collected = page["messages"] + collected
+        if not page["has_more"]:
+            break
+        before = page["messages"][0]["id"]
+    assert [m["text"] for m in collected] == [r["text"] for r in rows]
+
+def test_bio_sentiment_job_with_full_queue(monkeypatch):
+    from app.database import SessionLocal
+    from app.models.user import User
+    from app.services import tasks
+
+    user_id = client.get("/api/auth/me", headers=register_and_login()).json()["id"]
+    # The follow-up score refresh doesn't fit, but the job itself still succeeds
+    monkeypatch.setattr(job_queue, "max_pending", 0)
+    tasks.bio_sentiment(user_id)
+    db = SessionLocal()
+    try:
+        assert db.get(User, user_id).bio_sentiment is not None
+    finally:
+        db.close()
+
+def test_conversation_list_with_pending_messages(monkeypatch):
+    from app.services import message_buffer as mb
+    from app.database import SessionLocal
+    from app.models.message import Message
+
+    monkeypatch.setattr(mb, "WRITE_BEHIND_ENABLED", True)
+    monkeypatch.setattr(mb, "message_buffer", mb.MessageBuffer(interval=3600))
+    headers = register_and_login()
+    for text in ("first", "second"):
+        assert client.post("/api/chat/send", json={"match_id": "match_2", "text": text, "sender": "user"}, headers=headers).status_code == 200
+        job_queue.wait_idle(timeout=10)
+
+    # Nothing flushed yet: the list is built from the queued messages
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    db = SessionLocal()
+    try:
+        assert db.query(Message).filter(Message.user_id == user_id).count() == 0
+    finally:
+        db.close()
+    conversations = client.get("/api/chats", headers=headers).json()["conversations"]
+    assert [(c["match_id"], c["message_count"], c["last_message"]["sender"]) for c in conversations] == [("match_2", 4, "match")]
+
+    # Same answer while a flush has written rows it still lists, after it, and once everything is in the table
+    buffer = mb.message_buffer
+    buffer._insert(buffer._pending[:2])
+    assert client.get("/api/chats", headers=headers).json()["conversations"] == conversations
+    buffer._pending = buffer._pending[2:]
+    assert client.get("/api/chats", headers=headers).json()["conversations"] == conversations
+    buffer.stop()
+    assert client.get("/api/chats", headers=headers).json()["conversations"] == conversations
+
 if __name__ == "__main__":
     test_root()
     test_predict()